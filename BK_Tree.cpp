@@ -77,6 +77,12 @@ vector<string> getSimilarWords(BkNode &rootNode, string s)
     }
     return similarWords;
 }
+void resetTree()
+{
+    for (int i = 0; i <= ptr && i < BMAX; i++)
+        BK_Tree[i] = createNode("");
+    ptr = 0;
+}
 BkNode* ReturnBNode(){
     return &rootNode;
 }
\ No newline at end of file
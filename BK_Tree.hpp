@@ -15,6 +15,7 @@ BkNode createNode(string s);
 int editDistance(string s1, string s2);
 void addNode(BkNode &rootNode, BkNode &currentNode);
 vector<string> getSimilarWords(BkNode &rootNode, string s);
+void resetTree();
 BkNode* ReturnBNode();
 #endif
 
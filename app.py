@@ -1,17 +1,44 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, make_response
 import time
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
 import os
-import subprocess
-import json
-from bson import ObjectId, json_util
+from bson import ObjectId
 from datetime import datetime
 import hashlib
 import secrets
 import uuid
+import threading
+from fuzzy_index import DEFAULT_TOLERANCE, FuzzyIndex
+from fuzzy_scan import ScanMatcher
+from fuzzy_trigram import TrigramMatcher
+from prefix_index import PrefixIndex
+from bloom_filter import open_name_filter
+from catalog_feed import DEFAULT_FEED_SIZE, CatalogFeed, FeedLagged, fold_changes
+from catalog_snapshot import SnapshotStore
+from order_index import OrderIndex, order_seq
+from hydration import attach_items, attach_sellers, to_object_id
+from seller_cache import SellerCache
+from search_cache import SearchCache, normalize_query
+from fragment_cache import FragmentCache
+from http_cache import PAGE_VERSION_IDS, is_not_modified, not_modified, page_validators, set_validators
+from cart_store import create_cart_store, migrate_line_carts
+from checkout import Checkout, CheckoutError
+import order_snapshots
+from db_indexes import check_query_plans, ensure_indexes
+import click
+import metrics
+from pagination import (PAGE_SIZE, fetch_order_page, fetch_page, fetch_ranked_page, page_url, parse_cursor,
+                        parse_order_cursor, parse_ranked_cursor, stream_page)
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+# Every worker process must sign sessions with the same key; the random
+# fallback only suits a single process
+app.secret_key = os.environ.get('SUFFIXKART_SECRET_KEY') or os.urandom(24)
+
+# Request, dependency and template timings at /metrics (SUFFIXKART_METRICS=1).
+# Installed first so request timing also covers require_login.
+metrics.init_app(app)
 
 # Template filters
 @app.template_filter('timestamp_to_date')
@@ -25,7 +52,7 @@ def timestamp_to_date(timestamp):
 
 # MongoDB connection setup
 try:
-    client = MongoClient('mongodb://localhost:27017/')
+    client = MongoClient('mongodb://localhost:27017/', event_listeners=metrics.mongo_listeners())
     db = client['suffixKART_db']
     seller_profiles = db['seller_profiles']
     items_collection = db['items']
@@ -40,6 +67,317 @@ try:
 except Exception as e:
     print(f"MongoDB connection error: {e}")
 
+# Read-through cache of seller profiles; entries expire after the TTL
+seller_cache = SellerCache(seller_profiles,
+                           max_size=int(os.environ.get('SUFFIXKART_SELLER_CACHE_SIZE', 1024)),
+                           ttl=float(os.environ.get('SUFFIXKART_SELLER_CACHE_TTL', 300)))
+metrics.add_gauges(lambda: {f'suffixkart_seller_cache_{name}': value
+                            for name, value in seller_cache.stats().items()})
+
+# Cart storage: one document per cart updated with atomic upserts
+# (SUFFIXKART_CART_MODE=document) or the older one document per line (lines)
+CART_MODE = os.environ.get('SUFFIXKART_CART_MODE', 'document')
+cart_store = create_cart_store(db, CART_MODE)
+if CART_MODE == 'document':
+    # Carts left in the line store by an earlier version (one-time move)
+    try:
+        moved = migrate_line_carts(db)
+        if moved:
+            print(f"Moved {moved} cart lines into cart documents")
+    except Exception as e:
+        print(f"Cart migration error: {e}")
+
+# Stock validation, conditional decrement, order insert and cart clear
+checkout_pipeline = Checkout(client, db, cart_store, seller_cache)
+
+# In-process fuzzy index over item names, built once and then kept in sync
+# by add_item, edit_item and delete_item. All matchers return the same
+# matches: trigram (inverted index pruning), bktree, or scan (bit-parallel
+# whole-catalog scan). The BK-tree grows on a background thread, with a scan
+# answering searches until it is ready.
+FUZZY_MATCHERS = {
+    'trigram': TrigramMatcher,
+    'bktree': lambda: FuzzyIndex(background=True),
+    'scan': ScanMatcher,
+}
+
+
+def create_fuzzy_matcher(name='trigram'):
+    """Fuzzy matcher for SUFFIXKART_FUZZY_MATCHER (`trigram`, `bktree` or `scan`)."""
+    if name not in FUZZY_MATCHERS:
+        raise ValueError(f"Unknown fuzzy matcher {name!r}; expected one of {sorted(FUZZY_MATCHERS)}")
+    return FUZZY_MATCHERS[name]()
+
+
+FUZZY_MATCHER = os.environ.get('SUFFIXKART_FUZZY_MATCHER', 'trigram')
+fuzzy_index = create_fuzzy_matcher(FUZZY_MATCHER)
+
+# Edits allowed per search term; ?tolerance= picks a value up to the maximum
+MAX_TOLERANCE = 3
+
+def search_tolerance(args):
+    """Tolerance requested with ?tolerance=, clamped to 0..MAX_TOLERANCE."""
+    tolerance = args.get('tolerance', DEFAULT_TOLERANCE, type=int)
+    return min(max(tolerance, 0), MAX_TOLERANCE)
+
+# Fuzzy match results of recent queries, keyed by catalog version (see
+# cached_matches); SUFFIXKART_SEARCH_CACHE_BYTES=0 turns it off
+search_cache = SearchCache(max_bytes=int(os.environ.get('SUFFIXKART_SEARCH_CACHE_BYTES', 8 * 1024 * 1024)))
+metrics.add_gauges(lambda: {f'suffixkart_search_cache_{name}': value
+                            for name, value in search_cache.stats().items()})
+
+# Rendered product cards of the home and category pages, keyed by every
+# item and seller field a card shows
+fragment_cache = FragmentCache(app.jinja_loader, {'url_for': url_for},
+                               max_bytes=int(os.environ.get('SUFFIXKART_FRAGMENT_CACHE_BYTES', 4 * 1024 * 1024)))
+metrics.add_gauges(lambda: {f'suffixkart_fragment_cache_{name}': value
+                            for name, value in fragment_cache.stats().items()})
+CARD_FIELDS = ('name', 'price', 'quantity', 'category', 'description', 'seller_id')
+
+def card_key(template_name, item):
+    """Fragment cache key of one product card."""
+    seller = item.get('seller') or {}
+    return ((template_name, item.get('_id'), seller.get('_id'), seller.get('name'))
+            + tuple(item.get(field) for field in CARD_FIELDS))
+
+@app.template_global()
+def product_card(template_name, item):
+    """Product card partial for `item`, rendered at most once per item state."""
+    return fragment_cache.render(template_name, card_key(template_name, item), item=item)
+
+# Persisted Bloom filter of item names for add_item duplicate checks
+BLOOM_PATH = os.environ.get('SUFFIXKART_BLOOM_PATH', 'item_names.bloom')
+BLOOM_ERROR_RATE = float(os.environ.get('SUFFIXKART_BLOOM_ERROR_RATE', 0.001))
+name_filter = None
+
+# Sorted in-memory index of item names behind /autocomplete
+prefix_index = PrefixIndex()
+
+# Catalog change feed (see catalog_feed.py): item writes go through it, and
+# each one bumps the catalog version and appends an event to a capped
+# collection. Workers check the feed at most every FEED_POLL_INTERVAL seconds.
+FEED_SIZE = int(os.environ.get('SUFFIXKART_FEED_SIZE', DEFAULT_FEED_SIZE))
+FEED_POLL_INTERVAL = float(os.environ.get('SUFFIXKART_FEED_POLL_INTERVAL', 1.0))
+catalog_feed = CatalogFeed(db, size=FEED_SIZE)
+next_feed_check = 0
+
+# Catalog snapshot (see catalog_snapshot.py): one memory-mapped file shared
+# by every worker process, kept at the catalog version by replaying the
+# feed once per change. Each worker builds its name indexes from the
+# snapshot, then applies the names that change between generations.
+SNAPSHOT_PATH = os.environ.get('SUFFIXKART_SNAPSHOT_PATH', 'catalog.snapshot')
+snapshot_store = SnapshotStore(SNAPSHOT_PATH)
+catalog_snapshot = None
+catalog_lock = threading.Lock()
+
+try:
+    catalog_feed.ensure()
+except Exception as e:
+    print(f"Catalog feed setup error: {e}")
+
+def publish_catalog_snapshot():
+    """Snapshot the whole catalog as the next generation. Call under snapshot_store.lock()."""
+    # Version first: writes racing the scan are replayed once more later,
+    # which is harmless since upserts and deletes are idempotent
+    version = catalog_feed.version()
+    items = items_collection.find({}, {'name': 1, 'category': 1, 'seller_id': 1})
+    return snapshot_store.publish(items, version)
+
+def advance_catalog_snapshot(snapshot):
+    """Bring the shared snapshot up to the catalog version. Call under snapshot_store.lock()."""
+    if snapshot is None:
+        return publish_catalog_snapshot()
+    try:
+        events = catalog_feed.changes_since(snapshot.version)
+    except FeedLagged as e:
+        print(f"Rebuilding catalog snapshot: {e}")
+        return publish_catalog_snapshot()
+    if not events:
+        return snapshot
+    upserts, deletes = fold_changes(events)
+    return snapshot_store.publish_changes(snapshot, upserts, deletes, events[-1]['version'])
+
+def apply_name_changes(old_snapshot, new_snapshot):
+    """Bring the name indexes from one snapshot generation to another."""
+    global name_filter
+    if old_snapshot is None:
+        names = [name for name, count in new_snapshot.name_counts().items() for _ in range(count)]
+        fuzzy_index.build(names)
+        prefix_index.build(names)
+        if name_filter is None:
+            name_filter = open_name_filter(BLOOM_PATH, names, error_rate=BLOOM_ERROR_RATE)
+        else:
+            name_filter.add_many(names)
+        return
+    for name, delta in old_snapshot.name_changes(new_snapshot).items():
+        for _ in range(delta):
+            fuzzy_index.add(name)
+            prefix_index.add(name)
+        for _ in range(-delta):
+            fuzzy_index.remove(name)
+            prefix_index.remove(name)
+        if delta > 0 and name_filter is not None:
+            name_filter.add(name)
+
+def sync_catalog(check_feed=True):
+    """
+    Move this worker to the newest snapshot generation. With check_feed,
+    first replay feed events that no worker has published yet.
+    """
+    global catalog_snapshot
+    try:
+        with catalog_lock:
+            latest = snapshot_store.refresh(catalog_snapshot)
+            if check_feed and (latest is None or latest.version != catalog_feed.version()):
+                with snapshot_store.lock():
+                    latest = advance_catalog_snapshot(snapshot_store.refresh(latest))
+            if latest is not None and latest is not catalog_snapshot:
+                apply_name_changes(catalog_snapshot, latest)
+                if catalog_snapshot is not None:
+                    catalog_snapshot.close()
+                catalog_snapshot = latest
+    except Exception as e:
+        print(f"Catalog sync error: {e}")
+
+@app.before_request
+def sync_catalog_snapshot():
+    """Pick up catalog changes made by other workers."""
+    global next_feed_check
+    now = time.monotonic()
+    check_feed = now >= next_feed_check
+    if (not check_feed and catalog_snapshot is not None
+            and catalog_snapshot.generation == snapshot_store.current_generation()):
+        return
+    if check_feed:
+        next_feed_check = now + FEED_POLL_INTERVAL
+    sync_catalog(check_feed)
+
+sync_catalog()
+if catalog_snapshot is not None:
+    print(f"Catalog snapshot generation {catalog_snapshot.generation} at version "
+          f"{catalog_snapshot.version} with {len(catalog_snapshot)} items")
+    print(f"Fuzzy index built with {len(fuzzy_index)} item names")
+    print(f"Bloom filter loaded with {len(name_filter)} item names")
+
+def browse_validators(*parts, catalog=True):
+    """
+    ETag and Last-Modified of the current browse page (see http_cache.py):
+    one read of the version counters, unless the page is static.
+    """
+    counters = list(catalog_feed.counters.find({'_id': {'$in': PAGE_VERSION_IDS}})) if catalog else ()
+    return page_validators(session, request.full_path, counters, *parts)
+
+# The in-process indexes, timed as dependencies at /metrics like MongoDB
+@metrics.timed('fuzzy_index', 'nearest')
+def nearest_names(query, k, **options):
+    return fuzzy_index.nearest(query, k, **options)
+
+@metrics.timed('fuzzy_index', 'search_many')
+def search_names(queries, tolerance):
+    return fuzzy_index.search_many(queries, tolerance=tolerance)
+
+@metrics.timed('bloom_filter', 'check')
+def name_maybe_taken(name):
+    """False only for names no item can carry (no filter yet: unknown, so True)."""
+    return name_filter is None or name in name_filter
+
+@metrics.timed('order_index', 'search')
+def search_orders(pattern, field):
+    return order_index.search(pattern, field=field)
+
+def ranked_matches(query, tolerance, after=None, items=PAGE_SIZE + 1):
+    """fuzzy_index.nearest() for one page of search results, through the search cache."""
+    # Keys carry the catalog version the name indexes are at, so any item
+    # write retires every result matched before it
+    snapshot = catalog_snapshot
+    key = ('nearest', query, tolerance, after, items, snapshot.version if snapshot else None)
+    ranked = search_cache.get(key) if snapshot else None
+    if ranked is None:
+        ranked = tuple(nearest_names(query, items, tolerance=tolerance, after=after, items=items))
+        # Only keep results of indexes that did not move on meanwhile
+        if snapshot is not None and catalog_snapshot is snapshot:
+            search_cache.put(key, ranked)
+    return ranked
+
+def list_matches(queries, tolerance):
+    """fuzzy_index.search_many() for a shopping list, through the search cache term by term."""
+    snapshot = catalog_snapshot
+    version = snapshot.version if snapshot else None
+    matches = {}
+    if snapshot is not None:
+        for query in queries:
+            names = search_cache.get(('search', query, tolerance, version))
+            if names is not None:
+                matches[query] = names
+    missing = [query for query in queries if query not in matches]
+    if missing:
+        found = search_names(missing, tolerance)
+        keep = snapshot is not None and catalog_snapshot is snapshot
+        for query, names in found.items():
+            matches[query] = tuple(names)
+            if keep:
+                search_cache.put(('search', query, tolerance, version), matches[query])
+    return matches
+
+@app.cli.command('rebuild-snapshot')
+def rebuild_snapshot_command():
+    """Rebuild the shared catalog snapshot from MongoDB."""
+    with snapshot_store.lock():
+        snapshot = publish_catalog_snapshot()
+    click.echo(f"Published catalog snapshot generation {snapshot.generation} at version "
+               f"{snapshot.version} with {len(snapshot)} items")
+
+# Substring index over order buyer and item names for order_history
+order_index = OrderIndex()
+
+def load_order_index():
+    """Build the order index from every stored order."""
+    # Read first: refresh() replays whatever is numbered after it
+    applied = order_seq(catalog_feed.counters)
+    orders = list(orders_collection.find({}, {'buyer_name': 1, 'item_id': 1, 'item_name': 1, 'seq': 1}))
+    # Orders from before snapshots (see order_snapshots.py) need the catalog
+    item_ids = list({order['item_id'] for order in orders if 'item_id' in order and 'item_name' not in order})
+    item_names = {}
+    if item_ids:
+        for item in items_collection.find({'_id': {'$in': item_ids}}, {'name': 1}):
+            item_names[item['_id']] = item['name']
+    order_index.build(((order['_id'], order.get('buyer_name', ''),
+                        order.get('item_name') or item_names.get(order.get('item_id'), ''), order.get('seq'))
+                       for order in orders), applied)
+
+try:
+    load_order_index()
+    print(f"Order index built with {len(order_index)} orders")
+except Exception as e:
+    print(f"Order index build error: {e}")
+
+# Create the indexes the hot queries rely on (idempotent)
+try:
+    for collection_name, index_name, error in ensure_indexes(db):
+        print(f"Could not create index {collection_name}.{index_name}: {error}")
+except Exception as e:
+    print(f"Index bootstrap error: {e}")
+
+@app.cli.command('backfill-order-snapshots')
+@click.option('--batch-size', default=500, help='Orders updated per bulk write.')
+def backfill_order_snapshots_command(batch_size):
+    """Add item and seller snapshot fields to orders placed before snapshots."""
+    click.echo(f"Backfilled {order_snapshots.backfill(db, batch_size)} orders")
+
+@app.cli.command('ensure-indexes')
+@click.option('--check', is_flag=True, help='Fail if any hot query still does a COLLSCAN.')
+def ensure_indexes_command(check):
+    """Create the required MongoDB indexes and optionally verify query plans."""
+    failures = ensure_indexes(db)
+    for collection_name, index_name, error in failures:
+        click.echo(f"Could not create index {collection_name}.{index_name}: {error}")
+    scans = check_query_plans(db) if check else []
+    for collection_name, query, stages in scans:
+        click.echo(f"COLLSCAN on {collection_name} for {query}: {' -> '.join(stages)}")
+    if failures or scans:
+        raise SystemExit(1)
+    click.echo('Indexes are in place')
+
 # Helper function to hash passwords
 def hash_password(password, salt=None):
     """Hash a password with a salt for secure storage."""
@@ -96,59 +434,17 @@ def require_login():
             flash('Please log in to access this page')
             return redirect(url_for('login'))
 
-# Determine which backend executable to use
-def get_backend_executable():
-    """Check if new_backend.exe exists, otherwise use backend.exe."""
-    if os.path.exists("new_backend.exe"):
-        return "new_backend.exe"
-    return "backend.exe"
-
-# Function to execute C++ backend with direct data access
-def execute_cpp_algorithm(algorithm_type, data):
-    """
-    Execute C++ algorithm with data passed directly as JSON
-    
-    algorithm_type: "bloom", "bktree", or "suffixtree"
-    data: Dictionary containing data to be processed
-    """
-    # Convert data to JSON string
-    json_data = json.dumps(data, default=json_util.default)
-    
-    # Get the appropriate backend executable
-    backend_exe = get_backend_executable()
-    
-    # Execute the appropriate C++ executable with the data as argument
-    try:
-        # Call the appropriate algorithm
-        if algorithm_type == "bloom":
-            # Check if item exists using bloom filter
-            result = subprocess.run([f'./{backend_exe}', 'bloom', json_data], 
-                                   capture_output=True, text=True, check=True)
-        elif algorithm_type == "bktree":
-            # Search using BK-Tree for fuzzy matching
-            result = subprocess.run([f'./{backend_exe}', 'bktree', json_data], 
-                                   capture_output=True, text=True, check=True)
-        elif algorithm_type == "suffixtree":
-            # Use suffix tree for order history
-            result = subprocess.run([f'./{backend_exe}', 'suffixtree', json_data], 
-                                   capture_output=True, text=True, check=True)
-        else:
-            return {"error": "Invalid algorithm type"}
-        
-        # Parse the output
-        return json.loads(result.stdout)
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing C++ algorithm: {e}")
-        return {"error": str(e), "output": e.stdout, "stderr": e.stderr}
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON output: {e}")
-        return {"error": "Invalid JSON output from C++ algorithm"}
-
 @app.route('/')
 def index():
+    # Nothing changed since the browser's copy: answer before any query
+    validators = browse_validators()
+    if is_not_modified(request, validators):
+        return not_modified(app.response_class, validators)
+    
     # Get some sample items from the database to display
     sample_items = list(items_collection.find().limit(5))
-    return render_template('index.html', items=sample_items, seller_profiles=seller_profiles)
+    attach_sellers(sample_items, seller_cache)
+    return set_validators(make_response(render_template('index.html', items=sample_items)), validators)
 
 @app.route('/register', methods=['GET', 'POST'])
 def register_seller():
@@ -271,22 +567,26 @@ def login():
             if new_hash == stored_hash:
                 # Set session variables
                 session['email'] = email
+                guest_cart_id = session.pop('temp_cart_id', None)
                 
                 # Check user type and set appropriate session variables
                 if user.get('user_type') == 'seller' or 'seller_id' in user:
                     session['user_id'] = str(user.get('seller_id'))
                     session['is_seller'] = True
+                    merge_guest_cart(guest_cart_id, session['user_id'])
                     session['is_admin'] = user.get('is_admin', False)
                     flash('Login successful!')
                     return redirect(url_for('seller_dashboard', seller_id=user['seller_id']))
                 elif user.get('user_type') == 'buyer' or 'buyer_id' in user:
                     session['user_id'] = str(user.get('buyer_id'))
                     session['is_buyer'] = True
+                    merge_guest_cart(guest_cart_id, session['user_id'])
                     flash('Login successful!')
                     return redirect(url_for('buyer_dashboard'))
                 else:
                     # Fallback to admin or other role
                     session['user_id'] = str(user.get('_id'))
+                    merge_guest_cart(guest_cart_id, session['user_id'])
                     session['is_admin'] = user.get('is_admin', False)
                     flash('Login successful!')
                     return redirect(url_for('index'))
@@ -295,6 +595,11 @@ def login():
     
     return render_template('login.html')
 
+def merge_guest_cart(guest_cart_id, user_id):
+    """Fold the cart built before logging in into the user's cart."""
+    if guest_cart_id:
+        cart_store.merge(guest_cart_id, user_id)
+
 @app.route('/logout')
 def logout():
     # Clear session
@@ -305,22 +610,28 @@ def logout():
 @app.route('/seller/<seller_id>')
 def seller_dashboard(seller_id):
     # Get seller profile from MongoDB
-    seller = seller_profiles.find_one({'_id': ObjectId(seller_id)})
+    seller = seller_cache.get(seller_id)
     
     if not seller:
         flash('Seller not found!')
         return redirect(url_for('index'))
     
-    # Get items added by this seller
-    seller_items = list(items_collection.find({'seller_id': ObjectId(seller_id)}))
+    # Get one page of items added by this seller
+    cursor = parse_cursor(request.args.get('after'))
+    seller_query = {'seller_id': ObjectId(seller_id)}
+    seller_items, next_cursor = fetch_page(items_collection, seller_query, after=cursor)
+    total_items = items_collection.count_documents(seller_query)
     
     # Check if logged in and seller owns this dashboard
     is_owner = 'user_id' in session and str(session['user_id']) == str(seller_id)
     
-    return render_template('seller_dashboard.html', 
-                          seller=seller, 
-                          items=seller_items, 
-                          is_owner=is_owner)
+    return stream_page('seller_dashboard.html', 
+                       seller=seller, 
+                       items=seller_items, 
+                       total_items=total_items,
+                       cursor=cursor,
+                       next_cursor=next_cursor,
+                       is_owner=is_owner)
 
 @app.route('/add_item/<seller_id>', methods=['GET', 'POST'])
 def add_item(seller_id):
@@ -328,22 +639,14 @@ def add_item(seller_id):
         # Get item details from form
         item_name = request.form['name']
         
-        # First, use the Bloom Filter to check if item exists (via C++ backend)
-        # Get all existing items for bloom filter
-        all_items = list(items_collection.find({}, {'name': 1}))
-        item_names = [item['name'] for item in all_items]
-        
-        bloom_data = {
-            'operation': 'check',
-            'item_name': item_name,
-            'existing_items': item_names
-        }
-        
-        bloom_response = execute_cpp_algorithm('bloom', bloom_data)
-        
-        # Check if the item was successfully added (not a duplicate)
-        if bloom_response.get('is_unique', False):
-            # Item is unique according to Bloom Filter, now store in MongoDB
+        # Item names are unique (a unique index on items.name), so a new name
+        # is simply inserted. The Bloom filter can lag names other workers
+        # just added, so it only spares that common path a lookup: a probable
+        # hit is confirmed with an indexed MongoDB lookup before anything is written
+        probably_present = name_maybe_taken(item_name)
+        if probably_present and items_collection.find_one({'name': item_name}, {'_id': 1}):
+            is_unique = False
+        else:
             item_data = {
                 'name': item_name,
                 'price': float(request.form['price']),
@@ -354,20 +657,20 @@ def add_item(seller_id):
                 'date_added': datetime.now()
             }
             
-            # Insert item into MongoDB
-            item_id = items_collection.insert_one(item_data).inserted_id
-            
-            # Update bloom filter with new item
-            update_bloom_data = {
-                'operation': 'insert',
-                'item_name': item_name
-            }
-            execute_cpp_algorithm('bloom', update_bloom_data)
-            
+            # Insert item into MongoDB; the feed carries it to the name
+            # indexes and Bloom filter of every worker
+            try:
+                catalog_feed.insert_item(item_data)
+                is_unique = True
+            except DuplicateKeyError:
+                is_unique = False
+        
+        if is_unique:
+            sync_catalog()
             flash('Item added successfully!')
         else:
-            # Item was probably already present
-            flash('This item might already exist in the system.')
+            # Item is already present
+            flash('This item already exists in the system.')
         
         return redirect(url_for('seller_dashboard', seller_id=seller_id))
     
@@ -414,10 +717,12 @@ def edit_item(item_id):
         }
         
         # Update item in MongoDB
-        items_collection.update_one(
-            {'_id': ObjectId(item_id)},
-            {'$set': updated_item}
-        )
+        try:
+            catalog_feed.update_item(item_id, updated_item)
+        except DuplicateKeyError:
+            flash('Another item already has this name.')
+            return redirect(url_for('edit_item', item_id=item_id))
+        sync_catalog()
         
         flash('Item updated successfully!')
         return redirect(url_for('seller_dashboard', seller_id=item['seller_id']))
@@ -454,7 +759,8 @@ def delete_item(item_id):
         return redirect(url_for('seller_dashboard', seller_id=session['user_id']))
     
     # Delete item from MongoDB
-    items_collection.delete_one({'_id': ObjectId(item_id)})
+    catalog_feed.delete_item(item_id)
+    sync_catalog()
     
     flash('Item deleted successfully!')
     return redirect(url_for('seller_dashboard', seller_id=item['seller_id']))
@@ -463,47 +769,33 @@ def delete_item(item_id):
 def search():
     return render_template('search.html')
 
+@app.route('/autocomplete')
+def autocomplete():
+    # Typeahead completions straight from memory: no MongoDB, no backend
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    return jsonify(query=query, suggestions=prefix_index.complete(query, limit=limit))
+
 @app.route('/search_results')
 def search_results():
-    query = request.args.get('query', '')
+    query = normalize_query(request.args.get('query', ''))
     
     if not query:
         return render_template('search_results.html', items=[], query='')
     
-    # Use BK-Tree for fuzzy matching via C++ backend
-    # Get all existing items for BK-Tree
-    all_items = list(items_collection.find({}, {'name': 1}))
-    item_names = [item['name'] for item in all_items]
-    
-    bktree_data = {
-        'query': query,
-        'items': item_names,
-        'tolerance': 2  # Tolerance for fuzzy matching
-    }
-    
-    bktree_response = execute_cpp_algorithm('bktree', bktree_data)
-    
-    # Get matched items from MongoDB
-    matched_items = []
-    item_ids_seen = set()  # Track item IDs we've already added
-    
-    if 'matches' in bktree_response:
-        # Look up the matched items in MongoDB using a single query for all matches
-        match_names = bktree_response.get('matches', [])
-        if match_names:
-            db_items = list(items_collection.find({'name': {'$in': match_names}}))
-            
-            # Process each item and add it only once
-            for item in db_items:
-                item_id_str = str(item['_id'])
-                if item_id_str not in item_ids_seen:
-                    # Get seller details
-                    seller = seller_profiles.find_one({'_id': item['seller_id']})
-                    item['seller'] = seller
-                    matched_items.append(item)
-                    item_ids_seen.add(item_id_str)
-    
-    return render_template('search_results.html', items=matched_items, query=query)
+    # Rank matches in the in-process fuzzy index: only the names that fill
+    # this page (plus one item, to tell whether there is a next page)
+    cursor = request.args.get('after')
+    resume = parse_ranked_cursor(cursor)
+    ranked = ranked_matches(query, search_tolerance(request.args), after=resume[0] if resume else None)
+
+    # Hydrate just this page of items, in rank order
+    matched_items, next_cursor = fetch_ranked_page(items_collection, ranked, resume)
+    if matched_items:
+        attach_sellers(matched_items, seller_cache)
+
+    return stream_page('search_results.html', items=matched_items, query=query,
+                       cursor=cursor, next_cursor=next_cursor)
 
 @app.route('/buy_item/<item_id>')
 def buy_item(item_id):
@@ -532,77 +824,48 @@ def buy_item(item_id):
         flash('Not enough stock available!')
         return redirect(url_for('index'))
     
-    # Check if item is already in cart
-    existing_item = cart_collection.find_one({
-        'cart_id': cart_id,
-        'item_id': str(item_id)
-    })
-    
-    if existing_item:
-        # Update quantity
-        new_quantity = existing_item['quantity'] + 1
-        cart_collection.update_one(
-            {'_id': existing_item['_id']},
-            {'$set': {'quantity': new_quantity}}
-        )
-    else:
-        # Add item to cart
-        cart_item = {
-            'cart_id': cart_id,
-            'item_id': str(item_id),
-            'quantity': 1,
-            'date_added': datetime.now()
-        }
-        cart_collection.insert_one(cart_item)
+    # Add one to the cart line (created if missing) in a single upsert
+    cart_store.add(cart_id, str(item_id), 1)
     
     flash(f"{item['name']} added to your cart!")
     return redirect(url_for('view_cart'))
 
 @app.route('/order_history/<item_name>')
 def order_history(item_name):
-    # Use Suffix Tree to find order history
-    suffix_data = {
-        'operation': 'search',
-        'item': item_name
-    }
-    
-    suffix_response = execute_cpp_algorithm('suffixtree', suffix_data)
-    
-    # Get orders from MongoDB based on the search results
-    orders = []
-    
-    if 'buyers' in suffix_response:
-        for buyer in suffix_response['buyers']:
-            # Find orders by this buyer for this item
-            item_ids = [item['_id'] for item in items_collection.find({'name': item_name})]
-            buyer_orders = list(orders_collection.find({
-                'buyer_name': buyer,
-                'item_id': {'$in': item_ids}
-            }))
-            
-            for order in buyer_orders:
-                # Get item and seller details
-                item = items_collection.find_one({'_id': order['item_id']})
-                seller = seller_profiles.find_one({'_id': order['seller_id']})
-                order['item'] = item
-                order['seller'] = seller
-                orders.append(order)
-    
-    return render_template('order_history.html', orders=orders, item_name=item_name)
+    # Use the order substring index to find every order whose item matches,
+    # after catching up with orders placed through other workers
+    order_index.refresh(orders_collection)
+    order_ids = search_orders(item_name, 'item')
+    
+    # Get one page of the matching orders, newest first
+    cursor = parse_order_cursor(request.args.get('after'))
+    orders, next_cursor = [], None
+    if order_ids:
+        # Orders carry their item and seller snapshot, so nothing else is read
+        orders, next_cursor = fetch_order_page(orders_collection, {'_id': {'$in': order_ids}}, after=cursor)
+    
+    return render_template('order_history.html', orders=orders, item_name=item_name, total_orders=len(order_ids),
+                           cursor=cursor, next_cursor=next_cursor, page_url=page_url)
 
 @app.route('/view_seller/<seller_id>')
 def view_seller(seller_id):
     # Get seller profile from MongoDB
-    seller = seller_profiles.find_one({'_id': ObjectId(seller_id)})
+    seller = seller_cache.get(seller_id)
     
     if not seller:
         flash('Seller not found!')
         return redirect(url_for('index'))
     
-    # Get all items from this seller
-    seller_items = list(items_collection.find({'seller_id': ObjectId(seller_id)}))
+    validators = browse_validators(seller['_id'], seller.get('date_updated') or seller.get('date_registered'))
+    if is_not_modified(request, validators):
+        return not_modified(app.response_class, validators)
+    
+    # Get one page of items from this seller
+    cursor = parse_cursor(request.args.get('after'))
+    seller_items, next_cursor = fetch_page(items_collection, {'seller_id': ObjectId(seller_id)}, after=cursor)
     
-    return render_template('view_seller.html', seller=seller, items=seller_items)
+    return set_validators(stream_page('view_seller.html', seller=seller, items=seller_items,
+                                      cursor=cursor, next_cursor=next_cursor), validators)
 
 @app.route('/cart')
 def view_cart():
@@ -619,14 +882,17 @@ def view_cart():
         cart_id = user_id
     
     # Get cart items from MongoDB
-    cart_items = list(cart_collection.find({'cart_id': cart_id}))
+    cart_items = cart_store.get_lines(cart_id)
     
     # Fetch the actual item details for each item in the cart
     items_with_details = []
     total_price = 0
     
+    # Resolve every cart line's item with one query
+    attach_items(cart_items, items_collection)
+    
     for cart_item in cart_items:
-        item = items_collection.find_one({'_id': ObjectId(cart_item['item_id'])})
+        item = cart_item['item']
         if item:
             # Add quantity from cart to the item
             item['cart_quantity'] = cart_item['quantity']
@@ -634,12 +900,12 @@ def view_cart():
             item['subtotal'] = item['price'] * cart_item['quantity']
             # Add to the total price
             total_price += item['subtotal']
-            # Get seller info
-            seller = seller_profiles.find_one({'_id': item['seller_id']})
-            item['seller'] = seller
             # Add to the list
             items_with_details.append(item)
     
+    # Get seller info for all items at once
+    attach_sellers(items_with_details, seller_cache)
+    
     return render_template('cart.html', 
                            cart_items=items_with_details, 
                            total_price=total_price)
@@ -672,28 +938,8 @@ def add_to_cart(item_id):
         flash('Not enough stock available!')
         return redirect(url_for('index'))
     
-    # Check if item is already in cart
-    existing_item = cart_collection.find_one({
-        'cart_id': cart_id,
-        'item_id': item_id
-    })
-    
-    if existing_item:
-        # Update quantity
-        new_quantity = existing_item['quantity'] + quantity
-        cart_collection.update_one(
-            {'_id': existing_item['_id']},
-            {'$set': {'quantity': new_quantity}}
-        )
-    else:
-        # Add item to cart
-        cart_item = {
-            'cart_id': cart_id,
-            'item_id': item_id,
-            'quantity': quantity,
-            'date_added': datetime.now()
-        }
-        cart_collection.insert_one(cart_item)
+    # Add to the cart line (created if missing) in a single upsert
+    cart_store.add(cart_id, item_id, quantity)
     
     flash(f"{quantity} {item['name']} added to your cart!")
     return redirect(url_for('view_cart'))
@@ -715,10 +961,7 @@ def update_cart(item_id):
     # Update quantity in cart
     if quantity <= 0:
         # Remove item from cart if quantity is 0 or less
-        cart_collection.delete_one({
-            'cart_id': cart_id,
-            'item_id': item_id
-        })
+        cart_store.remove(cart_id, item_id)
         flash('Item removed from cart!')
     else:
         # Check if there's enough stock
@@ -728,13 +971,7 @@ def update_cart(item_id):
             return redirect(url_for('view_cart'))
         
         # Update quantity
-        cart_collection.update_one(
-            {
-                'cart_id': cart_id,
-                'item_id': item_id
-            },
-            {'$set': {'quantity': quantity}}
-        )
+        cart_store.set_quantity(cart_id, item_id, quantity)
         flash('Cart updated!')
     
     return redirect(url_for('view_cart'))
@@ -751,10 +988,7 @@ def remove_from_cart(item_id):
         cart_id = user_id
     
     # Remove item from cart
-    cart_collection.delete_one({
-        'cart_id': cart_id,
-        'item_id': item_id
-    })
+    cart_store.remove(cart_id, item_id)
     
     flash('Item removed from cart!')
     return redirect(url_for('view_cart'))
@@ -770,21 +1004,25 @@ def checkout():
     else:
         cart_id = user_id
     
-    # Get cart items
+    buyer_name = 'Guest'
     if user_id:
-        cart_items = list(cart_collection.find({'cart_id': user_id}))
-    else:
-        cart_items = list(cart_collection.find({'cart_id': cart_id}))
+        buyer = buyer_profiles.find_one({'_id': to_object_id(user_id)}, {'name': 1})
+        if buyer:
+            buyer_name = buyer['name']
     
-    if not cart_items:
-        flash('Your cart is empty!')
+    # Validate stock, take it, write the orders and clear the cart
+    try:
+        orders = checkout_pipeline.place(cart_id, user_id, buyer_name)
+    except CheckoutError as e:
+        flash(str(e))
         return redirect(url_for('view_cart'))
     
-    # Clear the cart
-    if user_id:
-        cart_collection.delete_many({'cart_id': user_id})
-    else:
-        cart_collection.delete_many({'cart_id': cart_id})
+    # Make the new orders searchable in order_history right away; other
+    # workers pick them up by their seq
+    for order in orders:
+        order_index.add(order['_id'], buyer_name, order['item_name'], order['seq'])
+    
+    if not user_id:
         # Clear the temporary cart ID from session if guest checkout
         if 'temp_cart_id' in session:
             session.pop('temp_cart_id')
@@ -810,15 +1048,9 @@ def buyer_dashboard():
         return redirect(url_for('index'))
     
     # Get buyer's orders
+    # Orders render from their item and seller snapshot
     orders = list(orders_collection.find({'buyer_id': user_id}))
     
-    # Enrich orders with item and seller details
-    for order in orders:
-        item = items_collection.find_one({'_id': order['item_id']})
-        seller = seller_profiles.find_one({'_id': order['seller_id']})
-        order['item'] = item
-        order['seller'] = seller
-    
     # Get buyer profile
     buyer = buyer_profiles.find_one({'_id': ObjectId(user_id)})
     
@@ -836,14 +1068,10 @@ def view_orders():
         return redirect(url_for('login'))
     
     # Get buyer's orders
+    # Orders render from their item and seller snapshot; only the seller's
+    # current contact details come from the (cached) seller profiles
     orders = list(orders_collection.find({'buyer_id': user_id}).sort('date', -1))
-    
-    # Enrich orders with item and seller details
-    for order in orders:
-        item = items_collection.find_one({'_id': order['item_id']})
-        seller = seller_profiles.find_one({'_id': order['seller_id']})
-        order['item'] = item
-        order['seller'] = seller
+    attach_sellers(orders, seller_cache)
     
     return render_template('buyer_orders.html', orders=orders)
 
@@ -864,21 +1092,31 @@ def browse_categories():
         'Other'
     ]
     
-    return render_template('categories.html', categories=categories)
+    # A static page: the validators only follow templates and the session
+    validators = browse_validators(catalog=False)
+    if is_not_modified(request, validators):
+        return not_modified(app.response_class, validators)
+    
+    return set_validators(make_response(render_template('categories.html', categories=categories)), validators)
 
 @app.route('/category/<category_name>')
 def browse_category(category_name):
-    # Find items in this category
-    category_items = list(items_collection.find({'category': category_name}))
+    validators = browse_validators()
+    if is_not_modified(request, validators):
+        return not_modified(app.response_class, validators)
+    
+    # Find one page of items in this category
+    cursor = parse_cursor(request.args.get('after'))
+    category_items, next_cursor = fetch_page(items_collection, {'category': category_name}, after=cursor)
     
     # Enrich items with seller details
-    for item in category_items:
-        seller = seller_profiles.find_one({'_id': item['seller_id']})
-        item['seller'] = seller
+    attach_sellers(category_items, seller_cache)
     
-    return render_template('category_items.html', 
-                          items=category_items, 
-                          category=category_name)
+    return set_validators(stream_page('category_items.html', 
+                                      items=category_items, 
+                                      category=category_name,
+                                      cursor=cursor,
+                                      next_cursor=next_cursor), validators)
 
 @app.route('/shopping_list', methods=['GET', 'POST'])
 def shopping_list():
@@ -926,44 +1164,33 @@ def process_shopping_list():
         flash('Your shopping list is empty!')
         return redirect(url_for('shopping_list'))
     
-    # Get all available items for BK-Tree
-    all_items = list(items_collection.find({}, {'name': 1}))
-    all_item_names = [item['name'] for item in all_items]
+    # Match the whole list against one snapshot of the fuzzy index, reusing
+    # cached matches of terms looked up before
+    matches = list_matches([normalize_query(item) for item in shopping_list], search_tolerance(request.args))
+    
+    # Fetch every matched item with one query, then every seller with one query
+    all_match_names = {name for names in matches.values() for name in names}
+    items_by_name = {}
+    if all_match_names:
+        for item in items_collection.find({'name': {'$in': list(all_match_names)}}):
+            items_by_name.setdefault(item['name'], []).append(item)
+    
+    attach_sellers([item for items in items_by_name.values() for item in items], seller_cache)
     
     # Initialize results hashmap to store matches
     results = {}
     
-    # Process each item in the shopping list
+    # Assemble the matches for each item in the shopping list
     for list_item in shopping_list:
-        # Use BK-Tree for fuzzy matching
-        bktree_data = {
-            'query': list_item,
-            'items': all_item_names,
-            'tolerance': 2  # Tolerance for fuzzy matching
-        }
-        
-        bktree_response = execute_cpp_algorithm('bktree', bktree_data)
-        
-        # Store matches in results
         item_matches = []
-        
-        if 'matches' in bktree_response and bktree_response['matches']:
-            # For each matched name, find all items and their sellers
-            for match_name in bktree_response['matches']:
-                matched_items = list(items_collection.find({'name': match_name}))
-                
-                for item in matched_items:
-                    seller = seller_profiles.find_one({'_id': item['seller_id']})
-                    item_with_seller = {
-                        'item': item,
-                        'seller': seller
-                    }
-                    item_matches.append(item_with_seller)
-            
-            results[list_item] = item_matches
-        else:
-            # No matches found
-            results[list_item] = []
+        for match_name in matches.get(normalize_query(list_item), ()):
+            for item in items_by_name.get(match_name, []):
+                item_with_seller = {
+                    'item': item,
+                    'seller': item['seller']
+                }
+                item_matches.append(item_with_seller)
+        results[list_item] = item_matches
     
     # Clear the shopping list after processing
     session['shopping_list'] = []
@@ -0,0 +1,358 @@
+"""
+Optional asyncio serving mode for SuffixKART.
+
+The read-heavy pages (home, category, seller, search, cart, buyer
+dashboard and orders) are served by a Quart app on the event loop. They
+use the Motor async MongoDB driver and issue independent lookups within a
+request concurrently. Every other route (forms, cart and checkout writes)
+is passed through to the regular Flask app, so both modes serve the same
+URLs. The in-process indexes and the seller cache are shared with the Flask
+app, and so are sessions, because both apps sign cookies with the same key.
+
+Requires the optional packages quart, motor, asgiref and hypercorn:
+    python async_app.py
+    SUFFIXKART_SECRET_KEY=... hypercorn async_app:asgi_app --workers 4
+
+Several workers must share SUFFIXKART_SECRET_KEY, or a session cookie
+signed by one worker is rejected by the others.
+"""
+import asyncio
+import os
+import uuid
+
+from asgiref.wsgi import WsgiToAsgi
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from quart import Quart, flash, make_response, redirect, render_template, request, session, url_for
+
+import app as sync_app
+from fragment_cache import FragmentCache
+from http_cache import PAGE_VERSION_IDS, is_not_modified, not_modified, page_validators, set_validators
+from hydration import to_object_id
+from search_cache import normalize_query
+from pagination import (ITEM_LIST_FIELDS, PAGE_SIZE, finish_ranked_page, parse_cursor, parse_ranked_cursor,
+                        ranked_page_queries)
+
+
+async_app = Quart(__name__)
+async_app.secret_key = sync_app.app.secret_key
+async_app.add_template_filter(sync_app.timestamp_to_date, 'timestamp_to_date')
+
+# Product cards render synchronously with Quart's url_for; same keys and
+# size cap as the Flask app's cache
+fragment_cache = FragmentCache(async_app.jinja_loader, {'url_for': url_for},
+                               max_bytes=sync_app.fragment_cache.max_bytes)
+
+
+@async_app.template_global()
+def product_card(template_name, item):
+    return fragment_cache.render(template_name, sync_app.card_key(template_name, item), item=item)
+
+mongo = {}
+
+
+@async_app.before_serving
+async def connect_mongo():
+    # Motor binds to the running event loop, so connect once it exists
+    client = AsyncIOMotorClient('mongodb://localhost:27017/')
+    mongo['db'] = client['suffixKART_db']
+
+
+@async_app.before_request
+async def sync_catalog_snapshot():
+    # Name indexes are shared with the Flask app; pick up other workers' writes.
+    # This reads MongoDB with the blocking driver, so keep it off the event loop
+    await asyncio.to_thread(sync_app.sync_catalog_snapshot)
+
+
+def collection(name):
+    return mongo['db'][name]
+
+
+async def load_by_ids(collection_name, ids):
+    ids = list({to_object_id(i) for i in ids} - {None})
+    if not ids:
+        return {}
+    docs = await collection(collection_name).find({'_id': {'$in': ids}}).to_list(None)
+    return {doc['_id']: doc for doc in docs}
+
+
+async def get_sellers(seller_ids):
+    """Seller profiles through the shared SellerCache; misses load via Motor."""
+    found, missing = sync_app.seller_cache.lookup(seller_ids)
+    if missing:
+        docs = await collection('seller_profiles').find({'_id': {'$in': missing}}).to_list(None)
+        found.update(sync_app.seller_cache.store(docs))
+    return found
+
+
+async def attach_sellers(docs, key='seller_id', field='seller'):
+    sellers = await get_sellers(doc.get(key) for doc in docs)
+    for doc in docs:
+        doc[field] = sellers.get(to_object_id(doc.get(key)))
+    return docs
+
+
+async def attach_items(docs, key='item_id', field='item'):
+    items = await load_by_ids('items', (doc.get(key) for doc in docs))
+    for doc in docs:
+        doc[field] = items.get(to_object_id(doc.get(key)))
+    return docs
+
+
+async def fetch_page(collection_name, query, after=None, page_size=PAGE_SIZE):
+    """Async twin of pagination.fetch_page (keyset pagination on _id)."""
+    if after is not None:
+        query = {'$and': [query, {'_id': {'$gt': after}}]}
+    docs = await collection(collection_name).find(query, ITEM_LIST_FIELDS) \
+        .sort('_id', 1).limit(page_size + 1).to_list(None)
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = str(docs[-1]['_id'])
+    return docs, next_cursor
+
+
+async def fetch_ranked_page(collection_name, ranked, resume=None, page_size=PAGE_SIZE):
+    """Async twin of pagination.fetch_ranked_page; its queries run concurrently."""
+    pages = await asyncio.gather(*(
+        collection(collection_name).find(query, ITEM_LIST_FIELDS).sort('_id', 1).limit(limit).to_list(None)
+        for query, limit in ranked_page_queries(ranked, resume, page_size)))
+    return finish_ranked_page([doc for page in pages for doc in page], ranked, resume, page_size)
+
+
+def page_url(cursor):
+    args = request.args.to_dict()
+    args.pop('after', None)
+    if cursor:
+        args['after'] = cursor
+    args.update(request.view_args or {})
+    return url_for(request.endpoint, **args)
+
+
+async def render_page(template_name, **context):
+    context.setdefault('page_url', page_url)
+    return await render_template(template_name, **context)
+
+
+async def browse_validators(*parts):
+    """Async twin of app.browse_validators."""
+    counters = await collection('counters').find({'_id': {'$in': PAGE_VERSION_IDS}}).to_list(None)
+    return page_validators(session, request.full_path, counters, *parts)
+
+
+async def conditional_page(validators, page):
+    """Wrap a rendered page (or response) with its validators."""
+    return set_validators(await make_response(page), validators)
+
+
+# Endpoints served natively on the event loop; everything else goes to Flask
+ASYNC_ENDPOINTS = set()
+
+
+def async_route(rule, endpoint):
+    def decorator(fn):
+        async_app.add_url_rule(rule, endpoint, fn, methods=['GET'])
+        ASYNC_ENDPOINTS.add(endpoint)
+        return fn
+    return decorator
+
+
+@async_route('/', 'index')
+async def index():
+    validators = await browse_validators()
+    if is_not_modified(request, validators):
+        return not_modified(async_app.response_class, validators)
+    sample_items = await collection('items').find().limit(5).to_list(None)
+    await attach_sellers(sample_items)
+    return await conditional_page(validators, await render_template('index.html', items=sample_items))
+
+
+@async_route('/category/<category_name>', 'browse_category')
+async def browse_category(category_name):
+    validators = await browse_validators()
+    if is_not_modified(request, validators):
+        return not_modified(async_app.response_class, validators)
+    cursor = parse_cursor(request.args.get('after'))
+    category_items, next_cursor = await fetch_page('items', {'category': category_name}, after=cursor)
+    await attach_sellers(category_items)
+    return await conditional_page(validators, await render_page(
+        'category_items.html', items=category_items, category=category_name,
+        cursor=cursor, next_cursor=next_cursor))
+
+
+async def _find_seller(seller_id):
+    """The seller's profile, or None for an unknown or malformed id."""
+    seller_id = to_object_id(seller_id)
+    if seller_id is None:
+        return None
+    return (await get_sellers([seller_id])).get(seller_id)
+
+
+async def _seller_page(seller, with_total):
+    cursor = parse_cursor(request.args.get('after'))
+    seller_query = {'seller_id': seller['_id']}
+    lookups = [fetch_page('items', seller_query, after=cursor)]
+    if with_total:
+        lookups.append(collection('items').count_documents(seller_query))
+    results = await asyncio.gather(*lookups)
+    seller_items, next_cursor = results[0]
+    total_items = results[1] if with_total else None
+    return seller_items, next_cursor, cursor, total_items
+
+
+@async_route('/view_seller/<seller_id>', 'view_seller')
+async def view_seller(seller_id):
+    # The profile normally comes from the seller cache, so checking the
+    # validators first costs one counters read
+    seller = await _find_seller(seller_id)
+    if not seller:
+        await flash('Seller not found!')
+        return redirect(url_for('index'))
+    validators = await browse_validators(seller['_id'], seller.get('date_updated') or seller.get('date_registered'))
+    if is_not_modified(request, validators):
+        return not_modified(async_app.response_class, validators)
+    seller_items, next_cursor, cursor, _ = await _seller_page(seller, with_total=False)
+    return await conditional_page(validators, await render_page(
+        'view_seller.html', seller=seller, items=seller_items, cursor=cursor, next_cursor=next_cursor))
+
+
+@async_route('/seller/<seller_id>', 'seller_dashboard')
+async def seller_dashboard(seller_id):
+    seller = await _find_seller(seller_id)
+    if not seller:
+        await flash('Seller not found!')
+        return redirect(url_for('index'))
+    seller_items, next_cursor, cursor, total_items = await _seller_page(seller, with_total=True)
+    is_owner = 'user_id' in session and str(session['user_id']) == str(seller_id)
+    return await render_page('seller_dashboard.html', seller=seller, items=seller_items,
+                             total_items=total_items, cursor=cursor, next_cursor=next_cursor,
+                             is_owner=is_owner)
+
+
+@async_route('/search_results', 'search_results')
+async def search_results():
+    query = normalize_query(request.args.get('query', ''))
+    if not query:
+        return await render_template('search_results.html', items=[], query='')
+
+    # The fuzzy index is in-process and CPU-bound; it never blocks on I/O
+    cursor = request.args.get('after')
+    resume = parse_ranked_cursor(cursor)
+    ranked = sync_app.ranked_matches(query, sync_app.search_tolerance(request.args),
+                                     after=resume[0] if resume else None)
+
+    matched_items, next_cursor = await fetch_ranked_page('items', ranked, resume)
+    if matched_items:
+        await attach_sellers(matched_items)
+
+    return await render_page('search_results.html', items=matched_items, query=query,
+                             cursor=cursor, next_cursor=next_cursor)
+
+
+@async_route('/cart', 'view_cart')
+async def view_cart():
+    user_id = session.get('user_id', None)
+    if not user_id:
+        if 'temp_cart_id' not in session:
+            session['temp_cart_id'] = str(uuid.uuid4())
+        cart_id = session['temp_cart_id']
+    else:
+        cart_id = user_id
+
+    cart_store = sync_app.cart_store
+    cart_docs = await collection(cart_store.collection.name).find(cart_store.cart_filter(cart_id)).to_list(None)
+    cart_items = cart_store.lines_of(cart_docs)
+    await attach_items(cart_items)
+
+    items_with_details = []
+    total_price = 0
+    for cart_item in cart_items:
+        item = cart_item['item']
+        if item:
+            item['cart_quantity'] = cart_item['quantity']
+            item['subtotal'] = item['price'] * cart_item['quantity']
+            total_price += item['subtotal']
+            items_with_details.append(item)
+    await attach_sellers(items_with_details)
+
+    return await render_template('cart.html', cart_items=items_with_details, total_price=total_price)
+
+
+@async_route('/buyer/dashboard', 'buyer_dashboard')
+async def buyer_dashboard():
+    user_id = session.get('user_id', None)
+    if not user_id:
+        await flash('Please log in to view your dashboard')
+        return redirect(url_for('login'))
+
+    # Credentials, orders and profile do not depend on each other
+    user, orders, buyer = await asyncio.gather(
+        collection('user_credentials').find_one({'buyer_id': ObjectId(user_id)}),
+        collection('orders').find({'buyer_id': user_id}).to_list(None),
+        collection('buyer_profiles').find_one({'_id': ObjectId(user_id)}))
+
+    if not user:
+        await flash('Buyer profile not found')
+        return redirect(url_for('index'))
+
+    return await render_template('buyer_dashboard.html', orders=orders, buyer=buyer)
+
+
+@async_route('/buyer/orders', 'view_orders')
+async def view_orders():
+    user_id = session.get('user_id', None)
+    if not user_id:
+        await flash('Please log in to view your orders')
+        return redirect(url_for('login'))
+
+    # Orders render from their item and seller snapshot; only the seller's
+    # current contact details come from the (cached) seller profiles
+    orders = await collection('orders').find({'buyer_id': user_id}).sort('date', -1).to_list(None)
+    await attach_sellers(orders)
+    return await render_template('buyer_orders.html', orders=orders)
+
+
+# Mirror the Flask URL map so url_for() in the shared templates can build
+# links to routes that are only served by the Flask app
+def _not_served_here(**kwargs):
+    raise RuntimeError('routed to the Flask app by AsyncDispatcher')
+
+
+for _rule in sync_app.app.url_map.iter_rules():
+    if _rule.endpoint not in ASYNC_ENDPOINTS and _rule.endpoint != 'static':
+        async_app.add_url_rule(_rule.rule, _rule.endpoint, _not_served_here,
+                               methods=[m for m in _rule.methods if m not in ('HEAD', 'OPTIONS')])
+
+
+class AsyncDispatcher:
+    """ASGI entry point: async endpoints go to Quart, the rest to Flask."""
+
+    def __init__(self, quart_app, flask_app):
+        self.quart_app = quart_app
+        self.flask_app = WsgiToAsgi(flask_app)
+        self.url_adapter = quart_app.url_map.bind('localhost')
+
+    def _is_async(self, scope):
+        try:
+            endpoint, _ = self.url_adapter.match(scope['path'], method=scope['method'])
+        except Exception:
+            return False
+        return endpoint in ASYNC_ENDPOINTS
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or self._is_async(scope):
+            return await self.quart_app(scope, receive, send)
+        return await self.flask_app(scope, receive, send)
+
+
+asgi_app = AsyncDispatcher(async_app, sync_app.app)
+
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [os.environ.get('SUFFIXKART_ASYNC_BIND', '127.0.0.1:5000')]
+    asyncio.run(serve(asgi_app, config))
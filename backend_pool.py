@@ -0,0 +1,164 @@
+import json
+import queue
+import subprocess
+import threading
+
+from bson import json_util
+
+
+class BackendError(Exception):
+    """A backend worker failed to answer a request."""
+
+
+class BackendBusy(BackendError):
+    """Every worker stayed busy for longer than the acquire timeout."""
+
+
+class BackendTimeout(BackendError):
+    """A worker did not answer within the request timeout."""
+
+
+class _Worker:
+    """One resident `backend.exe --serve` process."""
+
+    def __init__(self, command):
+        self.process = subprocess.Popen(
+            command + ['--serve'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        )
+        self.responses = queue.Queue()
+        # A reader thread lets us wait on stdout with a timeout on every platform
+        self.reader = threading.Thread(target=self._read_responses, daemon=True)
+        self.reader.start()
+
+    def _read_responses(self):
+        for line in self.process.stdout:
+            self.responses.put(line)
+        # None marks end of stream (worker exited)
+        self.responses.put(None)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def call(self, payload, timeout):
+        return self.call_many([payload], timeout)[0]
+
+    def call_many(self, payloads, timeout):
+        """Pipeline several requests in one write; answers come back in order."""
+        try:
+            self.process.stdin.write(''.join(payload + '\n' for payload in payloads))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise BackendError(f"backend worker is gone: {e}")
+
+        responses = []
+        for _ in payloads:
+            try:
+                line = self.responses.get(timeout=timeout)
+            except queue.Empty:
+                raise BackendTimeout(f"backend worker did not answer within {timeout}s")
+
+            if line is None:
+                raise BackendError("backend worker exited while handling the request")
+            responses.append(json.loads(line))
+        return responses
+
+    def close(self):
+        if self.alive():
+            self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class BackendPool:
+    """
+    Pool of resident backend workers speaking line-delimited JSON.
+
+    Workers are started on demand up to `size`. A request that finds every
+    worker busy waits up to `acquire_timeout` seconds and then fails with
+    BackendBusy. Workers that crash or time out are killed and replaced on
+    the next request.
+    """
+
+    def __init__(self, command, size=2, timeout=5.0, acquire_timeout=2.0):
+        self.command = list(command)
+        self.size = size
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self.restarts = 0
+
+    def request(self, algorithm, data, timeout=None):
+        """Send one request to a free worker and return the decoded response."""
+        return self.request_many([(algorithm, data)], timeout)[0]
+
+    def request_many(self, requests, timeout=None):
+        """
+        Send (algorithm, data) requests to one free worker in a single write
+        and return the decoded responses in order. `timeout` applies to each
+        response.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        payloads = [json.dumps({'algorithm': algorithm, 'data': data}, default=json_util.default)
+                    for algorithm, data in requests]
+
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise BackendBusy(f"all {self.size} backend workers are busy")
+        try:
+            # A worker that died while idle is replaced and the requests retried once
+            for attempt in range(2):
+                worker = self._checkout()
+                try:
+                    responses = worker.call_many(payloads, timeout)
+                except BackendTimeout:
+                    self._discard(worker)
+                    raise
+                except (BackendError, ValueError):
+                    self._discard(worker)
+                    if attempt == 1:
+                        raise
+                    continue
+                self._idle.put(worker)
+                return responses
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Stop every worker."""
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+    def _checkout(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker.alive():
+                return worker
+            self._discard(worker)
+
+        worker = _Worker(self.command)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker):
+        worker.close()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.discard(worker)
+                self.restarts += 1
@@ -0,0 +1,365 @@
+"""
+Algorithm micro-benchmarks for SuffixKART.
+
+Generates a deterministic synthetic grocery catalog (items, sellers, orders)
+and times each algorithm path against it, in-process and through
+backend.exe. Results are printed as JSON (one object per scale) so they can
+be diffed between runs or fed to a regression check.
+
+Usage:
+    python benchmark.py                       # 1k and 10k items, in-memory
+    python benchmark.py --scales 1000 100000 1000000 --output bench.json   # ~5 minutes at 1M, no BK-tree
+    python benchmark.py --mongo-uri mongodb://localhost:27017/   # also load a local mongod
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from bson import ObjectId
+
+from backend_pool import BackendError, BackendPool
+from bloom_filter import ScalableBloomFilter
+from catalog_snapshot import SnapshotStore, write_snapshot
+from fuzzy_index import FuzzyIndex
+from fuzzy_scan import ScanMatcher
+from fuzzy_trigram import TrigramMatcher
+from order_index import OrderIndex
+
+
+CATEGORIES = [
+    'Fruits & Vegetables', 'Dairy & Eggs', 'Meat & Seafood', 'Bakery',
+    'Pantry Staples', 'Frozen Foods', 'Snacks', 'Beverages',
+    'Household Items', 'Health & Personal Care', 'Other'
+]
+
+_ADJECTIVES = ['Organic', 'Fresh', 'Whole', 'Low Fat', 'Free Range', 'Smoked', 'Frozen',
+               'Sliced', 'Wild', 'Roasted', 'Salted', 'Unsalted', 'Greek', 'Baby', 'Large']
+_PRODUCTS = ['Milk', 'Bread', 'Eggs', 'Butter', 'Cheese', 'Yogurt', 'Apples', 'Bananas',
+             'Spinach', 'Carrots', 'Chicken Breast', 'Salmon', 'Rice', 'Pasta', 'Oats',
+             'Coffee', 'Tea', 'Orange Juice', 'Chips', 'Cookies', 'Detergent', 'Shampoo',
+             'Tomatoes', 'Onions', 'Potatoes', 'Almonds', 'Honey', 'Flour', 'Sugar', 'Ice Cream']
+_VARIANTS = ['', ' 1L', ' 2L', ' 500g', ' 1kg', ' 6 Pack', ' 12 Pack', ' Family Size', ' Mini']
+_BRANDS = ['Green Valley', 'Sunrise', 'Harvest', 'Blue Ocean', 'Golden Field', 'Urban Farm']
+_FIRST_NAMES = ['Alice', 'Bob', 'Carol', 'Dave', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy']
+
+# BK_Tree.cpp keeps a node's children for edit distances below 2 * LEN (20)
+# and a search reads the slots up to distance + TOL (2), so names sent to it
+# inline, and their one-typo queries, must stay well short of that
+BACKEND_NAME_LEN = 16
+
+# How much slower tracemalloc makes allocation-heavy builds (the BK-tree's
+# big-int distance loop is the worst case)
+TRACE_SLOWDOWN = 25
+
+
+def generate_catalog(size, seed=42):
+    """
+    Deterministic synthetic catalog with `size` items.
+
+    Returns dict with 'sellers', 'items' and 'orders' lists shaped like the
+    MongoDB documents app.py stores. Names are unique, like add_item enforces.
+    """
+    rng = random.Random(seed)
+    sellers = [{'_id': ObjectId(), 'name': f"{brand} Market {i}"}
+               for i, brand in enumerate(_BRANDS * max(1, size // 5000))]
+    items = []
+    seen = set()
+    while len(items) < size:
+        name = f"{rng.choice(_BRANDS)} {rng.choice(_ADJECTIVES)} {rng.choice(_PRODUCTS)}{rng.choice(_VARIANTS)}"
+        if name in seen:
+            name = f"{name} #{len(items)}"
+        seen.add(name)
+        items.append({
+            '_id': ObjectId(),
+            'name': name,
+            'price': round(rng.uniform(0.5, 25.0), 2),
+            'quantity': rng.randint(0, 100),
+            'category': rng.choice(CATEGORIES),
+            'seller_id': rng.choice(sellers)['_id'],
+            'description': 'Synthetic benchmark item'
+        })
+    orders = []
+    for _ in range(size):
+        item = rng.choice(items)
+        orders.append({
+            '_id': ObjectId(),
+            'buyer_id': str(rng.randint(1, max(10, size // 20))),
+            'buyer_name': f"{rng.choice(_FIRST_NAMES)} {rng.randint(1, 999)}",
+            'item_id': item['_id'],
+            'seller_id': item['seller_id'],
+            'quantity': rng.randint(1, 5),
+            'price': item['price']
+        })
+    return {'sellers': sellers, 'items': items, 'orders': orders}
+
+
+def misspell(name, rng):
+    """Introduce one random edit, like a shopper's typo."""
+    if len(name) < 2:
+        return name
+    i = rng.randrange(len(name))
+    edit = rng.choice(('delete', 'replace', 'insert'))
+    if edit == 'delete':
+        return name[:i] + name[i + 1:]
+    letter = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    if edit == 'replace':
+        return name[:i] + letter + name[i + 1:]
+    return name[:i] + letter + name[i:]
+
+
+def measure(fn, inputs, max_seconds):
+    """
+    Call fn once per input (stopping early after max_seconds) and return
+    throughput, latency percentiles and the peak memory allocated by the
+    calls. Memory is traced in a separate pass over a few inputs so the
+    tracing overhead does not skew the latencies.
+    """
+    inputs = list(inputs)
+    tracemalloc.start()
+    started = time.perf_counter()
+    for value in inputs[:10]:
+        fn(value)
+        # Slow calls (a full scan of a large catalog) are traced once, not ten times
+        if time.perf_counter() - started > max_seconds:
+            break
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    started = time.perf_counter()
+    for value in inputs:
+        t0 = time.perf_counter()
+        fn(value)
+        latencies.append(time.perf_counter() - t0)
+        if time.perf_counter() - started > max_seconds:
+            break
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'calls': len(latencies),
+        'ops_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'peak_mem_kb': peak / 1024
+    }
+
+
+def measure_build(fn, max_seconds=0):
+    """
+    Time one build step, then trace its peak memory by building again, as
+    traced builds run up to TRACE_SLOWDOWN times slower. The traced pass is
+    skipped (peak_mem_kb None) when it would take longer than max_seconds;
+    the default 0 suits steps that must not run twice.
+    """
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    peak = None
+    if elapsed * TRACE_SLOWDOWN <= max_seconds:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return result, {'seconds': elapsed, 'peak_mem_kb': peak}
+
+
+def run_scale(size, args, workdir):
+    catalog = generate_catalog(size, seed=args.seed)
+    rng = random.Random(args.seed + size)
+    names = [item['name'] for item in catalog['items']]
+    item_names = {item['_id']: item['name'] for item in catalog['items']}
+    queries = [misspell(rng.choice(names), rng) for _ in range(args.queries)]
+    new_names = [f"Benchmark New Item {i}" for i in range(args.queries)]
+    report = {'scale': size, 'results': {}}
+    results = report['results']
+
+    # Fuzzy search: BK-Tree vs bit-parallel scan vs trigram-pruned scoring.
+    # A BK-tree takes minutes to build over a million names, so large
+    # catalogs skip it
+    if size <= args.bktree_max_items:
+        bktree, results['bktree_build'] = measure_build(lambda: FuzzyIndex(names), args.max_seconds)
+        results['bktree_search'] = measure(bktree.search, queries, args.max_seconds)
+    else:
+        results['bktree_build'] = {'skipped': f"more than --bktree-max-items={args.bktree_max_items} items"}
+    scan, results['scan_build'] = measure_build(lambda: ScanMatcher(names), args.max_seconds)
+    results['scan_search'] = measure(scan.search, queries, args.max_seconds)
+    trigram, results['trigram_build'] = measure_build(lambda: TrigramMatcher(names), args.max_seconds)
+    results['trigram_search'] = measure(trigram.search, queries, args.max_seconds)
+    # Ranked top-k, one search-results page worth of names
+    results['trigram_nearest'] = measure(lambda query: trigram.nearest(query, 25), queries, args.max_seconds)
+
+    # Bloom filter duplicate checks
+    bloom_path = os.path.join(workdir, f"bench_{size}.bloom")
+    bloom = ScalableBloomFilter(bloom_path, capacity=max(1000, 2 * size))
+    _, results['bloom_build'] = measure_build(lambda: bloom.add_many(names))
+    results['bloom_check'] = measure(lambda name: name in bloom, queries + new_names, args.max_seconds)
+    results['bloom_add'] = measure(bloom.add, new_names, args.max_seconds)
+    bloom.close()
+    for entry in os.listdir(workdir):
+        if entry.startswith(f"bench_{size}.bloom"):
+            os.remove(os.path.join(workdir, entry))
+
+    # Shared catalog snapshot: full publish, attach, and one-item publish + sync
+    store = SnapshotStore(os.path.join(workdir, f"bench_{size}.snapshot"))
+    with store.lock():
+        snapshot, results['snapshot_publish'] = measure_build(lambda: store.publish(catalog['items']))
+    results['snapshot_bytes'] = os.path.getsize(snapshot.path)
+    _, results['snapshot_name_counts'] = measure_build(snapshot.name_counts, args.max_seconds)
+
+    def publish_one(name):
+        nonlocal snapshot
+        with store.lock():
+            newer = store.publish_changes(snapshot, [{'_id': ObjectId(), 'name': name}])
+        snapshot.name_changes(newer)
+        snapshot.close()
+        snapshot = newer
+    results['snapshot_publish_change'] = measure(publish_one, new_names[:20], args.max_seconds)
+    snapshot.close()
+    for entry in os.listdir(workdir):
+        if entry.startswith(f"bench_{size}.snapshot"):
+            os.remove(os.path.join(workdir, entry))
+
+    # Order history substring search
+    orders = [(order['_id'], order['buyer_name'], item_names[order['item_id']]) for order in catalog['orders']]
+    order_index, results['order_index_build'] = measure_build(lambda: OrderIndex(orders), args.max_seconds)
+    patterns = [rng.choice(_PRODUCTS).lower() for _ in range(args.queries)]
+    results['order_index_search'] = measure(order_index.search, patterns, args.max_seconds)
+    new_orders = [(ObjectId(), 'Bench Buyer', name) for name in new_names]
+    results['order_index_add'] = measure(lambda order: order_index.add(*order), new_orders, args.max_seconds)
+
+    # Backend round trips, if the executable is available. Inline item lists
+    # go to BK_Tree.cpp, which holds at most BMAX nodes of short names (see
+    # BACKEND_NAME_LEN), so they carry short product names rather than the
+    # catalog's; catalog requests map the whole catalog file
+    if args.backend and os.path.exists(args.backend):
+        short_names = [product + variant for product in _PRODUCTS for variant in _VARIANTS
+                       if len(product + variant) <= BACKEND_NAME_LEN]
+        backend_names = rng.sample(short_names, min(args.backend_items, len(short_names)))
+        backend_queries = [misspell(rng.choice(backend_names), rng) for _ in range(args.queries)]
+        bktree_payloads = [{'query': q, 'items': backend_names, 'tolerance': 2} for q in backend_queries]
+        results['backend_items'] = len(backend_names)
+        catalog_path = os.path.abspath(os.path.join(workdir, f"bench_{size}.catalog"))
+        write_snapshot(catalog_path, catalog['items'], generation=1, version=1)
+        catalog_ref = {'path': catalog_path, 'version': 1}
+        catalog_bktree_payloads = [{'query': q, 'tolerance': 2, 'catalog': catalog_ref} for q in queries]
+        catalog_bloom_payloads = [{'operation': 'check', 'item_name': q, 'catalog': catalog_ref}
+                                  for q in queries]
+
+        def spawn(algorithm):
+            def call(payload):
+                subprocess.run([args.backend, algorithm, json.dumps(payload)],
+                               capture_output=True, text=True, check=True)
+            return call
+
+        bloom_payloads = [{'operation': 'check', 'item_name': q} for q in queries]
+        pool = BackendPool([args.backend], size=1, timeout=60)
+        try:
+            for label, fn, payloads in [
+                ('backend_spawn_bloom', spawn('bloom'), bloom_payloads),
+                ('backend_pool_bloom', lambda payload: pool.request('bloom', payload), bloom_payloads),
+                ('backend_spawn_bktree', spawn('bktree'), bktree_payloads),
+                ('backend_pool_bktree', lambda payload: pool.request('bktree', payload), bktree_payloads),
+                ('backend_spawn_catalog_bktree', spawn('bktree'), catalog_bktree_payloads),
+                ('backend_pool_catalog_bktree', lambda payload: pool.request('bktree', payload),
+                 catalog_bktree_payloads),
+                ('backend_pool_catalog_bloom', lambda payload: pool.request('bloom', payload),
+                 catalog_bloom_payloads),
+            ]:
+                # A crashing backend is reported, not fatal for the whole run
+                try:
+                    results[label] = measure(fn, payloads, args.max_seconds)
+                except (OSError, subprocess.CalledProcessError, BackendError) as e:
+                    results[label] = {'error': str(e)[:200]}
+        finally:
+            pool.close()
+            os.remove(catalog_path)
+
+    if args.mongo_uri:
+        results.update(run_mongo(catalog, queries, args))
+
+    report['max_rss_kb'] = _max_rss_kb()
+    return report
+
+
+def _max_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return rss / 1024 if sys.platform == 'darwin' else rss
+
+
+def run_mongo(catalog, queries, args):
+    """Load the catalog into a scratch database on a local mongod and time the lookups app.py does."""
+    from pymongo import MongoClient
+    from db_indexes import ensure_indexes
+
+    client = MongoClient(args.mongo_uri)
+    db_name = f"suffixKART_bench_{len(catalog['items'])}"
+    client.drop_database(db_name)
+    db = client[db_name]
+    results = {}
+    try:
+        _, results['mongo_load'] = measure_build(lambda: (
+            db['seller_profiles'].insert_many(catalog['sellers']),
+            db['items'].insert_many(catalog['items']),
+            db['orders'].insert_many(catalog['orders'])
+        ))
+        ensure_indexes(db)
+        names = [item['name'] for item in catalog['items'][:args.queries]]
+        results['mongo_find_by_name'] = measure(lambda name: db['items'].find_one({'name': name}),
+                                                names, args.max_seconds)
+        results['mongo_full_name_scan'] = measure(
+            lambda _: [item['name'] for item in db['items'].find({}, {'name': 1})],
+            range(min(args.queries, 20)), args.max_seconds)
+    finally:
+        client.drop_database(db_name)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the SuffixKART algorithm paths.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000],
+                        help='catalog sizes to benchmark (e.g. 1000 10000 100000 1000000)')
+    parser.add_argument('--queries', type=int, default=200, help='queries per benchmark')
+    parser.add_argument('--max-seconds', type=float, default=10.0,
+                        help='stop a benchmark after this many seconds')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--bktree-max-items', type=int, default=200000,
+                        help='skip the in-process BK-tree above this catalog size')
+    parser.add_argument('--backend', default='./backend.exe',
+                        help='backend executable to time (skipped if missing)')
+    parser.add_argument('--backend-items', type=int, default=90,
+                        help='short product names sent to the backend inline (its BK-tree holds at most BMAX=100)')
+    parser.add_argument('--mongo-uri', help='also load each catalog into this mongod')
+    parser.add_argument('--workdir', default='.', help='directory for temporary files')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scales': [run_scale(size, args, args.workdir) for size in args.scales]
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,12 +2,15 @@
 #include"bloom.hpp"
 #define ll long long
 using namespace std;
+// Hashes stay in [0, arrSize) for any input: bytes are read unsigned
+// (UTF-8 names) and powers are taken modulo arrSize, so long names do not
+// overflow into negative bit indexes
 int h1(string s, int arrSize)
 {
     ll int hash = 8;
     for (int i = 0; i < s.size(); i++)
     {
-        hash = (hash * 37 + s[i]) % arrSize;
+        hash = (hash * 37 + (unsigned char)s[i]) % arrSize;
     }
     return hash % arrSize;
 }
@@ -16,7 +19,7 @@ int h2(string s, int arrSize)
     ll int hash = 0;
     for (int i = 0; i < s.size(); i++)
     {
-        hash = (hash + ((int)s[i]));
+        hash = (hash + ((unsigned char)s[i]));
         hash = hash % arrSize;
     }
     return hash;
@@ -24,21 +27,24 @@ int h2(string s, int arrSize)
 int h3(string s, int arrSize)
 {
     ll int hash = 1;
+    ll int power = 1;
     for (int i = 0; i < s.size(); i++)
     {
-        hash = hash + pow(17, i) * s[i];
+        hash = hash + power * (unsigned char)s[i];
         hash = hash % arrSize;
+        power = power * 17 % arrSize;
     }
     return hash % arrSize;
 }
 int h4(string s, int arrSize)
 {
     ll int hash = 4;
-    int p = 8;
+    ll int power = 1;
     for (int i = 0; i < s.size(); i++)
     {
-        hash += hash * 8 + s[0] * pow(11, i);
+        hash += hash * 8 + (unsigned char)s[0] * power;
         hash = hash % arrSize;
+        power = power * 11 % arrSize;
     }
     return hash;
 }
@@ -69,13 +75,13 @@ int insert(bool *bit, int Size, string s)
         bit[c] = true;
         bit[d] = true;
 
-        cout << s << " inserted" << endl;
+        cerr << s << " inserted" << endl;
         return 1;
     }
     else
     {
 
-        cout << s << " is Probably already present" << endl;
+        cerr << s << " is Probably already present" << endl;
         return 0;
     }
 }
@@ -0,0 +1,220 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Layer file header: magic, format version, hash count, capacity, bit count, item count
+_HEADER = struct.Struct('<4sIIQQQ')
+_MAGIC = b'SKBF'
+_VERSION = 1
+_COUNT_OFFSET = _HEADER.size - 8
+
+
+def _hash_pair(name):
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size=16).digest()
+    return struct.unpack('<QQ', digest)
+
+
+class _BloomLayer:
+    """One fixed-size Bloom filter stored in a memory-mapped file."""
+
+    def __init__(self, path, capacity=None, error_rate=None):
+        self.path = path
+        if capacity is not None:
+            self._create(capacity, error_rate)
+        self._file = open(path, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        magic, version, self.num_hashes, self.capacity, self.num_bits, _ = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a bloom filter file")
+
+    def _create(self, capacity, error_rate):
+        # Standard sizing: m = -n ln p / (ln 2)^2, k = m / n ln 2
+        num_bits = max(64, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+        # Never truncate a layer another handle may already be using
+        with open(self.path, 'xb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, num_hashes, capacity, num_bits, 0))
+            f.truncate(_HEADER.size + (num_bits + 7) // 8)
+
+    @property
+    def count(self):
+        return struct.unpack_from('<Q', self._mm, _COUNT_OFFSET)[0]
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def _positions(self, h1, h2):
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def contains(self, h1, h2):
+        mm = self._mm
+        base = _HEADER.size
+        for bit in self._positions(h1, h2):
+            if not mm[base + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def add(self, h1, h2):
+        mm = self._mm
+        base = _HEADER.size
+        for bit in self._positions(h1, h2):
+            mm[base + (bit >> 3)] |= 1 << (bit & 7)
+        struct.pack_into('<Q', mm, _COUNT_OFFSET, self.count + 1)
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        if not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+
+class ScalableBloomFilter:
+    """
+    Scalable Bloom filter persisted to memory-mapped files.
+
+    The first layer is sized for `capacity` names at `error_rate`. When a
+    layer is full a new one is added with `growth` times the capacity and a
+    tighter error rate, so the overall false-positive rate stays bounded as
+    the catalog grows. Layer i lives in `<path>.<i>`; reopening the same path
+    maps the existing layers instead of rebuilding them.
+
+    Several processes may share one path. Every change (bits, counts, new
+    layers) is made under an exclusive lock on `<path>.lock`, and a handle
+    maps the layers other handles have added before it adds or looks up.
+    """
+
+    def __init__(self, path, capacity=1000, error_rate=0.001, growth=2, tightening=0.5):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self._lock = threading.Lock()
+        self._lock_file = open(f"{path}.lock", 'a+b')
+        self._layers = []
+        with self._lock, self._file_lock():
+            self._refresh_layers()
+            if self._layers:
+                # Keep growing an existing filter with the sizing it was created with
+                self.capacity = self._layers[0].capacity
+
+    def _layer_path(self, index):
+        return f"{self.path}.{index}"
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive cross-process lock; take self._lock first."""
+        f = self._lock_file
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _refresh_layers(self):
+        # Layers are created under the file lock, so holding it means every
+        # file found is complete
+        while os.path.exists(self._layer_path(len(self._layers))):
+            self._layers.append(_BloomLayer(self._layer_path(len(self._layers))))
+
+    def _add_layer(self):
+        index = len(self._layers)
+        capacity = self.capacity * self.growth ** index
+        error_rate = self.error_rate * self.tightening ** (index + 1)
+        self._layers.append(_BloomLayer(self._layer_path(index), capacity, error_rate))
+
+    def __contains__(self, name):
+        h1, h2 = _hash_pair(name)
+        if os.path.exists(self._layer_path(len(self._layers))):
+            with self._lock, self._file_lock():
+                self._refresh_layers()
+        return any(layer.contains(h1, h2) for layer in self._layers)
+
+    def add(self, name):
+        """Add a name; returns False if it was (probably) already present."""
+        return self.add_many([name]) == 1
+
+    def add_many(self, names):
+        """Add several names under one lock; returns how many were new."""
+        added = 0
+        with self._lock, self._file_lock():
+            self._refresh_layers()
+            for name in names:
+                h1, h2 = _hash_pair(name)
+                if any(layer.contains(h1, h2) for layer in self._layers):
+                    continue
+                if not self._layers or self._layers[-1].is_full():
+                    self._add_layer()
+                self._layers[-1].add(h1, h2)
+                added += 1
+        return added
+
+    def __len__(self):
+        return sum(layer.count for layer in self._layers)
+
+    def rebuild(self, names, capacity=None):
+        """
+        Drop every layer and refill the filter from `names`. Other handles
+        on the same path must be reopened afterwards.
+        """
+        with self._lock, self._file_lock():
+            self._refresh_layers()
+            self._close_layers(remove=True)
+            if capacity is not None:
+                self.capacity = capacity
+        self.add_many(names)
+
+    def flush(self):
+        for layer in self._layers:
+            layer.flush()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._close_layers()
+            self._lock_file.close()
+
+    def _close_layers(self, remove=False):
+        for layer in self._layers:
+            layer.close()
+            if remove:
+                os.remove(layer.path)
+        self._layers = []
+
+
+def open_name_filter(path, names, error_rate=0.001):
+    """
+    Open the persisted item-name filter and top it up with any catalog name
+    it does not know yet (e.g. items inserted while the app was down).
+
+    A new filter is sized for twice the current catalog so it does not need
+    to grow right away.
+    """
+    bloom = ScalableBloomFilter(path, capacity=max(1000, 2 * len(names)), error_rate=error_rate)
+    bloom.add_many(names)
+    bloom.flush()
+    return bloom
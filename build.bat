@@ -27,7 +27,7 @@ if exist "backend.exe" (
 
 REM Compile the backend executable
 echo Compiling to %OUTPUT_NAME%...
-g++ -std=c++17 main.cpp bloom.cpp BK_Tree.cpp Suffix_tree.c PatternSearch.c -o %OUTPUT_NAME%
+g++ -std=c++17 main.cpp bloom.cpp BK_Tree.cpp catalog.cpp Suffix_tree.c PatternSearch.c -o %OUTPUT_NAME%
 
 if %ERRORLEVEL% neq 0 (
     echo Compilation failed
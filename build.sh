@@ -0,0 +1,16 @@
+#!/bin/sh
+# Linux/macOS counterpart of build.bat
+set -e
+echo "Compiling SuffixKART backend..."
+
+# Fetch nlohmann/json into include/ if it is not there yet
+mkdir -p include
+if [ ! -f include/json.hpp ]; then
+    echo "Downloading nlohmann/json library..."
+    curl -sSL -o include/json.hpp https://github.com/nlohmann/json/releases/download/v3.11.3/json.hpp
+fi
+
+# Same name as on Windows, so listen.py and benchmark.py find it by default
+g++ -std=c++17 main.cpp bloom.cpp BK_Tree.cpp catalog.cpp Suffix_tree.c PatternSearch.c -o backend.exe
+
+echo "Compilation successful! Backend executable created as backend.exe"
@@ -0,0 +1,209 @@
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+
+# Cart lines are handed to the views as dicts with item_id, quantity and
+# date_added, whichever storage layout is in use.
+
+
+class LineCartStore:
+    """
+    One document per cart line in the `cart` collection:
+    {cart_id, item_id, quantity, date_added}.
+    """
+
+    def __init__(self, db):
+        self.collection = db['cart']
+
+    def cart_filter(self, cart_id):
+        return {'cart_id': cart_id}
+
+    def lines_of(self, docs):
+        return list(docs)
+
+    def get_lines(self, cart_id):
+        return self.lines_of(self.collection.find(self.cart_filter(cart_id)))
+
+    def add(self, cart_id, item_id, quantity):
+        """Add quantity to a line, creating it if needed, in one upsert."""
+        self.collection.update_one(
+            {'cart_id': cart_id, 'item_id': item_id},
+            {'$inc': {'quantity': quantity}, '$setOnInsert': {'date_added': datetime.now()}},
+            upsert=True
+        )
+
+    def set_quantity(self, cart_id, item_id, quantity):
+        self.collection.update_one({'cart_id': cart_id, 'item_id': item_id},
+                                   {'$set': {'quantity': quantity}})
+
+    def remove(self, cart_id, item_id):
+        self.collection.delete_one({'cart_id': cart_id, 'item_id': item_id})
+
+    def clear(self, cart_id, session=None):
+        self.collection.delete_many({'cart_id': cart_id}, session=session)
+
+    def merge(self, from_cart_id, into_cart_id):
+        """Move every line of one cart into another, adding up quantities."""
+        if from_cart_id == into_cart_id:
+            return
+        lines = self.get_lines(from_cart_id)
+        if not lines:
+            return
+        self.collection.bulk_write([
+            UpdateOne({'cart_id': into_cart_id, 'item_id': line['item_id']},
+                      {'$inc': {'quantity': line['quantity']},
+                       '$setOnInsert': {'date_added': line.get('date_added', datetime.now())}},
+                      upsert=True)
+            for line in lines
+        ], ordered=False)
+        self.clear(from_cart_id)
+
+
+class DocumentCartStore:
+    """
+    One document per cart in the `carts` collection:
+    {_id: cart_id, lines: {item_id: {quantity, date_added}}, date_updated}.
+
+    Every change is a single atomic update on the cart document, so
+    concurrent clicks can not lose quantities or create duplicate lines.
+    """
+
+    def __init__(self, db):
+        self.collection = db['carts']
+
+    def cart_filter(self, cart_id):
+        return {'_id': cart_id}
+
+    def lines_of(self, docs):
+        lines = []
+        for doc in docs:
+            for item_id, line in (doc.get('lines') or {}).items():
+                lines.append({
+                    'cart_id': doc['_id'],
+                    'item_id': item_id,
+                    'quantity': line['quantity'],
+                    'date_added': line.get('date_added')
+                })
+        lines.sort(key=lambda line: line['date_added'] or datetime.min)
+        return lines
+
+    def get_lines(self, cart_id):
+        return self.lines_of(self.collection.find(self.cart_filter(cart_id)))
+
+    def add(self, cart_id, item_id, quantity, date_added=None):
+        """
+        Add quantity to a line, creating the cart and line if needed, in one upsert.
+        date_added: when the line was first added, if earlier than now
+        """
+        now = datetime.now()
+        self.collection.update_one(
+            {'_id': cart_id},
+            {
+                '$inc': {f'lines.{item_id}.quantity': quantity},
+                # $min keeps the earliest date_added, and sets it on a new line
+                '$min': {f'lines.{item_id}.date_added': date_added or now},
+                '$set': {'date_updated': now}
+            },
+            upsert=True
+        )
+
+    def set_quantity(self, cart_id, item_id, quantity):
+        # Only touch lines that exist, like the line store does
+        self.collection.update_one(
+            {'_id': cart_id, f'lines.{item_id}': {'$exists': True}},
+            {'$set': {f'lines.{item_id}.quantity': quantity, 'date_updated': datetime.now()}}
+        )
+
+    def remove(self, cart_id, item_id):
+        self.collection.update_one(
+            {'_id': cart_id},
+            {'$unset': {f'lines.{item_id}': ''}, '$set': {'date_updated': datetime.now()}}
+        )
+
+    def clear(self, cart_id, session=None):
+        self.collection.delete_one({'_id': cart_id}, session=session)
+
+    def merge(self, from_cart_id, into_cart_id):
+        """
+        Merge one cart into another on the server with a single $merge
+        aggregation: quantities of lines in both carts are added up and the
+        older date_added is kept. The source cart is deleted afterwards.
+        """
+        if from_cart_id == into_cart_id:
+            return
+        now = datetime.now()
+        self.collection.aggregate([
+            {'$match': {'_id': from_cart_id}},
+            {'$project': {'_id': {'$literal': into_cart_id}, 'lines': 1, 'date_updated': {'$literal': now}}},
+            {'$merge': {
+                'into': self.collection.name,
+                'on': '_id',
+                'whenMatched': [{'$set': {
+                    'lines': {'$reduce': {
+                        'input': {'$objectToArray': {'$ifNull': ['$$new.lines', {}]}},
+                        'initialValue': {'$ifNull': ['$lines', {}]},
+                        'in': {'$let': {
+                            'vars': {'existing': {'$arrayElemAt': [
+                                {'$map': {
+                                    'input': {'$filter': {
+                                        'input': {'$objectToArray': '$$value'},
+                                        'as': 'line',
+                                        'cond': {'$eq': ['$$line.k', '$$this.k']}
+                                    }},
+                                    'as': 'line',
+                                    'in': '$$line.v'
+                                }},
+                                0
+                            ]}},
+                            'in': {'$mergeObjects': ['$$value', {'$arrayToObject': [[{
+                                'k': '$$this.k',
+                                'v': {
+                                    'quantity': {'$add': [
+                                        '$$this.v.quantity',
+                                        {'$ifNull': ['$$existing.quantity', 0]}
+                                    ]},
+                                    # $min skips a missing date
+                                    'date_added': {'$min': ['$$existing.date_added', '$$this.v.date_added']}
+                                }
+                            }]]}]}
+                        }}
+                    }},
+                    'date_updated': '$$new.date_updated'
+                }}],
+                'whenNotMatched': 'insert'
+            }}
+        ])
+        self.clear(from_cart_id)
+
+
+def migrate_line_carts(db):
+    """
+    Move carts kept one line per document (`cart`, the `lines` mode) into
+    the cart documents of the `document` mode, adding up quantities of
+    lines already there. Each line is claimed with find_one_and_delete, so
+    workers starting together move every line exactly once.
+    Returns the number of lines moved.
+    """
+    lines = db['cart']
+    carts = DocumentCartStore(db)
+    moved = 0
+    while True:
+        line = lines.find_one_and_delete({})
+        if line is None:
+            return moved
+        carts.add(line['cart_id'], str(line['item_id']), line['quantity'], line.get('date_added'))
+        moved += 1
+
+
+CART_STORES = {
+    'lines': LineCartStore,
+    'document': DocumentCartStore,
+}
+
+
+def create_cart_store(db, mode='document'):
+    """Cart storage for SUFFIXKART_CART_MODE (`document` or `lines`)."""
+    if mode not in CART_STORES:
+        raise ValueError(f"Unknown cart mode {mode!r}; expected one of {sorted(CART_STORES)}")
+    return CART_STORES[mode](db)
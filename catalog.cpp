@@ -0,0 +1,179 @@
+#include <bits/stdc++.h>
+#include "catalog.hpp"
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+using namespace std;
+
+// Header layout, see catalog_snapshot.py: magic, format, generation,
+// catalog version, item/name/category/seller counts, section offsets
+static const uint32_t FORMAT_VERSION = 2;
+static const size_t HEADER_SIZE = 88;
+static const size_t ITEM_SIZE = 24;
+
+static unique_ptr<CatalogFile> current_catalog;
+
+template <typename T>
+static T readAt(const char *data, size_t offset)
+{
+    T value;
+    memcpy(&value, data + offset, sizeof(T));
+    return value;
+}
+
+static void mapFile(CatalogFile &catalog)
+{
+#ifdef _WIN32
+    HANDLE file = CreateFileA(catalog.path.c_str(), GENERIC_READ, FILE_SHARE_READ | FILE_SHARE_DELETE,
+                              NULL, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, NULL);
+    if (file == INVALID_HANDLE_VALUE)
+        throw runtime_error("cannot open catalog " + catalog.path);
+    LARGE_INTEGER size;
+    GetFileSizeEx(file, &size);
+    HANDLE mapping = CreateFileMappingA(file, NULL, PAGE_READONLY, 0, 0, NULL);
+    if (mapping == NULL)
+    {
+        CloseHandle(file);
+        throw runtime_error("cannot map catalog " + catalog.path);
+    }
+    catalog.data = (const char *)MapViewOfFile(mapping, FILE_MAP_READ, 0, 0, 0);
+    catalog.size = (size_t)size.QuadPart;
+    catalog.file_handle = file;
+    catalog.mapping_handle = mapping;
+#else
+    int fd = open(catalog.path.c_str(), O_RDONLY);
+    if (fd < 0)
+        throw runtime_error("cannot open catalog " + catalog.path);
+    struct stat st;
+    fstat(fd, &st);
+    catalog.size = (size_t)st.st_size;
+    void *data = mmap(NULL, catalog.size, PROT_READ, MAP_SHARED, fd, 0);
+    // The mapping keeps the file alive, even once Python removes an old generation
+    close(fd);
+    if (data == MAP_FAILED)
+        throw runtime_error("cannot map catalog " + catalog.path);
+    catalog.data = (const char *)data;
+#endif
+}
+
+static void unmapFile(CatalogFile &catalog)
+{
+#ifdef _WIN32
+    UnmapViewOfFile(catalog.data);
+    CloseHandle(catalog.mapping_handle);
+    CloseHandle(catalog.file_handle);
+#else
+    munmap((void *)catalog.data, catalog.size);
+#endif
+}
+
+static void loadNames(CatalogFile &catalog)
+{
+    const char *data = catalog.data;
+    uint32_t name_count = readAt<uint32_t>(data, 28);
+    uint64_t name_offsets = readAt<uint64_t>(data, 40);
+    uint64_t name_blob = readAt<uint64_t>(data, 48);
+    uint64_t items = readAt<uint64_t>(data, 80);
+    if (items + (uint64_t)catalog.item_count * ITEM_SIZE > catalog.size ||
+        name_offsets + 4 * ((uint64_t)name_count + 1) > catalog.size)
+        throw runtime_error("catalog " + catalog.path + " is truncated");
+
+    // Incremental publishes may leave a name in the table more than once or
+    // unused, so collect the distinct names items actually refer to
+    vector<char> used(name_count, 0);
+    for (uint32_t i = 0; i < catalog.item_count; i++)
+    {
+        uint32_t index = readAt<uint32_t>(data, items + i * ITEM_SIZE + 12);
+        if (index < name_count)
+            used[index] = 1;
+    }
+    unordered_set<string_view> seen;
+    for (uint32_t index = 0; index < name_count; index++)
+    {
+        if (!used[index])
+            continue;
+        uint32_t start = readAt<uint32_t>(data, name_offsets + 4 * index);
+        uint32_t end = readAt<uint32_t>(data, name_offsets + 4 * (index + 1));
+        if (name_blob + end > catalog.size || start > end)
+            throw runtime_error("catalog " + catalog.path + " has a bad name table");
+        string_view name(data + name_blob + start, end - start);
+        if (seen.insert(name).second)
+            catalog.names.push_back(name);
+    }
+}
+
+CatalogFile &openCatalog(const string &path, uint64_t version)
+{
+    if (!current_catalog || current_catalog->path != path)
+    {
+        unique_ptr<CatalogFile> catalog(new CatalogFile());
+        catalog->path = path;
+        catalog->bloom_size = 0;
+        mapFile(*catalog);
+        if (catalog->size < HEADER_SIZE || memcmp(catalog->data, "SKCS", 4) != 0 ||
+            readAt<uint32_t>(catalog->data, 4) != FORMAT_VERSION)
+        {
+            unmapFile(*catalog);
+            throw runtime_error(path + " is not a catalog snapshot");
+        }
+        catalog->generation = readAt<uint64_t>(catalog->data, 8);
+        catalog->version = readAt<uint64_t>(catalog->data, 16);
+        catalog->item_count = readAt<uint32_t>(catalog->data, 24);
+        try
+        {
+            loadNames(*catalog);
+        }
+        catch (...)
+        {
+            unmapFile(*catalog);
+            throw;
+        }
+        if (current_catalog)
+            unmapFile(*current_catalog);
+        current_catalog = move(catalog);
+    }
+    if (current_catalog->version != version)
+        throw runtime_error("catalog " + path + " holds version " + to_string(current_catalog->version) +
+                            ", not " + to_string(version));
+    return *current_catalog;
+}
+
+bool withinDistance(string_view query, string_view name, int tolerance)
+{
+    int n = query.size(), m = name.size();
+    if (abs(n - m) > tolerance)
+        return false;
+    // Banded Levenshtein: only cells within `tolerance` of the diagonal can
+    // stay under the bound; stop as soon as a whole row exceeds it
+    const int BIG = tolerance + 1;
+    // Reused across calls: a scan calls this once per catalog name
+    static vector<int> prev, cur;
+    prev.assign(m + 1, BIG);
+    cur.assign(m + 1, BIG);
+    for (int j = 0; j <= min(m, tolerance); j++)
+        prev[j] = j;
+    for (int i = 1; i <= n; i++)
+    {
+        int lo = max(1, i - tolerance), hi = min(m, i + tolerance);
+        fill(cur.begin(), cur.end(), BIG);
+        if (i <= tolerance)
+            cur[0] = i;
+        int row_min = cur[0];
+        for (int j = lo; j <= hi; j++)
+        {
+            int cost = query[i - 1] == name[j - 1] ? 0 : 1;
+            int value = min({prev[j - 1] + cost, prev[j] + 1, cur[j - 1] + 1});
+            cur[j] = min(value, BIG);
+            row_min = min(row_min, cur[j]);
+        }
+        if (row_min > tolerance)
+            return false;
+        swap(prev, cur);
+    }
+    return prev[m] <= tolerance;
+}
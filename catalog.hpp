@@ -0,0 +1,37 @@
+#include<bits/stdc++.h>
+using namespace std;
+#ifndef CATALOG_H
+#define CATALOG_H
+
+// Read-only, memory-mapped view of a catalog snapshot written by
+// catalog_snapshot.py (format version 2). The file stays mapped for the
+// lifetime of a resident (--serve) worker until a request names another one.
+struct CatalogFile
+{
+    string path;
+    uint64_t generation;
+    uint64_t version;
+    uint32_t item_count;
+    // Distinct names of the catalog's items, pointing into the mapping
+    vector<string_view> names;
+    // Bloom filter bits over names, built on first use
+    unique_ptr<bool[]> bloom_bits;
+    int bloom_size;
+
+    const char *data;
+    size_t size;
+#ifdef _WIN32
+    void *file_handle;
+    void *mapping_handle;
+#endif
+};
+
+// Map the snapshot at `path` (reusing the current mapping when it is the
+// same file) and check that it holds catalog `version`. Throws
+// runtime_error when the file is missing, malformed or another version.
+CatalogFile &openCatalog(const string &path, uint64_t version);
+
+// True if `name` is within `tolerance` edits of `query`
+bool withinDistance(string_view query, string_view name, int tolerance);
+
+#endif
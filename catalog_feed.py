@@ -0,0 +1,218 @@
+"""
+Catalog change feed for SuffixKART.
+
+Every item write goes through CatalogFeed, which bumps a monotonically
+increasing catalog version and appends a change event carrying that
+version to a capped collection. Derived state (the shared catalog
+snapshot, and through it each worker's name indexes; caches keyed by
+version) follows the feed: a consumer asks for the events after the
+version it has applied and replays them, or rebuilds from MongoDB when it
+has fallen too far behind or the capped collection has already dropped
+events it needs.
+
+A write takes its version first and stamps it on the item
+(`catalog_version`) in the same operation, conditioned on the item not
+carrying a newer one, so versions follow the order writes land in and
+each event carries the item as that write left it. A write that loses
+such a race, or finds nothing to change, records a `noop` event for its
+version so consumers are not held up waiting for it.
+
+Writing an item and recording its event are still two operations, so a
+process dying between them leaves derived state behind until the next
+rebuild (`flask rebuild-snapshot`).
+"""
+import time
+from datetime import datetime
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import CollectionInvalid
+
+from hydration import to_object_id
+
+
+FEED_COLLECTION = 'catalog_changes'
+COUNTERS_COLLECTION = 'counters'
+VERSION_ID = 'catalog_version'
+# Bumped by checkouts, whose stock decrements bypass the feed
+STOCK_VERSION_ID = 'stock_version'
+# Item fields the derived structures use; events carry them for the new state
+ITEM_FIELDS = ('name', 'category', 'seller_id')
+DEFAULT_FEED_SIZE = 16 * 1024 * 1024
+# More pending events than this and a rebuild is cheaper than a replay
+MAX_REPLAY = 10000
+# A missing version is a write still in flight for this long, then lost
+GAP_TIMEOUT = 5.0
+
+
+class FeedLagged(Exception):
+    """The consumer must rebuild: the feed can not replay what it missed."""
+
+
+def bump_stock_version(counters):
+    """Record a stock change made outside the feed. Counters carry the time (UTC) of their last bump."""
+    counters.update_one({'_id': STOCK_VERSION_ID},
+                        {'$inc': {'version': 1}, '$set': {'date': datetime.utcnow()}}, upsert=True)
+
+
+def _item_fields(item):
+    return {field: item.get(field) for field in ITEM_FIELDS}
+
+
+class CatalogFeed:
+    """Item writes plus the version counter and change events that follow them."""
+
+    def __init__(self, db, size=DEFAULT_FEED_SIZE, gap_timeout=GAP_TIMEOUT):
+        self.db = db
+        self.items = db['items']
+        self.changes = db[FEED_COLLECTION]
+        self.counters = db[COUNTERS_COLLECTION]
+        self.size = size
+        self.gap_timeout = gap_timeout
+        # missing version -> when a consumer first waited for it
+        self._gaps = {}
+
+    def ensure(self):
+        """Create the capped event collection and its version index (idempotent)."""
+        try:
+            self.db.create_collection(FEED_COLLECTION, capped=True, size=self.size)
+        except CollectionInvalid:
+            pass
+        self.changes.create_index([('version', ASCENDING)], unique=True)
+
+    def version(self):
+        """Current catalog version (0 before the first recorded write)."""
+        counter = self.counters.find_one({'_id': VERSION_ID})
+        return counter['version'] if counter else 0
+
+    # Item writes
+
+    def insert_item(self, item):
+        """Insert an item document and record it. Returns the new _id."""
+        version = self._next_version()
+        try:
+            item_id = self.items.insert_one(dict(item, catalog_version=version)).inserted_id
+        except Exception:
+            # The version is taken; fill it so consumers need not wait for it
+            self._record(version, 'noop', None, None)
+            raise
+        item['_id'] = item_id
+        self._record(version, 'insert', item_id, item)
+        return item_id
+
+    def update_item(self, item_id, fields):
+        """$set `fields` on an item and record it. Returns the updated item, or None."""
+        item_id = to_object_id(item_id)
+        while True:
+            version = self._next_version()
+            try:
+                updated = self.items.find_one_and_update(self._older_than(item_id, version),
+                                                         {'$set': dict(fields, catalog_version=version)},
+                                                         return_document=ReturnDocument.AFTER)
+            except Exception:
+                # e.g. a rename onto an existing name
+                self._record(version, 'noop', item_id, None)
+                raise
+            if updated is not None:
+                self._record(version, 'update', item_id, updated)
+                return updated
+            if not self._lost_race(version, item_id):
+                return None
+
+    def delete_item(self, item_id):
+        """Delete an item and record it. Returns the deleted item, or None."""
+        item_id = to_object_id(item_id)
+        while True:
+            version = self._next_version()
+            deleted = self.items.find_one_and_delete(self._older_than(item_id, version))
+            if deleted is not None:
+                self._record(version, 'delete', item_id, None)
+                return deleted
+            if not self._lost_race(version, item_id):
+                return None
+
+    def _next_version(self):
+        counter = self.counters.find_one_and_update({'_id': VERSION_ID},
+                                                    {'$inc': {'version': 1}, '$set': {'date': datetime.utcnow()}},
+                                                    upsert=True, return_document=ReturnDocument.AFTER)
+        return counter['version']
+
+    @staticmethod
+    def _older_than(item_id, version):
+        # Items carry the version of their last write, so a write that took
+        # its version before a concurrent one can not land after it
+        return {'_id': item_id, 'catalog_version': {'$not': {'$gte': version}}}
+
+    def _lost_race(self, version, item_id):
+        """
+        Fill `version` after a conditional write matched nothing. True if the
+        item exists (a newer write got there first, so the caller retries
+        with a new version), False if it is gone.
+        """
+        self._record(version, 'noop', item_id, None)
+        return self.items.count_documents({'_id': item_id}, limit=1) > 0
+
+    def _record(self, version, op, item_id, item):
+        self.changes.insert_one({
+            'version': version,
+            'op': op,
+            'item_id': item_id,
+            'item': _item_fields(item) if item is not None else None,
+            'date': datetime.now()
+        })
+        return version
+
+    # Consumers
+
+    def changes_since(self, version):
+        """
+        Events after `version`, oldest first, up to the first missing version.
+
+        Versions are taken before events are inserted, so a concurrent writer
+        can leave a short-lived hole; events behind it are held back until it
+        fills. Raises FeedLagged when the hole outlives gap_timeout (the event
+        was lost or has been evicted from the capped collection), when more
+        than MAX_REPLAY events are pending, or when the feed is behind
+        `version` altogether.
+        """
+        latest = self.version()
+        if latest < version:
+            raise FeedLagged(f"catalog version {latest} is behind {version}; was the database reset?")
+        if latest - version > MAX_REPLAY:
+            raise FeedLagged(f"{latest - version} catalog changes pending")
+        if latest <= version:
+            return []
+        events = list(self.changes.find({'version': {'$gt': version}}).sort('version', ASCENDING))
+        expected = version + 1
+        for count, event in enumerate(events):
+            if event['version'] != expected:
+                events = events[:count]
+                break
+            expected += 1
+        if expected > latest:
+            self._gaps.clear()
+            return events
+        now = time.monotonic()
+        waiting_since = self._gaps.setdefault(expected, now)
+        if now - waiting_since > self.gap_timeout:
+            self._gaps.clear()
+            raise FeedLagged(f"catalog change {expected} is missing from the feed")
+        return events
+
+
+def fold_changes(events):
+    """
+    Collapse events into the net (upserts, deletes) they leave behind:
+    item dicts with _id plus ITEM_FIELDS, and deleted item ids.
+    """
+    upserts = {}
+    deletes = set()
+    for event in events:
+        if event['op'] == 'noop':
+            continue
+        if event['op'] == 'delete':
+            upserts.pop(event['item_id'], None)
+            deletes.add(event['item_id'])
+        else:
+            deletes.discard(event['item_id'])
+            upserts[event['item_id']] = dict(event['item'], _id=event['item_id'])
+    return list(upserts.values()), deletes
@@ -0,0 +1,411 @@
+"""
+Memory-mapped catalog snapshot shared by every worker process.
+
+A snapshot is one read-only file holding the catalog's interned name
+table, item ids, categories and seller ids. One process builds it; every
+other worker maps the same file, so the pages are shared by the OS instead
+of each worker loading the catalog from MongoDB.
+
+Snapshots are published as numbered generations next to a small pointer
+file, `<path>.current`. A new generation is written to a temporary file
+and renamed into place before the pointer is swapped, so readers see
+either the old or the new generation, never a partial one.
+
+Each snapshot records the catalog version (see catalog_feed.py) it
+reflects, so consumers can tell how far behind the feed it is.
+
+File layout (little-endian), format version 2:
+
+    header     magic 'SKCS', format, generation, catalog version, item count,
+               name count, category count, seller count, section offsets
+    names      u32 offsets[name count + 1] into a UTF-8 blob
+    categories u32 offsets[category count + 1] into a UTF-8 blob
+    sellers    12-byte ObjectIds
+    items      24-byte records sorted by ObjectId: ObjectId, name index,
+               category index, seller index (NO_INDEX when missing)
+
+Every section starts on an 8-byte boundary. Incremental publishes append
+to the tables, so a table may hold a string more than once or one no item
+refers to; once such dead names outnumber a quarter of the items, the
+next incremental publish rewrites the snapshot compactly instead.
+"""
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+from bson import ObjectId
+
+from hydration import to_object_id
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+_HEADER = struct.Struct('<4sIQQIIII6Q')
+_MAGIC = b'SKCS'
+_VERSION = 2
+_ITEM = struct.Struct('<12sIII')
+NO_INDEX = 0xFFFFFFFF
+_ALIGN = 8
+# Dead name table entries tolerated on top of a quarter of the item count
+COMPACT_SLACK = 1024
+
+
+class _StringTable:
+    """Append-only string table (offsets + UTF-8 blob) with interning."""
+
+    def __init__(self, offsets=None, blob=b''):
+        self.offsets = offsets if offsets is not None else array('I', [0])
+        self.blob = bytearray(blob)
+        self._index = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, index):
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def intern(self, value):
+        if self._index is None:
+            self._index = {self.get(i): i for i in range(len(self))}
+        index = self._index.get(value)
+        if index is None:
+            self.blob += value.encode('utf-8')
+            self.offsets.append(len(self.blob))
+            index = self._index[value] = len(self) - 1
+        return index
+
+    def append(self, value):
+        """Add without interning (no lookup table needed)."""
+        self.blob += value.encode('utf-8')
+        self.offsets.append(len(self.blob))
+        return len(self) - 1
+
+    def sections(self):
+        offsets = array('I', self.offsets)
+        if offsets.itemsize != 4 or struct.pack('=I', 1) != struct.pack('<I', 1):
+            raise RuntimeError('catalog snapshots need 32-bit little-endian offsets')
+        return offsets.tobytes(), bytes(self.blob)
+
+
+class _SellerTable:
+    """Append-only table of 12-byte seller ObjectIds with interning."""
+
+    def __init__(self, section=b''):
+        self.section = bytearray(section)
+        self._index = None
+
+    def __len__(self):
+        return len(self.section) // 12
+
+    def get(self, index):
+        return ObjectId(bytes(self.section[12 * index:12 * index + 12]))
+
+    def intern(self, seller_id):
+        seller_id = to_object_id(seller_id)
+        if seller_id is None:
+            return NO_INDEX
+        if self._index is None:
+            self._index = {bytes(self.section[at:at + 12]): at // 12
+                           for at in range(0, len(self.section), 12)}
+        index = self._index.get(seller_id.binary)
+        if index is None:
+            index = self._index[seller_id.binary] = len(self)
+            self.section += seller_id.binary
+        return index
+
+
+def _record(item, names, categories, sellers, intern_names=True):
+    name = names.intern(item['name']) if intern_names else names.append(item['name'])
+    category = categories.intern(item['category']) if item.get('category') else NO_INDEX
+    return _ITEM.pack(to_object_id(item['_id']).binary, name, category,
+                      sellers.intern(item.get('seller_id')))
+
+
+def _write(path, generation, version, names, categories, sellers, records, item_count):
+    sections = [*names.sections(), *categories.sections(), bytes(sellers.section), records]
+    offsets = []
+    position = _HEADER.size
+    for section in sections:
+        position += -position % _ALIGN
+        offsets.append(position)
+        position += len(section)
+    header = _HEADER.pack(_MAGIC, _VERSION, generation, version, item_count,
+                          len(names), len(categories), len(sellers), *offsets)
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        for offset, section in zip(offsets, sections):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(section)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(path, items, generation, version=0):
+    """
+    Write a snapshot file for `items`, dicts with _id, name, category and
+    seller_id (the last two may be missing). The file is written to a
+    temporary name and renamed, so `path` is either complete or absent.
+    """
+    names, categories, sellers = _StringTable(), _StringTable(), _SellerTable()
+    records = sorted(_record(item, names, categories, sellers) for item in items)
+    _write(path, generation, version, names, categories, sellers, b''.join(records), len(records))
+
+
+class CatalogSnapshot:
+    """Read-only view of one snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, format_version, self.generation, self.version, self.item_count, self.name_count,
+         self.category_count, self.seller_count, self._name_offsets, self._name_blob,
+         self._category_offsets, self._category_blob, self._sellers, self._items) = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or format_version != _VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a catalog snapshot")
+
+    def _table(self, offsets_at, blob_at, count):
+        offsets = array('I')
+        offsets.frombytes(self._mm[offsets_at:offsets_at + 4 * (count + 1)])
+        return _StringTable(offsets, self._mm[blob_at:blob_at + offsets[-1]])
+
+    def _seller_table(self):
+        return _SellerTable(self._mm[self._sellers:self._sellers + 12 * self.seller_count])
+
+    def _records(self):
+        return _ITEM.iter_unpack(self._mm[self._items:self._items + _ITEM.size * self.item_count])
+
+    def name_counts(self):
+        """Name -> number of items carrying it."""
+        names = self._table(self._name_offsets, self._name_blob, self.name_count)
+        counts = Counter()
+        for index, count in Counter(record[1] for record in self._records()).items():
+            counts[names.get(index)] += count
+        return dict(counts)
+
+    def items(self):
+        """Yield every item as a dict with _id, name, category and seller_id."""
+        names = self._table(self._name_offsets, self._name_blob, self.name_count)
+        categories = self._table(self._category_offsets, self._category_blob, self.category_count)
+        sellers = self._seller_table()
+        for item_id, name, category, seller in self._records():
+            yield {
+                '_id': ObjectId(item_id),
+                'name': names.get(name),
+                'category': categories.get(category) if category != NO_INDEX else None,
+                'seller_id': sellers.get(seller) if seller != NO_INDEX else None
+            }
+
+    def name_changes(self, newer):
+        """
+        Name -> change in item count from this snapshot to `newer`.
+
+        When `newer` was published incrementally from this one its tables
+        extend ours, so equal record bytes mean equal items: the walk skips
+        shared runs with galloping byte comparisons and decodes only the
+        records that differ. Otherwise both snapshots are counted in full.
+        """
+        old_names = self._table(self._name_offsets, self._name_blob, self.name_count)
+        new_names = newer._table(newer._name_offsets, newer._name_blob, newer.name_count)
+        if (len(new_names) < len(old_names)
+                or new_names.offsets[:len(old_names.offsets)] != old_names.offsets
+                or new_names.blob[:len(old_names.blob)] != old_names.blob):
+            changes = Counter(newer.name_counts())
+            changes.subtract(self.name_counts())
+            return {name: delta for name, delta in changes.items() if delta}
+
+        changes = Counter()
+        i = j = 0
+        step = 1
+        while i < self.item_count and j < newer.item_count:
+            n = min(step, self.item_count - i, newer.item_count - j)
+            if self._record_bytes(i, n) == newer._record_bytes(j, n):
+                i += n
+                j += n
+                step *= 2
+                continue
+            if n > 1:
+                step = n // 2
+                continue
+            old_id, old_name = _ITEM.unpack(self._record_bytes(i, 1))[:2]
+            new_id, new_name = _ITEM.unpack(newer._record_bytes(j, 1))[:2]
+            if old_id <= new_id:
+                changes[old_names.get(old_name)] -= 1
+                i += 1
+            if new_id <= old_id:
+                changes[new_names.get(new_name)] += 1
+                j += 1
+        for _, name, _, _ in _ITEM.iter_unpack(self._record_bytes(i, self.item_count - i)):
+            changes[old_names.get(name)] -= 1
+        for _, name, _, _ in _ITEM.iter_unpack(newer._record_bytes(j, newer.item_count - j)):
+            changes[new_names.get(name)] += 1
+        return {name: delta for name, delta in changes.items() if delta}
+
+    def _record_bytes(self, position, count):
+        at = self._items + _ITEM.size * position
+        return self._mm[at:at + _ITEM.size * count]
+
+    def _find(self, item_id):
+        """Record position of `item_id` (12 bytes), or where it would go."""
+        lo, hi = 0, self.item_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = self._items + _ITEM.size * mid
+            if self._mm[at:at + 12] < item_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _contains_at(self, position, item_id):
+        at = self._items + _ITEM.size * position
+        return position < self.item_count and self._mm[at:at + 12] == item_id
+
+    def __len__(self):
+        return self.item_count
+
+    def close(self):
+        if not self._mm.closed:
+            self._mm.close()
+
+
+class SnapshotStore:
+    """
+    Generations of catalog snapshots at `<path>.<generation>`, with the
+    live one named in `<path>.current`. Publishing is serialized across
+    processes with a lock file; reading needs no lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pointer = f"{path}.current"
+        self._thread_lock = threading.RLock()
+
+    @contextmanager
+    def lock(self):
+        """Exclusive cross-process lock around check-then-publish sequences."""
+        with self._thread_lock, open(f"{self.path}.lock", 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def current_generation(self):
+        """Generation named by the pointer file (0 when nothing is published)."""
+        try:
+            with open(self._pointer) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def attach(self):
+        """Map the current generation, or return None if there is none."""
+        generation = self.current_generation()
+        if not generation:
+            return None
+        try:
+            return CatalogSnapshot(f"{self.path}.{generation}")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def refresh(self, snapshot):
+        """The current snapshot: `snapshot` itself if still current, else a new mapping."""
+        if snapshot is not None and snapshot.generation == self.current_generation():
+            return snapshot
+        return self.attach()
+
+    def publish(self, items, version=0):
+        """Write `items` at catalog `version` as the next generation and make it current. Call under lock()."""
+        generation = self.current_generation() + 1
+        write_snapshot(f"{self.path}.{generation}", items, generation, version)
+        return self._swap(generation)
+
+    def publish_changes(self, base, upserts=(), deletes=(), version=0):
+        """
+        Publish `base` with items upserted and item ids deleted, at catalog
+        `version`, as the next generation. Tables are copied and appended to and records spliced in
+        by binary search, so the cost is a copy of the file rather than a
+        decode of every item. When the appended names would leave too many
+        dead ones, the items are decoded and published compactly instead.
+        Call under lock().
+        """
+        upserts = list(upserts)
+        if base is None:
+            return self.publish(upserts, version)
+        names = base._table(base._name_offsets, base._name_blob, base.name_count)
+        categories = base._table(base._category_offsets, base._category_blob, base.category_count)
+        sellers = base._seller_table()
+
+        changes = {to_object_id(item_id).binary: None for item_id in deletes}
+        for item in upserts:
+            changes[to_object_id(item['_id']).binary] = _record(item, names, categories, sellers,
+                                                                intern_names=False)
+
+        pieces = []
+        start = 0
+        item_count = base.item_count
+        for item_id in sorted(changes):
+            position = base._find(item_id)
+            pieces.append(base._mm[base._items + _ITEM.size * start:base._items + _ITEM.size * position])
+            start = position
+            if base._contains_at(position, item_id):
+                start += 1
+                item_count -= 1
+            if changes[item_id] is not None:
+                pieces.append(changes[item_id])
+                item_count += 1
+        pieces.append(base._mm[base._items + _ITEM.size * start:base._items + _ITEM.size * base.item_count])
+
+        # Every item refers to one name, so at least this many are dead
+        if len(names) - item_count > item_count // 4 + COMPACT_SLACK:
+            return self.publish([item for item in base.items() if item['_id'].binary not in changes] + upserts,
+                                version)
+
+        generation = self.current_generation() + 1
+        _write(f"{self.path}.{generation}", generation, version, names, categories, sellers,
+               b''.join(pieces), item_count)
+        return self._swap(generation)
+
+    def _swap(self, generation):
+        tmp_pointer = f"{self._pointer}.tmp.{os.getpid()}"
+        with open(tmp_pointer, 'w') as f:
+            f.write(str(generation))
+        os.replace(tmp_pointer, self._pointer)
+        self._remove_before(generation - 1)
+        return CatalogSnapshot(f"{self.path}.{generation}")
+
+    def _remove_before(self, generation):
+        # Keep the previous generation for readers that have not switched yet.
+        # Mapped files stay readable after unlinking on POSIX; on Windows the
+        # removal fails while a worker still maps the file and is retried later.
+        directory = os.path.dirname(self.path) or '.'
+        prefix = os.path.basename(self.path) + '.'
+        for entry in os.listdir(directory):
+            suffix = entry[len(prefix):] if entry.startswith(prefix) else ''
+            if suffix.isdigit() and int(suffix) < generation:
+                try:
+                    os.remove(os.path.join(directory, entry))
+                except OSError:
+                    pass
@@ -0,0 +1,198 @@
+import uuid
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+from catalog_feed import COUNTERS_COLLECTION, bump_stock_version
+from hydration import to_object_id
+from order_index import number_orders
+from order_snapshots import snapshot
+
+
+# MongoDB error code for transactions on a standalone server
+ILLEGAL_OPERATION = 20
+
+
+class CheckoutError(Exception):
+    """Base exception for failed checkouts."""
+
+
+class EmptyCart(CheckoutError):
+    pass
+
+
+class OutOfStock(CheckoutError):
+    """Raised with the names of the items that can not be supplied."""
+
+    def __init__(self, item_names):
+        self.item_names = item_names
+        super().__init__(f"Not enough stock for: {', '.join(item_names)}")
+
+
+class _StockChanged(Exception):
+    """Stock moved between validation and the conditional decrement."""
+
+
+class Checkout:
+    """
+    Turns a cart into orders in one pass:
+
+    1. load the cart and every item it references with one $in query,
+       and validate stock for all lines at once;
+    2. decrement stock with one unordered bulk_write of conditional
+       updates ({quantity: {$gte: n}}), so concurrent checkouts can never
+       drive an item below zero;
+    3. number the orders (see order_index) and insert them with one
+       insert_many;
+    4. clear the cart.
+
+    Every order carries a snapshot of the item and seller (see
+    order_snapshots), so order pages never join back to the catalog.
+
+    On a replica set the steps run in a transaction that the driver retries
+    when checkouts contend on the same items. On a standalone server, where
+    transactions are unavailable, each decrement is tagged with a checkout
+    token so that a partially applied decrement can be undone exactly once.
+    """
+
+    def __init__(self, client, db, cart_store, sellers, max_attempts=3):
+        self.client = client
+        self.max_attempts = max_attempts
+        self.items = db['items']
+        self.orders = db['orders']
+        self.counters = db[COUNTERS_COLLECTION]
+        self.cart_store = cart_store
+        # Anything with get_many(ids), e.g. SellerCache, for order snapshots
+        self.sellers = sellers
+        # None until the first checkout finds out whether transactions work
+        self.use_transactions = None
+
+    def place(self, cart_id, buyer_id, buyer_name):
+        """Check out a cart; returns the inserted order documents."""
+        for _ in range(self.max_attempts):
+            # Validation is repeated on every attempt, so a checkout that
+            # lost a race reports exactly which items ran out
+            orders = self._prepare(cart_id, buyer_id, buyer_name)
+            try:
+                self._apply(cart_id, orders)
+                # Pages showing stock are keyed on this version (see http_cache)
+                bump_stock_version(self.counters)
+                return orders
+            except _StockChanged:
+                continue
+        raise CheckoutError('Stock changed while checking out, please try again')
+
+    def _prepare(self, cart_id, buyer_id, buyer_name):
+        lines = self.cart_store.get_lines(cart_id)
+        if not lines:
+            raise EmptyCart('Your cart is empty!')
+
+        items = {item['_id']: item for item in
+                 self.items.find({'_id': {'$in': [to_object_id(line['item_id']) for line in lines]}})}
+        short = []
+        for line in lines:
+            item = items.get(to_object_id(line['item_id']))
+            if item is None or item['quantity'] < line['quantity']:
+                short.append(item['name'] if item else str(line['item_id']))
+        if short:
+            raise OutOfStock(short)
+
+        return self._build_orders(lines, items, buyer_id, buyer_name)
+
+    def _apply(self, cart_id, orders):
+        if self.use_transactions is not False:
+            try:
+                with self.client.start_session() as session:
+                    # with_transaction retries on write conflicts with
+                    # concurrent checkouts of the same items
+                    session.with_transaction(
+                        lambda s: self._apply_in_transaction(s, cart_id, orders))
+                self.use_transactions = True
+                return
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                self.use_transactions = False
+        self._apply_with_compensation(cart_id, orders)
+
+    def _build_orders(self, lines, items, buyer_id, buyer_name):
+        now = datetime.now()
+        sellers = self.sellers.get_many(item.get('seller_id') for item in items.values())
+        orders = []
+        for line in lines:
+            item = items[to_object_id(line['item_id'])]
+            orders.append({
+                **snapshot(item, sellers.get(to_object_id(item.get('seller_id')))),
+                # Generated up front so a retried insert can not duplicate
+                '_id': ObjectId(),
+                'buyer_id': buyer_id,
+                'buyer_name': buyer_name,
+                'item_id': item['_id'],
+                'seller_id': item.get('seller_id'),
+                'quantity': line['quantity'],
+                'price': item['price'],
+                'total_price': item['price'] * line['quantity'],
+                'status': 'Processing',
+                'date': now
+            })
+        return orders
+
+    def _decrements(self, orders, token=None):
+        updates = []
+        for order in orders:
+            query = {'_id': order['item_id'], 'quantity': {'$gte': order['quantity']}}
+            update = {'$inc': {'quantity': -order['quantity']}}
+            if token:
+                # Skip items this checkout already decremented (safe retries)
+                query['checkout_tokens'] = {'$ne': token}
+                update['$push'] = {'checkout_tokens': token}
+            updates.append(UpdateOne(query, update))
+        return updates
+
+    def _apply_in_transaction(self, session, cart_id, orders):
+        result = self.items.bulk_write(self._decrements(orders), ordered=False, session=session)
+        if result.matched_count != len(orders):
+            # Stock was bought since validation; raising aborts the
+            # transaction, which rolls back the decrements that did apply
+            raise _StockChanged()
+        # Numbered inside the transaction: an aborted attempt gives its
+        # numbers back, so the order indexes never wait on a hole
+        number_orders(self.counters, orders, session=session)
+        self.orders.insert_many(orders, session=session)
+        self.cart_store.clear(cart_id, session=session)
+
+    def _apply_with_compensation(self, cart_id, orders):
+        token = uuid.uuid4().hex
+        item_ids = [order['item_id'] for order in orders]
+        result = self.items.bulk_write(self._decrements(orders, token), ordered=False)
+
+        if result.matched_count != len(orders):
+            applied = {item['_id'] for item in
+                       self.items.find({'_id': {'$in': item_ids}, 'checkout_tokens': token}, {'_id': 1})}
+            self._compensate([order for order in orders if order['item_id'] in applied], token)
+            raise _StockChanged()
+
+        # Numbered only once the stock is ours, so lost races burn no numbers;
+        # a failed insert leaves a hole that the order indexes wait out
+        number_orders(self.counters, orders)
+        try:
+            self.orders.insert_many(orders)
+        except Exception:
+            self._compensate(orders, token)
+            raise
+
+        self.cart_store.clear(cart_id)
+        self.items.update_many({'_id': {'$in': item_ids}}, {'$pull': {'checkout_tokens': token}})
+
+    def _compensate(self, orders, token):
+        """Give back stock taken under `token`; the token makes this idempotent."""
+        if orders:
+            self.items.bulk_write([
+                UpdateOne({'_id': order['item_id'], 'checkout_tokens': token},
+                          {'$inc': {'quantity': order['quantity']}, '$pull': {'checkout_tokens': token}})
+                for order in orders
+            ], ordered=False)
+            # A page may have been rendered in between
+            bump_stock_version(self.counters)
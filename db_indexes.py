@@ -0,0 +1,165 @@
+"""
+MongoDB index bootstrap for SuffixKART.
+
+Declares the indexes the app's hot queries rely on, creates them
+idempotently, and can verify with explain() that none of those queries
+still falls back to a collection scan.
+
+Usage:
+    python db_indexes.py            # create missing indexes
+    python db_indexes.py --check    # create, then fail if any hot query does a COLLSCAN
+"""
+import argparse
+import sys
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import OperationFailure
+
+from catalog_feed import STOCK_VERSION_ID, VERSION_ID
+from order_index import ORDER_SEQ_ID
+
+
+# collection -> list of (keys, options)
+REQUIRED_INDEXES = {
+    'items': [
+        # Item names are unique; add_item relies on it rather than on a prior lookup
+        ([('name', ASCENDING)], {'unique': True}),
+        # Seller and category pages paginate on _id
+        ([('seller_id', ASCENDING), ('_id', ASCENDING)], {}),
+        ([('category', ASCENDING), ('_id', ASCENDING)], {}),
+    ],
+    'cart': [
+        ([('cart_id', ASCENDING), ('item_id', ASCENDING)], {}),
+    ],
+    'orders': [
+        ([('buyer_id', ASCENDING), ('date', DESCENDING)], {}),
+        # OrderIndex.refresh replays orders by number
+        ([('seq', ASCENDING)], {}),
+    ],
+    'user_credentials': [
+        ([('email', ASCENDING)], {'unique': True}),
+        ([('buyer_id', ASCENDING)], {'sparse': True}),
+    ],
+}
+
+# (collection, filter, sort) shaped like the queries in app.py
+HOT_QUERIES = [
+    ('items', {'name': 'Milk'}, None),
+    ('items', {'name': {'$in': ['Milk', 'Bread']}}, None),
+    ('items', {'seller_id': ObjectId()}, [('_id', ASCENDING)]),
+    ('items', {'category': 'Bakery'}, [('_id', ASCENDING)]),
+    ('cart', {'cart_id': 'cart', 'item_id': 'item'}, None),
+    ('cart', {'cart_id': 'cart'}, None),
+    # One document per cart (SUFFIXKART_CART_MODE=document, the default)
+    ('carts', {'_id': 'cart'}, None),
+    ('carts', {'_id': 'cart', 'lines.item': {'$exists': True}}, None),
+    ('orders', {'buyer_id': 'buyer'}, [('date', DESCENDING)]),
+    ('orders', {'seq': {'$gt': 0}}, [('seq', ASCENDING)]),
+    # Catalog, stock and order counters, and the page validators' read of both versions
+    ('counters', {'_id': VERSION_ID}, None),
+    ('counters', {'_id': ORDER_SEQ_ID}, None),
+    ('counters', {'_id': {'$in': [VERSION_ID, STOCK_VERSION_ID]}}, None),
+    ('user_credentials', {'email': 'someone@example.com'}, None),
+    ('user_credentials', {'buyer_id': ObjectId()}, None),
+]
+
+
+def ensure_indexes(db):
+    """
+    Create every declared index that does not exist yet.
+
+    Returns a list of (collection, index name, error) for indexes that could
+    not be created, e.g. a unique index over existing duplicates.
+    """
+    failures = []
+    for collection_name, indexes in REQUIRED_INDEXES.items():
+        collection = db[collection_name]
+        for keys, options in indexes:
+            try:
+                # create_index is a no-op when an identical index exists
+                collection.create_index(keys, **options)
+            except OperationFailure as e:
+                # Typically an index on the same keys with other options
+                error = _replace_index(collection, keys, options, e)
+                if error:
+                    name = '_'.join(f"{field}_{direction}" for field, direction in keys)
+                    failures.append((collection_name, name, error))
+    return failures
+
+
+def _replace_index(collection, keys, options, error):
+    """
+    Rebuild an existing index on `keys` with the declared options, e.g. one
+    that has become unique. Returns None, or the error after restoring the
+    old index when the new one can not be built.
+    """
+    old = next((index for index in collection.list_indexes() if list(index['key'].items()) == keys), None)
+    if old is None:
+        return str(error)
+    collection.drop_index(old['name'])
+    try:
+        collection.create_index(keys, **options)
+    except OperationFailure as e:
+        collection.create_index(keys, **{k: v for k, v in old.items() if k not in ('v', 'key', 'ns')})
+        return str(e)
+    return None
+
+
+def _plan_stages(plan):
+    yield plan.get('stage')
+    if 'inputStage' in plan:
+        yield from _plan_stages(plan['inputStage'])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+    # Slot-based engine (MongoDB 5+) nests the classic plan one level down
+    if 'queryPlan' in plan:
+        yield from _plan_stages(plan['queryPlan'])
+
+
+def check_query_plans(db):
+    """
+    Explain every hot query and return the ones whose winning plan contains
+    a COLLSCAN, as a list of (collection, filter, stages).
+    """
+    scans = []
+    for collection_name, query, sort in HOT_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()['queryPlanner']['winningPlan']
+        stages = [stage for stage in _plan_stages(plan) if stage]
+        if 'COLLSCAN' in stages:
+            scans.append((collection_name, query, stages))
+    return scans
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Create and verify SuffixKART MongoDB indexes.')
+    parser.add_argument('--uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--db', default='suffixKART_db')
+    parser.add_argument('--check', action='store_true',
+                        help='fail if any hot query still uses a collection scan')
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.uri)[args.db]
+    status = 0
+
+    for collection_name, name, error in ensure_indexes(db):
+        print(f"Could not create index {collection_name}.{name}: {error}")
+        status = 1
+
+    if args.check:
+        scans = check_query_plans(db)
+        for collection_name, query, stages in scans:
+            print(f"COLLSCAN on {collection_name} for {query}: {' -> '.join(stages)}")
+        if scans:
+            status = 1
+        else:
+            print(f"All {len(HOT_QUERIES)} hot queries use an index")
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import jinja2
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """
+    LRU cache of rendered template fragments (product cards), capped in bytes.
+
+    Fragments render with a plain synchronous Jinja environment over the
+    app's template loader, so they can be called from the templates of the
+    Flask app and of the async Quart app alike. The caller's key must cover
+    everything the fragment shows; a changed item simply gets a new key
+    and its old fragment ages out.
+    """
+
+    def __init__(self, loader, globals=None, max_bytes=4 * 1024 * 1024):
+        self.env = jinja2.Environment(loader=loader, autoescape=True)
+        self.env.globals.update(globals or {})
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (size in bytes, rendered markup)
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, template_name, key, **context):
+        """The fragment for `key`, rendering template_name with context on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        html = Markup(self.env.get_template(template_name).render(**context))
+        size = sys.getsizeof(str(html)) + sys.getsizeof(key)
+        if size > self.max_bytes:
+            return html
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[0]
+            self._entries[key] = (size, html)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
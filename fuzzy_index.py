@@ -0,0 +1,314 @@
+import threading
+import time
+
+
+# Default tolerance, matching TOL in BK_Tree.hpp
+DEFAULT_TOLERANCE = 2
+
+
+def edit_distance(s1, s2):
+    """Levenshtein distance between two strings (same costs as BK_Tree.cpp)."""
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    return _distance(_masks(s2), len(s2), s1)
+
+
+def _masks(pattern):
+    peq = {}
+    for i, c in enumerate(pattern):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    return peq
+
+
+def _distance(peq, m, text):
+    """
+    Levenshtein distance between a pattern and `text`, with `peq` from
+    _masks(pattern) and m = len(pattern). Bit-parallel (Myers/Hyyro): one
+    DP column per character of `text` in a few integer operations, which
+    is what keeps building a BK-tree over a large catalog affordable.
+    """
+    if m == 0:
+        return len(text)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = full
+    mv = 0
+    score = m
+    for c in text:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+    return score
+
+
+def rank_key(query, name, distance, count):
+    """
+    Order of ranked matches: fewest edits first, then names starting with
+    the query, then the names most items carry, then alphabetical.
+    """
+    return (distance, not name.lower().startswith(query.lower()), -count, name)
+
+
+def rank_nearest(within, count_of, query, k, tolerance, after=None, items=None):
+    """
+    The k best names for `query` by rank_key, as (name, item count) pairs.
+
+    `within(d)` returns (name, distance) for every name within d edits and
+    `count_of(name)` how many items carry a name. The distance bound grows
+    one edit at a time and stops at the first distance by which k names
+    have been found, or names carrying `items` items between them when
+    that is given (a page of items rather than of names), so a query with
+    plenty of close matches never pays for the full tolerance. `after`
+    resumes a listing: only names ranked after that name are returned.
+    """
+    ranked = []
+    total = 0
+    start = 0
+    after_key = None
+    if after is not None:
+        distance = edit_distance(query, after)
+        after_key = rank_key(query, after, distance, count_of(after))
+        start = distance
+    for d in range(start, tolerance + 1):
+        level = []
+        # Distance 0 is the query itself: a lookup, not a search
+        matches = within(d) if d else [(query, 0)] if count_of(query) else []
+        for name, distance in matches:
+            if distance != d:
+                continue
+            key = rank_key(query, name, distance, count_of(name))
+            if after_key is None or key > after_key:
+                level.append(key)
+        level.sort()
+        for key in level:
+            ranked.append((key[3], -key[2]))
+            total -= key[2]
+            if len(ranked) >= k or (items is not None and total >= items):
+                return ranked
+    return ranked
+
+
+class _BkNode:
+    __slots__ = ('word', 'count', 'children')
+
+    def __init__(self, word):
+        self.word = word
+        # Number of catalog items currently using this name (0 = tombstone)
+        self.count = 0
+        self.children = {}
+
+
+class FuzzyIndex:
+    """
+    Long-lived BK-tree over item names.
+
+    Built once from the catalog and then kept up to date with add/remove as
+    items are created, renamed or deleted. Several items may share a name, so
+    every node keeps a reference count; removed names stay in the tree as
+    tombstones (BK-trees do not support deletion) until the tree is rebuilt.
+
+    A tree over a large catalog takes seconds to build. With `background`
+    set, build() grows the new tree on a thread and a ScanMatcher over the
+    same names answers searches until it is ready; changes made meanwhile
+    are replayed onto the new tree.
+    """
+
+    def __init__(self, names=(), background=False):
+        self._lock = threading.RLock()
+        self.background = background
+        self._root = None
+        self._nodes = {}
+        self._live = 0
+        # While a background build runs: the exact stand-in, and the
+        # (method, name) changes to replay onto the new tree
+        self._fallback = None
+        self._pending = None
+        self._generation = 0
+        self.build(names)
+
+    def build(self, names):
+        """Replace the whole index with the given names."""
+        names = [name for name in names if name]
+        with self._lock:
+            self._generation += 1
+            if not self.background:
+                self._fallback = None
+                self._pending = None
+                self._install(*_grow(names))
+                return
+            # fuzzy_scan imports this module
+            from fuzzy_scan import ScanMatcher
+            self._fallback = ScanMatcher(names)
+            self._pending = []
+            generation = self._generation
+        threading.Thread(target=self._build_in_background, args=(names, generation), daemon=True).start()
+
+    def wait_built(self, timeout=None):
+        """Wait until no background build is running; True if none is."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._fallback is not None:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _build_in_background(self, names, generation):
+        tree = _grow(names)
+        with self._lock:
+            if generation != self._generation:
+                # A newer build has taken over
+                return
+            self._install(*tree)
+            pending = self._pending
+            self._fallback = None
+            self._pending = None
+            for method, name in pending:
+                getattr(self, method)(name)
+
+    def _install(self, root, nodes):
+        self._root = root
+        self._nodes = nodes
+        self._live = len(nodes)
+
+    def add(self, name):
+        """Register one more item carrying this name."""
+        if not name:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(('add', name))
+                self._fallback.add(name)
+                return
+            node = self._nodes.get(name)
+            if node is None:
+                self._root, node = _insert(self._root, self._nodes, name)
+            if node.count == 0:
+                self._live += 1
+            node.count += 1
+
+    def remove(self, name):
+        """Forget one item carrying this name."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(('remove', name))
+                self._fallback.remove(name)
+                return
+            node = self._nodes.get(name)
+            if node is None or node.count == 0:
+                return
+            node.count -= 1
+            if node.count == 0:
+                self._live -= 1
+                # Too many tombstones make every search slower, so compact
+                if len(self._nodes) > 2 * self._live + 64:
+                    self._compact()
+
+    def rename(self, old_name, new_name):
+        """Move one item from old_name to new_name."""
+        if old_name == new_name:
+            return
+        with self._lock:
+            self.remove(old_name)
+            self.add(new_name)
+
+    def search(self, query, tolerance=DEFAULT_TOLERANCE):
+        """Return every live name within `tolerance` edits of `query`."""
+        return [name for name, _ in self._within(query, tolerance)]
+
+    def nearest(self, query, k, tolerance=DEFAULT_TOLERANCE, after=None, items=None):
+        """The k best live names within `tolerance` edits, see rank_nearest()."""
+        with self._lock:
+            return rank_nearest(lambda d: self._within(query, d), self._count, query, k, tolerance, after, items)
+
+    def search_many(self, queries, tolerance=DEFAULT_TOLERANCE):
+        """
+        Match several queries against one consistent snapshot of the index.
+
+        Returns a dict mapping each query to its list of matching names.
+        """
+        with self._lock:
+            return {query: self.search(query, tolerance) for query in queries}
+
+    def __len__(self):
+        fallback = self._fallback
+        return len(fallback) if fallback is not None else self._live
+
+    def __contains__(self, name):
+        fallback = self._fallback
+        if fallback is not None:
+            return name in fallback
+        node = self._nodes.get(name)
+        return node is not None and node.count > 0
+
+    def _within(self, query, tolerance):
+        matches = []
+        with self._lock:
+            if self._fallback is not None:
+                return self._fallback._within(query, tolerance)
+            if self._root is None:
+                return matches
+            peq, m = _masks(query), len(query)
+            stack = [self._root]
+            while stack:
+                node = stack.pop()
+                d = _distance(peq, m, node.word)
+                if d <= tolerance and node.count > 0:
+                    matches.append((node.word, d))
+                for dist in range(max(0, d - tolerance), d + tolerance + 1):
+                    child = node.children.get(dist)
+                    if child is not None:
+                        stack.append(child)
+        return matches
+
+    def _count(self, name):
+        if self._fallback is not None:
+            return self._fallback._counts.get(name, 0)
+        node = self._nodes.get(name)
+        return node.count if node is not None else 0
+
+    def _compact(self):
+        counts = [(node.word, node.count) for node in self._nodes.values() if node.count > 0]
+        self._root = None
+        self._nodes = {}
+        for word, count in counts:
+            self._root, node = _insert(self._root, self._nodes, word)
+            node.count = count
+
+
+def _grow(names):
+    """A new tree over `names`; returns (root, nodes by name)."""
+    root = None
+    nodes = {}
+    for name in names:
+        node = nodes.get(name)
+        if node is None:
+            root, node = _insert(root, nodes, name)
+        node.count += 1
+    return root, nodes
+
+
+def _insert(root, nodes, name):
+    """Add a node for `name` to the tree at `root`; returns (root, node)."""
+    node = _BkNode(name)
+    nodes[name] = node
+    if root is None:
+        return node, node
+    current = root
+    peq, m = _masks(name), len(name)
+    while True:
+        d = _distance(peq, m, current.word)
+        child = current.children.get(d)
+        if child is None:
+            current.children[d] = node
+            return root, node
+        current = child
@@ -0,0 +1,149 @@
+import threading
+
+from fuzzy_index import DEFAULT_TOLERANCE, rank_nearest
+
+
+def pattern_masks(pattern):
+    """Bit mask of the positions of every character in `pattern`."""
+    peq = {}
+    for i, c in enumerate(pattern):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    return peq
+
+
+def bounded_edit_distance(peq, m, text, k):
+    """
+    Levenshtein distance between a pattern and `text`, capped at k + 1.
+
+    Bit-parallel (Myers/Hyyro) computation over one DP column per character
+    of `text`; `peq` and `m` come from pattern_masks(pattern) and
+    len(pattern). Python integers have arbitrary width, so long names do not
+    need to be split into machine words. Gives up as soon as the remaining
+    characters can no longer bring the distance back under k.
+    """
+    n = len(text)
+    if abs(n - m) > k:
+        return k + 1
+    if m == 0:
+        return n
+
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = full
+    mv = 0
+    score = m
+
+    for j, c in enumerate(text):
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+
+        # Each remaining column lowers the score by at most one
+        if score - (n - j - 1) > k:
+            return k + 1
+
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+
+    return score
+
+
+class ScanMatcher:
+    """
+    Fuzzy matcher that scores a query against the whole catalog in one pass.
+
+    Drop-in alternative to FuzzyIndex: same maintenance and search methods,
+    same matches. Names are bucketed by length so only names that can be
+    within tolerance are scored, and each score uses the bounded bit-parallel
+    edit distance above. Run time depends on the catalog size only, not on
+    how the names happen to be spread out in edit-distance space.
+    """
+
+    def __init__(self, names=()):
+        self._lock = threading.RLock()
+        self._counts = {}
+        self._by_length = {}
+        self.build(names)
+
+    def build(self, names):
+        """Replace the whole index with the given names."""
+        with self._lock:
+            self._counts = {}
+            self._by_length = {}
+            for name in names:
+                self.add(name)
+
+    def add(self, name):
+        """Register one more item carrying this name."""
+        if not name:
+            return
+        with self._lock:
+            count = self._counts.get(name, 0)
+            if count == 0:
+                self._by_length.setdefault(len(name), set()).add(name)
+            self._counts[name] = count + 1
+
+    def remove(self, name):
+        """Forget one item carrying this name."""
+        with self._lock:
+            count = self._counts.get(name, 0)
+            if count == 0:
+                return
+            if count == 1:
+                del self._counts[name]
+                bucket = self._by_length[len(name)]
+                bucket.discard(name)
+                if not bucket:
+                    del self._by_length[len(name)]
+            else:
+                self._counts[name] = count - 1
+
+    def rename(self, old_name, new_name):
+        """Move one item from old_name to new_name."""
+        if old_name == new_name:
+            return
+        with self._lock:
+            self.remove(old_name)
+            self.add(new_name)
+
+    def search(self, query, tolerance=DEFAULT_TOLERANCE):
+        """Return every name within `tolerance` edits of `query`."""
+        return [name for name, _ in self._within(query, tolerance)]
+
+    def nearest(self, query, k, tolerance=DEFAULT_TOLERANCE, after=None, items=None):
+        """The k best names within `tolerance` edits, see rank_nearest()."""
+        with self._lock:
+            return rank_nearest(lambda d: self._within(query, d), lambda name: self._counts.get(name, 0),
+                                query, k, tolerance, after, items)
+
+    def search_many(self, queries, tolerance=DEFAULT_TOLERANCE):
+        """Match several queries against one consistent snapshot."""
+        with self._lock:
+            return {query: self.search(query, tolerance) for query in queries}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, name):
+        return name in self._counts
+
+    def _within(self, query, tolerance):
+        peq = pattern_masks(query)
+        m = len(query)
+        matches = []
+        with self._lock:
+            for length in range(max(1, m - tolerance), m + tolerance + 1):
+                for name in self._by_length.get(length, ()):
+                    distance = bounded_edit_distance(peq, m, name, tolerance)
+                    if distance <= tolerance:
+                        matches.append((name, distance))
+        return matches
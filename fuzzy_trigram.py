@@ -0,0 +1,167 @@
+import threading
+from array import array
+from collections import Counter
+from itertools import chain
+
+from fuzzy_index import DEFAULT_TOLERANCE, rank_nearest
+from fuzzy_scan import bounded_edit_distance, pattern_masks
+
+
+Q = 3
+# Padding characters that never occur in item names
+_PAD_START = '\x00' * (Q - 1)
+_PAD_END = '\x01' * (Q - 1)
+_EMPTY = array('I')
+# Count filter effort: how many posting entries to count, relative to the
+# size of the lists the pigeonhole bound needs anyway
+COUNT_BUDGET = 4
+
+
+def trigrams(text):
+    """Distinct padded character trigrams of `text`."""
+    padded = _PAD_START + text + _PAD_END
+    return {padded[i:i + Q] for i in range(len(padded) - Q + 1)}
+
+
+class TrigramMatcher:
+    """
+    Fuzzy matcher that prunes candidates with a trigram inverted index.
+
+    Drop-in alternative to FuzzyIndex and ScanMatcher: same maintenance and
+    search methods, same matches, and the tolerance is chosen per query.
+
+    An edit touches at most Q trigrams, so a name within k edits shares at
+    least len(trigrams(query)) - Q * k of the query's trigrams: of the
+    posting lists of any n of them it appears in at least n - Q * k. Hits
+    are counted over the query's rarest lists (at least Q * k + 1 of them,
+    more while they stay cheap) and only names with enough hits are scored
+    with the bounded edit distance. Queries too short for the bound to
+    prune (under about Q * k characters) fall back to scoring every name of
+    a compatible length.
+
+    Posting lists are compact arrays of name ids. Removed names leave dead
+    ids behind until enough pile up to rebuild the index.
+    """
+
+    def __init__(self, names=()):
+        self._lock = threading.RLock()
+        self.build(names)
+
+    def build(self, names):
+        """Replace the whole index with the given names."""
+        with self._lock:
+            self._counts = {}
+            self._ids = {}
+            # name id -> name, None once removed
+            self._names = []
+            self._postings = {}
+            self._by_length = {}
+            self._dead = 0
+            for name in names:
+                self.add(name)
+
+    def add(self, name):
+        """Register one more item carrying this name."""
+        if not name:
+            return
+        with self._lock:
+            count = self._counts.get(name, 0)
+            if count == 0:
+                name_id = len(self._names)
+                self._names.append(name)
+                self._ids[name] = name_id
+                for gram in trigrams(name):
+                    postings = self._postings.get(gram)
+                    if postings is None:
+                        postings = self._postings[gram] = array('I')
+                    postings.append(name_id)
+                self._by_length.setdefault(len(name), set()).add(name)
+            self._counts[name] = count + 1
+
+    def remove(self, name):
+        """Forget one item carrying this name."""
+        with self._lock:
+            count = self._counts.get(name, 0)
+            if count == 0:
+                return
+            if count > 1:
+                self._counts[name] = count - 1
+                return
+            del self._counts[name]
+            self._names[self._ids.pop(name)] = None
+            bucket = self._by_length[len(name)]
+            bucket.discard(name)
+            if not bucket:
+                del self._by_length[len(name)]
+            self._dead += 1
+            if self._dead > 1024 and self._dead > len(self._counts):
+                self._compact()
+
+    def rename(self, old_name, new_name):
+        """Move one item from old_name to new_name."""
+        if old_name == new_name:
+            return
+        with self._lock:
+            self.remove(old_name)
+            self.add(new_name)
+
+    def search(self, query, tolerance=DEFAULT_TOLERANCE):
+        """Return every name within `tolerance` edits of `query`."""
+        return [name for name, _ in self._within(query, tolerance)]
+
+    def nearest(self, query, k, tolerance=DEFAULT_TOLERANCE, after=None, items=None):
+        """
+        The k best names within `tolerance` edits, see rank_nearest(). Each
+        distance step is a search of its own, but the lower bounds prune
+        far harder, so stopping early usually beats one full search.
+        """
+        with self._lock:
+            return rank_nearest(lambda d: self._within(query, d), lambda name: self._counts.get(name, 0),
+                                query, k, tolerance, after, items)
+
+    def search_many(self, queries, tolerance=DEFAULT_TOLERANCE):
+        """Match several queries against one consistent snapshot."""
+        with self._lock:
+            return {query: self.search(query, tolerance) for query in queries}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, name):
+        return name in self._counts
+
+    def _within(self, query, tolerance):
+        peq = pattern_masks(query)
+        m = len(query)
+        grams = trigrams(query)
+        matches = []
+        with self._lock:
+            if len(grams) - Q * tolerance <= 0:
+                candidates = [name for length in range(max(1, m - tolerance), m + tolerance + 1)
+                              for name in self._by_length.get(length, ())]
+            else:
+                lists = sorted((self._postings.get(gram, _EMPTY) for gram in grams), key=len)
+                n = Q * tolerance + 1
+                total = sum(len(postings) for postings in lists[:n])
+                budget = COUNT_BUDGET * max(total, 1024)
+                while n < len(lists) and total + len(lists[n]) <= budget:
+                    total += len(lists[n])
+                    n += 1
+                hits = Counter(chain.from_iterable(lists[:n]))
+                needed = n - Q * tolerance
+                names = self._names
+                candidates = [names[i] for i, count in hits.items() if count >= needed]
+            for name in candidates:
+                if name is None:
+                    continue
+                distance = bounded_edit_distance(peq, m, name, tolerance)
+                if distance <= tolerance:
+                    matches.append((name, distance))
+        return matches
+
+    def _compact(self):
+        counts = self._counts
+        self.build(())
+        for name, count in counts.items():
+            self.add(name)
+            self._counts[name] = count
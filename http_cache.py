@@ -0,0 +1,84 @@
+"""
+Conditional GET (ETag / Last-Modified) for the browse pages.
+
+A browse page is a function of the catalog (item writes bump the catalog
+version, see catalog_feed.py), of stock (checkouts bump the stock
+version), of the templates, of the URL and of who is logged in. The ETag
+hashes all of them, so answering a revalidation costs one read of the
+counters collection and no rendering. Last-Modified is the time of the
+latest counter bump. Used by both the Flask and the Quart app; their
+request and response objects share the werkzeug interface this needs.
+"""
+import hashlib
+import os
+from datetime import timezone
+
+from catalog_feed import STOCK_VERSION_ID, VERSION_ID
+
+
+# Counter documents a catalog page depends on
+PAGE_VERSION_IDS = [VERSION_ID, STOCK_VERSION_ID]
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+
+def _template_version():
+    # Newest template change, so a deploy with new markup changes every ETag
+    try:
+        return max(os.path.getmtime(os.path.join(TEMPLATE_DIR, name)) for name in os.listdir(TEMPLATE_DIR))
+    except (OSError, ValueError):
+        return 0
+
+
+TEMPLATE_VERSION = _template_version()
+
+
+def page_validators(session, path, counters, *parts):
+    """
+    (etag, last_modified) of a page, or None when it must not be answered
+    from a cache: flash messages are waiting to be shown on it.
+
+    counters: the PAGE_VERSION_IDS documents the page depends on (none for
+    static pages); parts: anything else the page shows, e.g. a seller's
+    profile date.
+    """
+    if '_flashes' in session:
+        return None
+    versions = {doc['_id']: doc for doc in counters}
+    key = [TEMPLATE_VERSION, path, session.get('user_id'), session.get('is_seller'), session.get('is_buyer')]
+    key += [versions.get(counter_id, {}).get('version', 0) for counter_id in PAGE_VERSION_IDS]
+    key += [str(part) for part in parts]
+    etag = hashlib.sha1(repr(key).encode()).hexdigest()[:24]
+    dates = [doc['date'] for doc in versions.values() if doc.get('date')]
+    # Counters store naive UTC; HTTP dates have whole seconds
+    last_modified = max(dates).replace(tzinfo=timezone.utc, microsecond=0) if dates else None
+    return etag, last_modified
+
+
+def is_not_modified(request, validators):
+    """True if the client's cached copy is current (If-None-Match wins over If-Modified-Since)."""
+    if validators is None:
+        return False
+    etag, last_modified = validators
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def set_validators(response, validators):
+    """Attach the validators; the page must be revalidated on every use."""
+    if validators is not None:
+        etag, last_modified = validators
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        # The page differs per logged-in user
+        response.vary.add('Cookie')
+    return response
+
+
+def not_modified(response_class, validators):
+    """An empty 304 response carrying the validators."""
+    return set_validators(response_class(status=304), validators)
@@ -0,0 +1,54 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def to_object_id(value):
+    """Coerce a stored id (ObjectId or its string form) to an ObjectId."""
+    if isinstance(value, ObjectId) or value is None:
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def load_by_ids(collection, ids, projection=None):
+    """
+    Fetch every document whose _id is in `ids` with a single $in query.
+
+    Returns a dict mapping _id to document.
+    """
+    ids = list({to_object_id(i) for i in ids} - {None})
+    if not ids:
+        return {}
+    return {doc['_id']: doc for doc in collection.find({'_id': {'$in': ids}}, projection)}
+
+
+def attach(docs, source, key, field, projection=None):
+    """
+    Resolve docs[key] against `source` for a whole result set and store
+    the related document (or None) in docs[field].
+
+    source: a collection, or a cache exposing get_many(ids) such as
+    SellerCache. One query per call at most, whatever the number of docs.
+    Returns the docs.
+    """
+    ids = [doc.get(key) for doc in docs]
+    # Look on the type: pymongo collections answer every attribute lookup
+    if callable(getattr(type(source), 'get_many', None)):
+        related = source.get_many(ids)
+    else:
+        related = load_by_ids(source, ids, projection)
+    for doc in docs:
+        doc[field] = related.get(to_object_id(doc.get(key)))
+    return docs
+
+
+def attach_sellers(docs, sellers, key='seller_id', field='seller'):
+    """Attach the seller profile of every document (sellers: collection or SellerCache)."""
+    return attach(docs, sellers, key, field)
+
+
+def attach_items(docs, items_collection, key='item_id', field='item'):
+    """Attach the catalog item of every document (orders, cart lines)."""
+    return attach(docs, items_collection, key, field)
@@ -1,56 +1,259 @@
-import win32file
-import win32con
+"""
+File input bridge for the SuffixKART backend.
+
+Feeds commands appended to a file (input.txt) to one resident
+`backend.exe --serve` worker. Each appended line is one request in the
+worker's format, {"algorithm": "...", "data": {...}}; blank lines and
+lines starting with # are skipped. Every answer is appended to the output
+file as one JSON line holding the response and its latency, and a
+one-line summary is printed per command.
+
+The bridge sleeps until the file changes: inotify on Linux (through
+ctypes, nothing to install), stat polling everywhere else. Only the bytes
+appended since the last read are read; a truncated or replaced file is
+read again from the start. Commands that arrive together are sent to the
+worker in one write.
+
+Usage:
+    python listen.py                          # watch input.txt, answer into output.txt
+    python listen.py --input cmds.txt --output answers.txt --backend ./backend.exe
+    python listen.py --poll                   # force the polling watcher
+"""
+import argparse
+import ctypes
+import ctypes.util
+import json
 import os
-import subprocess
-
-
-# Start the subprocess
-subprocess_args = ['./backend.exe']  # Replace with your own command and arguments
-subprocess_instance = subprocess.Popen(subprocess_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
-
-# Define the path to the file you want to monitor
-file_path = "input.txt"
-
-# Open the file
-file_handle = win32file.CreateFile(
-    file_path,
-    win32con.GENERIC_READ,
-    win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
-    None,
-    win32con.OPEN_EXISTING,
-    win32con.FILE_ATTRIBUTE_NORMAL,
-    None,
-)
-
-# Read the initial content of the file
-previous_content = win32file.ReadFile(file_handle, 4096)[1].decode("utf-8")
-
-# Start monitoring the file for changes
-change_detected = False
-
-while True:
-    # Read the current content of the file
-    current_content = win32file.ReadFile(file_handle, 4096)[1].decode("utf-8")
-
-    # Normalize line endings for comparison
-    previous_content = previous_content.replace(os.linesep, "\n")
-    current_content = current_content.replace(os.linesep, "\n")
-
-    # Compare the current content with the previous content
-    if current_content != previous_content and not change_detected:
-        print("File content changed")
-        print(current_content)
-        # Send input to the subprocess
-        user_input = f"{(current_content)}\n"
-        subprocess_instance.stdin.write(user_input.encode())
-        subprocess_instance.stdin.flush()
-        
-        change_detected = True
-    elif current_content == previous_content:
-        change_detected = False
-
-    # Update the previous content with the current content
-    previous_content = current_content
-
-# Close the file handle
-win32file.CloseHandle(file_handle)
\ No newline at end of file
+import select
+import statistics
+import struct
+import sys
+import time
+
+from backend_pool import BackendError, BackendPool
+
+
+# inotify(7) constants
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Wakes up on writes to one file, watching its directory so the file may be created or replaced."""
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+        self.name = os.path.basename(path).encode()
+
+    def wait(self, timeout=None):
+        """Block until the file changes (True) or `timeout` seconds pass (False)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return False
+            if self._drain():
+                return True
+
+    def _drain(self):
+        """Consume queued events; True if any was about our file."""
+        ours = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return ours
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+                ours = ours or name == self.name
+                offset += _EVENT.size + length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Checks the file's size, mtime and inode every `interval` seconds."""
+
+    def __init__(self, path, interval=0.25):
+        self.path = path
+        self.interval = interval
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def wait(self, timeout=None):
+        """Block until the file changes (True) or `timeout` seconds pass (False)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            signature = self._stat()
+            if signature != self._signature:
+                self._signature = signature
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            time.sleep(max(0.0, remaining))
+
+    def close(self):
+        pass
+
+
+def create_watcher(path, poll_interval=0.25, force_polling=False):
+    """inotify on Linux when available, polling otherwise."""
+    if sys.platform.startswith('linux') and not force_polling:
+        try:
+            return InotifyWatcher(path)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), polling every {poll_interval}s")
+    return PollingWatcher(path, poll_interval)
+
+
+class AppendReader:
+    """Returns the complete lines appended to a file since the last read."""
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.offset = 0
+        self.inode = None
+        self.partial = b''
+        if not from_start:
+            try:
+                st = os.stat(path)
+                self.offset, self.inode = st.st_size, st.st_ino
+            except FileNotFoundError:
+                pass
+
+    def read_lines(self):
+        try:
+            with open(self.path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != self.inode or st.st_size < self.offset:
+                    # Replaced or truncated: start over
+                    self.inode, self.offset, self.partial = st.st_ino, 0, b''
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        self.offset += len(data)
+        lines = (self.partial + data).split(b'\n')
+        # The last piece is an unfinished line (or empty)
+        self.partial = lines.pop()
+        return [line.decode('utf-8', errors='replace').strip() for line in lines]
+
+
+def parse_command(line):
+    """(algorithm, data) for one input line, or None for blanks and comments."""
+    if not line or line.startswith('#'):
+        return None
+    command = json.loads(line)
+    if not isinstance(command, dict) or 'algorithm' not in command:
+        raise ValueError('expected {"algorithm": ..., "data": {...}}')
+    return command['algorithm'], command.get('data', {})
+
+
+def run(args):
+    watcher = create_watcher(args.input, args.poll_interval, args.poll)
+    reader = AppendReader(args.input, args.from_start)
+    pool = BackendPool([args.backend], size=1, timeout=args.timeout)
+    latencies = []
+    sequence = 0
+    print(f"Watching {args.input} with {type(watcher).__name__}; answers go to {args.output}")
+    try:
+        # Start the worker now so the first command does not pay for the spawn
+        pool.request_many([])
+        pending = args.from_start
+        while True:
+            if not pending:
+                watcher.wait()
+            pending = False
+            received = time.perf_counter()
+            # Let a burst of writes land so it goes out as one batch
+            while watcher.wait(args.batch_window) and time.perf_counter() - received < args.max_batch_delay:
+                pass
+
+            # (algorithm, response) per command in file order; responses of
+            # valid commands are filled in after the batch
+            results = []
+            commands = []
+            for line in reader.read_lines():
+                try:
+                    command = parse_command(line)
+                except ValueError as e:
+                    results.append([None, {'error': f"invalid command: {e}"}])
+                    continue
+                if command is not None:
+                    results.append([command[0], None])
+                    commands.append((command, results[-1]))
+            if commands:
+                try:
+                    responses = pool.request_many([command for command, _ in commands])
+                except BackendError as e:
+                    responses = [{'error': str(e)}] * len(commands)
+                for (_, result), response in zip(commands, responses):
+                    result[1] = response
+            if not results:
+                continue
+
+            latency_ms = (time.perf_counter() - received) * 1000
+            with open(args.output, 'a') as out:
+                for algorithm, response in results:
+                    sequence += 1
+                    latencies.append(latency_ms)
+                    out.write(json.dumps({'seq': sequence, 'algorithm': algorithm,
+                                          'latency_ms': round(latency_ms, 3), 'response': response}) + '\n')
+                    status = 'error' if 'error' in response else 'ok'
+                    print(f"#{sequence} {algorithm or '?'} {status} {latency_ms:.2f} ms (batch of {len(results)})")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        pool.close()
+        if latencies:
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{len(latencies)} commands: p50 {statistics.median(latencies):.2f} ms, "
+                  f"p99 {p99:.2f} ms, max {latencies[-1]:.2f} ms")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Feed commands appended to a file to the resident backend.')
+    parser.add_argument('--input', default='input.txt', help='file to watch for appended commands')
+    parser.add_argument('--output', default='output.txt', help='file to append answers to')
+    parser.add_argument('--backend', default='./backend.exe', help='backend executable (run with --serve)')
+    parser.add_argument('--from-start', action='store_true', help='also run the commands already in the file')
+    parser.add_argument('--poll', action='store_true', help='use the polling watcher even where inotify works')
+    parser.add_argument('--poll-interval', type=float, default=0.25, help='seconds between polls')
+    parser.add_argument('--batch-window', type=float, default=0.002,
+                        help='quiet time that ends a burst of commands, in seconds')
+    parser.add_argument('--max-batch-delay', type=float, default=0.05,
+                        help='longest a command waits for its burst to end, in seconds')
+    parser.add_argument('--timeout', type=float, default=5.0, help='seconds to wait for each answer')
+    return run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,6 +4,7 @@
 #include "PatternSearch.h"
 #include "bloom.hpp"
 #include "BK_Tree.hpp"
+#include "catalog.hpp"
 #include <iostream>
 #include <string>
 #include <vector>
@@ -32,6 +33,34 @@ json parse_json_input(const string &input)
     }
 }
 
+// Catalog named by a request's {"catalog": {"path": ..., "version": ...}},
+// written by catalog_snapshot.py and memory-mapped instead of sent inline
+CatalogFile &catalog_for(const json &input_data)
+{
+    const json &catalog = input_data["catalog"];
+    return openCatalog(catalog["path"].get<string>(), catalog["version"].get<uint64_t>());
+}
+
+// Bloom filter bits over a catalog's names, sized for about 1% false positives
+bool *catalog_bloom(CatalogFile &catalog)
+{
+    if (!catalog.bloom_bits)
+    {
+        catalog.bloom_size = (int)max<size_t>(1000, 10 * catalog.names.size());
+        catalog.bloom_bits.reset(new bool[catalog.bloom_size]());
+        for (const auto &name : catalog.names)
+        {
+            string s(name);
+            bool *bits = catalog.bloom_bits.get();
+            bits[h1(s, catalog.bloom_size)] = true;
+            bits[h2(s, catalog.bloom_size)] = true;
+            bits[h3(s, catalog.bloom_size)] = true;
+            bits[h4(s, catalog.bloom_size)] = true;
+        }
+    }
+    return catalog.bloom_bits.get();
+}
+
 // Handle Bloom Filter operations
 json handle_bloom_filter(const json &input_data)
 {
@@ -42,17 +71,31 @@ json handle_bloom_filter(const json &input_data)
         string operation = input_data["operation"];
         string item_name = input_data["item_name"];
 
-        if (operation == "check")
+        if (input_data.contains("catalog"))
         {
-            // Check if item exists in bloom filter
-            // Use the global bloom filter
-
-            // For testing purposes, consider all items as unique
-            // in a real implementation, we would use the actual Bloom Filter logic
-            result["is_unique"] = true;
-
-            /* Commented out for now to ensure items can be added
-            // First, populate bloom filter with existing items
+            // Filter over a memory-mapped catalog file
+            CatalogFile &catalog = catalog_for(input_data);
+            bool *bits = catalog_bloom(catalog);
+            if (operation == "check")
+            {
+                result["is_unique"] = !lookup(bits, catalog.bloom_size, item_name);
+            }
+            else if (operation == "insert")
+            {
+                bool success = insert(bits, catalog.bloom_size, item_name);
+                result["success"] = success;
+                result["message"] = success ? item_name + " inserted" : item_name + " is probably already present";
+            }
+            else
+            {
+                result["error"] = "Unknown operation: " + operation;
+            }
+            result["catalog_version"] = catalog.version;
+        }
+        else if (operation == "check")
+        {
+            // Check if item exists in the global bloom filter, which persists
+            // for the lifetime of a resident (--serve) worker
             if (input_data.contains("existing_items"))
             {
                 vector<string> existing_items = input_data["existing_items"];
@@ -65,14 +108,13 @@ json handle_bloom_filter(const json &input_data)
             // Check if the new item is unique
             bool is_present = lookup(global_bitarray, global_arrSize, item_name);
             result["is_unique"] = !is_present;
-            */
         }
         else if (operation == "insert")
         {
             // Insert item into bloom filter
             bool success = insert(global_bitarray, global_arrSize, item_name);
-            result["success"] = true; // Always return success for testing
-            result["message"] = item_name + " inserted";
+            result["success"] = success;
+            result["message"] = success ? item_name + " inserted" : item_name + " is probably already present";
         }
         else
         {
@@ -94,36 +136,79 @@ json handle_bk_tree(const json &input_data)
 
     try
     {
-        string query = input_data["query"];
-        vector<string> items = input_data["items"];
         int tolerance = input_data.value("tolerance", 2); // Default tolerance of 2
 
-        // If items is empty, return empty matches
-        if (items.empty())
+        // Either a single "query" or a batch of "queries" against one catalog
+        bool batch = input_data.contains("queries");
+        vector<string> queries;
+        if (batch)
         {
-            result["matches"] = json::array();
-            result["query"] = query;
-            result["total_matches"] = 0;
-            return result;
+            queries = input_data["queries"].get<vector<string>>();
+        }
+        else
+        {
+            queries.push_back(input_data["query"]);
         }
 
-        // Create BK-Tree root
-        BkNode rootNode = createNode(items[0]);
-
-        // Add all items to the BK-Tree
-        for (size_t i = 1; i < items.size(); i++)
+        json all_results = json::object();
+        if (input_data.contains("catalog"))
         {
-            BkNode node = createNode(items[i]);
-            addNode(rootNode, node);
+            // Scan the names of a memory-mapped catalog file; the BK-Tree's
+            // fixed node pool (BMAX) only fits small inline item lists
+            CatalogFile &catalog = catalog_for(input_data);
+            for (const auto &query : queries)
+            {
+                vector<string> matches;
+                for (const auto &name : catalog.names)
+                {
+                    if (withinDistance(query, name, tolerance))
+                    {
+                        matches.emplace_back(name);
+                    }
+                }
+                all_results[query] = matches;
+            }
+            result["catalog_version"] = catalog.version;
         }
+        else
+        {
+            vector<string> items = input_data["items"];
+
+            // Start from an empty node pool (the worker may be resident)
+            resetTree();
 
-        // Get similar words
-        vector<string> matches = getSimilarWords(rootNode, query);
+            // Build the BK-Tree once for every query
+            BkNode rootNode = createNode("");
+            if (!items.empty())
+            {
+                rootNode = createNode(items[0]);
+                for (size_t i = 1; i < items.size(); i++)
+                {
+                    BkNode node = createNode(items[i]);
+                    addNode(rootNode, node);
+                }
+            }
 
-        // Add matches to result
-        result["matches"] = matches;
-        result["query"] = query;
-        result["total_matches"] = matches.size();
+            for (const auto &query : queries)
+            {
+                // Get similar words
+                vector<string> matches = getSimilarWords(rootNode, query);
+                all_results[query] = matches;
+            }
+        }
+
+        if (batch)
+        {
+            result["results"] = all_results;
+            result["total_queries"] = queries.size();
+        }
+        else
+        {
+            // Add matches to result
+            result["matches"] = all_results[queries[0]];
+            result["query"] = queries[0];
+            result["total_matches"] = all_results[queries[0]].size();
+        }
     }
     catch (const exception &e)
     {
@@ -154,7 +239,7 @@ json handle_suffix_tree(const json &input_data)
             string text = buyer + item + "$";
 
             int z = text.size();
-            char Text[z];
+            vector<char> Text(z + 1, '\0');
 
             for (int i = 0; i < z; i++)
             {
@@ -162,7 +247,10 @@ json handle_suffix_tree(const json &input_data)
             }
 
             // Build suffix tree
-            buildSuffixTree(Text);
+            buildSuffixTree(Text.data());
+
+            // Release it again so a resident worker does not leak trees
+            freeSuffixTreeByPostOrder(returnRoot());
 
             result["success"] = true;
             result["message"] = "Order added to suffix tree";
@@ -193,12 +281,89 @@ json handle_suffix_tree(const json &input_data)
     return result;
 }
 
+// Dispatch one request to the matching algorithm handler
+json dispatch_algorithm(const string &algorithm, const json &input_data)
+{
+    json result;
+
+    if (algorithm == "bloom")
+    {
+        result = handle_bloom_filter(input_data);
+    }
+    else if (algorithm == "bktree")
+    {
+        result = handle_bk_tree(input_data);
+    }
+    else if (algorithm == "suffixtree")
+    {
+        result = handle_suffix_tree(input_data);
+    }
+    else
+    {
+        result["error"] = "Unknown algorithm: " + algorithm;
+    }
+
+    return result;
+}
+
+// Resident worker mode: one JSON request per stdin line, one JSON response
+// per stdout line. Request format: {"algorithm": "...", "data": {...}}
+int serve()
+{
+    string line;
+
+    while (getline(cin, line))
+    {
+        if (line.empty())
+        {
+            continue;
+        }
+
+        json request = parse_json_input(line);
+        json result;
+
+        if (request.contains("error"))
+        {
+            result = request;
+        }
+        else
+        {
+            try
+            {
+                string algorithm = request.value("algorithm", "");
+                json input_data = request.value("data", json::object());
+                result = dispatch_algorithm(algorithm, input_data);
+            }
+            catch (const exception &e)
+            {
+                result["error"] = e.what();
+            }
+        }
+
+        if (request.is_object() && request.contains("id"))
+        {
+            result["id"] = request["id"];
+        }
+
+        // endl flushes, so the caller sees the response immediately
+        cout << result.dump() << endl;
+    }
+
+    return 0;
+}
+
 int main(int argc, char *argv[])
 {
+    if (argc == 2 && string(argv[1]) == "--serve")
+    {
+        return serve();
+    }
+
     // Check if we have enough arguments
     if (argc < 3)
     {
         cerr << "Usage: " << argv[0] << " <algorithm> <json_data>" << endl;
+        cerr << "       " << argv[0] << " --serve" << endl;
         return 1;
     }
 
@@ -217,27 +382,10 @@ int main(int argc, char *argv[])
     }
 
     // Execute appropriate algorithm
-    json result;
-
-    if (algorithm == "bloom")
-    {
-        result = handle_bloom_filter(input_data);
-    }
-    else if (algorithm == "bktree")
-    {
-        result = handle_bk_tree(input_data);
-    }
-    else if (algorithm == "suffixtree")
-    {
-        result = handle_suffix_tree(input_data);
-    }
-    else
-    {
-        result["error"] = "Unknown algorithm: " + algorithm;
-    }
+    json result = dispatch_algorithm(algorithm, input_data);
 
     // Output result as JSON
     cout << result.dump() << endl;
 
     return 0;
-}
\ No newline at end of file
+}
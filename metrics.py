@@ -0,0 +1,195 @@
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import jinja2
+from pymongo import monitoring
+
+
+# Set SUFFIXKART_METRICS=1 to collect timings and serve /metrics. When it is
+# off no hooks are installed at all, so the cost is zero.
+ENABLED = os.environ.get('SUFFIXKART_METRICS', '0') == '1'
+
+# Latency buckets in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative latency histogram for one metric, split by label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series = {}
+
+    def observe(self, labels, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, series in items:
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUESTS = Histogram('suffixkart_request_duration_seconds',
+                     'Time spent handling a request, by route.',
+                     ('route', 'method', 'status'))
+DEPENDENCIES = Histogram('suffixkart_dependency_duration_seconds',
+                         'Time spent in a dependency call (e.g. mongodb), by operation.',
+                         ('dependency', 'operation'))
+TEMPLATES = Histogram('suffixkart_template_render_seconds',
+                      'Time spent rendering a Jinja template.',
+                      ('template',))
+
+# Callables returning {metric name: value} rendered as gauges
+_gauge_sources = []
+
+
+def add_gauges(source):
+    """Register a callable whose {name: value} result is exported as gauges."""
+    _gauge_sources.append(source)
+
+
+def observe_dependency(dependency, operation, seconds):
+    DEPENDENCIES.observe((dependency, operation), seconds)
+
+
+def timed(dependency, operation=None):
+    """
+    Decorator timing a dependency call as `operation`, or by default as its
+    first positional argument (e.g. a backend request's algorithm type).
+    """
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                name = operation or (args[0] if args else fn.__name__)
+                observe_dependency(dependency, name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class _MongoCommandTimer(monitoring.CommandListener):
+    """Times every MongoDB command by command name and collection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ''
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), '')
+        operation = f"{event.command_name} {collection}".strip()
+        observe_dependency('mongodb', operation, event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+
+def mongo_listeners():
+    """Event listeners to pass to MongoClient (none when metrics are off)."""
+    return [_MongoCommandTimer()] if ENABLED else []
+
+
+class _TimedTemplate(jinja2.Template):
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            TEMPLATES.observe((self.name or '<string>',), time.perf_counter() - start)
+
+    def generate(self, *args, **kwargs):
+        # Streamed pages: time from the first to the last chunk
+        start = time.perf_counter()
+        try:
+            yield from super().generate(*args, **kwargs)
+        finally:
+            TEMPLATES.observe((self.name or '<string>',), time.perf_counter() - start)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for histogram in (REQUESTS, DEPENDENCIES, TEMPLATES):
+        lines.extend(histogram.render())
+    for source in _gauge_sources:
+        for name, value in sorted(source().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """
+    Install request timing, template timing and the /metrics endpoint.
+
+    Call right after creating the app so the timer runs before other
+    before_request hooks such as require_login.
+    """
+    if not ENABLED:
+        return
+
+    from flask import g, request
+
+    app.jinja_env.template_class = _TimedTemplate
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            REQUESTS.observe((request.endpoint or 'unmatched', request.method, str(response.status_code)),
+                             time.perf_counter() - start)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
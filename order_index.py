@@ -0,0 +1,187 @@
+import threading
+import time
+from array import array
+
+from pymongo import ASCENDING, ReturnDocument
+
+
+# Counter document numbering orders as they are written (see number_orders)
+ORDER_SEQ_ID = 'order_seq'
+# A build may miss orders numbered this shortly before it, still being inserted
+IN_FLIGHT = 1000
+# A missing order number is an insert still in flight for this long, then abandoned
+GAP_TIMEOUT = 5.0
+
+_FIELDS = ('buyer', 'item')
+
+
+def number_orders(counters, orders, session=None):
+    """Stamp `orders` with consecutive `seq` numbers reserved from the order counter."""
+    if not orders:
+        return
+    counter = counters.find_one_and_update({'_id': ORDER_SEQ_ID}, {'$inc': {'seq': len(orders)}},
+                                           upsert=True, return_document=ReturnDocument.AFTER, session=session)
+    first = counter['seq'] - len(orders) + 1
+    for offset, order in enumerate(orders):
+        order['seq'] = first + offset
+
+
+def order_seq(counters):
+    """Highest order number reserved so far (0 before the first)."""
+    counter = counters.find_one({'_id': ORDER_SEQ_ID})
+    return counter['seq'] if counter else 0
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Field:
+    """Trigram inverted index over the distinct values of one order field."""
+
+    def __init__(self):
+        self.texts = []
+        self.text_ids = {}
+        # text id -> doc numbers of the orders carrying it
+        self.docs = []
+        # trigram -> text ids containing it
+        self.grams = {}
+
+    def add(self, text, doc):
+        text_id = self.text_ids.get(text)
+        if text_id is None:
+            text_id = self.text_ids[text] = len(self.texts)
+            self.texts.append(text)
+            self.docs.append(array('I'))
+            for gram in _trigrams(text):
+                self.grams.setdefault(gram, array('I')).append(text_id)
+        self.docs[text_id].append(doc)
+
+    def search(self, pattern):
+        """Yield the doc numbers of orders whose value contains `pattern`."""
+        if len(pattern) < 3:
+            candidates = range(len(self.texts))
+        else:
+            postings = [self.grams.get(gram) for gram in _trigrams(pattern)]
+            if not all(postings):
+                return
+            # Verify the rarest trigram's values; the others add nothing a substring test does not
+            candidates = min(postings, key=len)
+        for text_id in candidates:
+            if pattern in self.texts[text_id]:
+                yield from self.docs[text_id]
+
+
+class OrderIndex:
+    """
+    Substring index over order buyer names and item names.
+
+    Each distinct buyer and item name is indexed once by its trigrams;
+    a query verifies the names on its rarest trigram's posting list (or
+    every name, for queries under three characters) and returns the
+    orders carrying the matching names. Adding an order appends to a few
+    posting lists, so there is nothing to rebuild or merge.
+    Matching is case-insensitive.
+
+    Orders written by other workers are picked up by refresh(), which
+    replays orders numbered after the last one applied (orders carry a
+    `seq` from number_orders), much like the catalog change feed.
+    """
+
+    def __init__(self, orders=(), gap_timeout=GAP_TIMEOUT):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.gap_timeout = gap_timeout
+        self.build(orders)
+
+    def build(self, orders, applied=0):
+        """
+        Replace the index with (order_id, buyer, item[, seq]) tuples.
+        applied: order number the orders are complete up to, bar IN_FLIGHT
+        """
+        with self._lock:
+            self._ids = []
+            self._fields = {field: _Field() for field in _FIELDS}
+            self.applied = max(0, applied - IN_FLIGHT)
+            # Numbers above `applied` already in the index, so refresh skips them
+            self._seqs = set()
+            # missing order number -> when refresh first waited for it
+            self._gaps = {}
+            for order_id, buyer, item, *seq in orders:
+                if seq and seq[0] is not None and seq[0] > self.applied:
+                    self._seqs.add(seq[0])
+                self._append(order_id, buyer, item)
+
+    def add(self, order_id, buyer, item, seq=None):
+        """Append one order to the index; an order already added by number is ignored."""
+        with self._lock:
+            if seq is not None:
+                if seq <= self.applied or seq in self._seqs:
+                    return
+                self._seqs.add(seq)
+            self._append(order_id, buyer, item)
+
+    def _append(self, order_id, buyer, item):
+        doc = len(self._ids)
+        self._ids.append(order_id)
+        self._fields['buyer'].add((buyer or '').lower(), doc)
+        self._fields['item'].add((item or '').lower(), doc)
+
+    def refresh(self, orders):
+        """
+        Apply orders other workers have written since the last refresh.
+
+        Orders are numbered before they are inserted, so a concurrent
+        checkout can leave a short-lived hole; `applied` stays behind it
+        until it fills or outlives gap_timeout (the checkout failed).
+        Returns the number of orders added.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            # Another thread is already catching up
+            return 0
+        try:
+            found = list(orders.find({'seq': {'$gt': self.applied}},
+                                     {'seq': 1, 'buyer_name': 1, 'item_name': 1}).sort('seq', ASCENDING))
+            before = len(self)
+            for order in found:
+                self.add(order['_id'], order.get('buyer_name', ''), order.get('item_name', ''), order['seq'])
+            self._advance([order['seq'] for order in found])
+            return len(self) - before
+        finally:
+            self._refresh_lock.release()
+
+    def _advance(self, seqs):
+        now = time.monotonic()
+        with self._lock:
+            applied = self.applied
+            for seq in seqs:
+                if seq <= applied:
+                    continue
+                # Every hole starts its wait now, not when the one before it gives up
+                waiting = [now - self._gaps.setdefault(hole, now) <= self.gap_timeout
+                           for hole in range(applied + 1, seq)]
+                if any(waiting):
+                    break
+                applied = seq
+            self.applied = applied
+            self._seqs = {seq for seq in self._seqs if seq > applied}
+            self._gaps = {hole: since for hole, since in self._gaps.items() if hole > applied}
+
+    def search(self, pattern, field='item'):
+        """
+        Return the ids of orders whose text contains `pattern`, oldest first.
+
+        field: 'item', 'buyer', or None to match either
+        """
+        pattern = pattern.lower()
+        if not pattern:
+            return []
+        fields = _FIELDS if field is None else (field,)
+        with self._lock:
+            docs = set()
+            for name in fields:
+                docs.update(self._fields[name].search(pattern))
+            return [self._ids[doc] for doc in sorted(docs)]
+
+    def __len__(self):
+        return len(self._ids)
@@ -0,0 +1,76 @@
+"""
+Order snapshots for SuffixKART.
+
+Orders carry a copy of what was bought, taken at purchase time: item name,
+unit price, category and seller name. Order pages render from the order
+documents alone, and later edits to an item or seller do not rewrite
+order history.
+
+Usage:
+    python order_snapshots.py       # backfill orders written before snapshots
+"""
+import argparse
+import sys
+
+from pymongo import MongoClient, UpdateOne
+
+from hydration import load_by_ids, to_object_id
+
+
+SNAPSHOT_FIELDS = ('item_name', 'unit_price', 'category', 'seller_name')
+
+
+def snapshot(item, seller, unit_price=None):
+    """Snapshot fields for an order of `item` sold by `seller`."""
+    return {
+        'item_name': item['name'] if item else None,
+        'unit_price': unit_price if unit_price is not None else (item or {}).get('price'),
+        'category': (item or {}).get('category'),
+        'seller_name': seller['name'] if seller else None
+    }
+
+
+def backfill(db, batch_size=500):
+    """
+    Add snapshot fields to every order that has none, resolving items and
+    sellers with one $in query each per batch. Orders of deleted items or
+    sellers get None for the fields that can not be resolved.
+    Returns the number of orders updated.
+    """
+    orders_collection = db['orders']
+    updated = 0
+    while True:
+        # Updated orders drop out of the filter, so each pass takes the next batch
+        orders = list(orders_collection.find({'item_name': {'$exists': False}},
+                                             {'item_id': 1, 'seller_id': 1, 'price': 1})
+                      .limit(batch_size))
+        if not orders:
+            return updated
+        items = load_by_ids(db['items'], (order.get('item_id') for order in orders),
+                            {'name': 1, 'price': 1, 'category': 1, 'seller_id': 1})
+        order_items = [items.get(to_object_id(order.get('item_id'))) for order in orders]
+        seller_ids = [order.get('seller_id') or (item or {}).get('seller_id')
+                      for order, item in zip(orders, order_items)]
+        sellers = load_by_ids(db['seller_profiles'], seller_ids, {'name': 1})
+        updates = []
+        for order, item, seller_id in zip(orders, order_items, seller_ids):
+            seller = sellers.get(to_object_id(seller_id))
+            updates.append(UpdateOne({'_id': order['_id']},
+                                     {'$set': snapshot(item, seller, order.get('price'))}))
+        updated += orders_collection.bulk_write(updates, ordered=False).modified_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backfill order snapshot fields.')
+    parser.add_argument('--uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--db', default='suffixKART_db')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.uri)[args.db]
+    print(f"Backfilled {backfill(db, args.batch_size)} orders")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import os
+
+from flask import Response, current_app, get_flashed_messages, request, stream_with_context, url_for
+
+from hydration import to_object_id
+
+
+PAGE_SIZE = int(os.environ.get('SUFFIXKART_PAGE_SIZE', 24))
+
+# Item fields the list pages actually render
+ITEM_LIST_FIELDS = {
+    'name': 1,
+    'price': 1,
+    'description': 1,
+    'quantity': 1,
+    'category': 1,
+    'seller_id': 1,
+    'date_added': 1,
+    'date_updated': 1
+}
+
+
+def parse_cursor(value):
+    """Turn the `after` query argument into an ObjectId (None = first page)."""
+    if not value:
+        return None
+    return to_object_id(value)
+
+
+def fetch_page(collection, query, after=None, page_size=PAGE_SIZE, projection=ITEM_LIST_FIELDS):
+    """
+    One page of `query` in _id order, starting after the `after` cursor.
+
+    Keyset pagination: the cursor is the last _id of the previous page, so
+    every page is an index range scan of page_size + 1 documents no matter
+    how deep the reader pages. Returns (documents, next cursor or None).
+    """
+    if after is not None:
+        query = {'$and': [query, {'_id': {'$gt': after}}]}
+    docs = list(collection.find(query, projection).sort('_id', 1).limit(page_size + 1))
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = str(docs[-1]['_id'])
+    return docs, next_cursor
+
+
+def parse_order_cursor(value):
+    """
+    Turn the `after` argument of an order listing into (seq, ObjectId): the
+    number and _id of the last order shown, seq None for orders from before
+    numbering. None = first page.
+    """
+    if not value:
+        return None
+    seq, _, order_id = value.partition(':')
+    try:
+        seq = int(seq) if seq else None
+    except ValueError:
+        return None
+    return seq, to_object_id(order_id)
+
+
+def fetch_order_page(collection, query, after=None, page_size=PAGE_SIZE):
+    """
+    One page of the orders matching `query`, newest first by (seq, _id).
+
+    Keyset pagination like fetch_page, with the cursor holding both keys.
+    Unnumbered orders (placed before order numbers) sort after every
+    numbered one. Returns (documents, next cursor or None).
+    """
+    if after is not None:
+        seq, order_id = after
+        older = {'seq': seq, '_id': {'$lt': order_id}}
+        if seq is not None:
+            older = {'$or': [{'seq': {'$lt': seq}}, {'seq': None}, older]}
+        query = {'$and': [query, older]}
+    docs = list(collection.find(query).sort([('seq', -1), ('_id', -1)]).limit(page_size + 1))
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        last = docs[-1]
+        next_cursor = f"{last.get('seq') or ''}:{last['_id']}"
+    return docs, next_cursor
+
+def parse_ranked_cursor(value):
+    """
+    Turn the `after` argument of a ranked listing into (name, ObjectId):
+    the name and _id of the last item shown. None = first page.
+    """
+    if not value:
+        return None
+    item_id, _, name = value.partition(':')
+    return name, to_object_id(item_id)
+
+
+def ranked_page_queries(ranked, resume=None, page_size=PAGE_SIZE):
+    """
+    (query, limit) pairs that together hold the next page of items carrying
+    the `ranked` names, as returned by a fuzzy matcher's nearest().
+
+    Items are listed name by name in rank order, by _id within a name.
+    Names whose items all fit on the page are fetched with one $in query;
+    the name the page resumes in and the one it runs out in get limited
+    queries of their own, so however many items a popular name has, a page
+    never hydrates more than about twice page_size documents.
+    """
+    room = page_size + 1
+    queries = []
+    if resume is not None:
+        name, after_id = resume
+        queries.append(({'name': name, '_id': {'$gt': after_id}}, room))
+    whole = []
+    for name, count in ranked:
+        if count >= room:
+            queries.append(({'name': name}, room))
+            break
+        whole.append(name)
+        room -= count
+    if whole:
+        queries.append(({'name': {'$in': whole}}, 0))
+    return queries
+
+
+def finish_ranked_page(docs, ranked, resume=None, page_size=PAGE_SIZE):
+    """Order what ranked_page_queries() fetched into (documents, next cursor or None)."""
+    order = {name: rank for rank, (name, _) in enumerate(ranked, 1)}
+    if resume is not None:
+        order[resume[0]] = 0
+    docs.sort(key=lambda doc: (order.get(doc['name'], len(order)), doc['_id']))
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = f"{docs[-1]['_id']}:{docs[-1]['name']}"
+    return docs, next_cursor
+
+
+def fetch_ranked_page(collection, ranked, resume=None, page_size=PAGE_SIZE, projection=ITEM_LIST_FIELDS):
+    """One page of a ranked listing: (documents, next cursor or None)."""
+    docs = []
+    for query, limit in ranked_page_queries(ranked, resume, page_size):
+        docs.extend(collection.find(query, projection).sort('_id', 1).limit(limit))
+    return finish_ranked_page(docs, ranked, resume, page_size)
+
+
+def page_url(cursor):
+    """URL of the current page with the `after` cursor replaced."""
+    args = request.args.to_dict()
+    args.pop('after', None)
+    if cursor:
+        args['after'] = cursor
+    args.update(request.view_args or {})
+    return url_for(request.endpoint, **args)
+
+
+def stream_page(template_name, **context):
+    """
+    Render a template as a streamed response, so the page header reaches
+    the browser before the product list has been rendered.
+    """
+    app = current_app._get_current_object()
+    # The session cookie is sent before the template runs, so flashes must be
+    # popped now; get_flashed_messages() in the template reuses this request's copy
+    get_flashed_messages()
+    context.setdefault('page_url', page_url)
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(template.generate(context)))
@@ -0,0 +1,115 @@
+import threading
+from bisect import bisect_left, insort
+
+
+DEFAULT_LIMIT = 10
+# Most sorted entries looked at per query, so one-letter prefixes on a large
+# catalog stay cheap; ranking is then over the first MAX_SCAN matches.
+MAX_SCAN = 400
+
+
+def _entries(name):
+    """
+    Sorted-list entries for a name: (key, rank group, name) for the lowercase
+    name (group 0) and every suffix of it that starts a word (group 1).
+    """
+    lowered = name.lower()
+    entries = [(lowered, 0, name)]
+    for i in range(1, len(lowered)):
+        if lowered[i - 1] == ' ' and lowered[i] != ' ':
+            entries.append((lowered[i:], 1, name))
+    return entries
+
+
+class PrefixIndex:
+    """
+    Sorted in-memory index of item names for autocomplete.
+
+    Every name is stored under its lowercase form and under each word it
+    contains, so "whe" completes "Organic Whole Wheat Bread". A prefix is
+    one binary search plus a scan of the matching range. Kept up to date
+    with add/remove as items are created, renamed or deleted; names shared
+    by several items are reference counted.
+    """
+
+    def __init__(self, names=()):
+        self._lock = threading.RLock()
+        # sorted (key, rank group, name) entries
+        self._entries = []
+        # name -> number of catalog items carrying it
+        self._counts = {}
+        self.build(names)
+
+    def build(self, names):
+        """Replace the whole index with the given names."""
+        counts = {}
+        for name in names:
+            if name:
+                counts[name] = counts.get(name, 0) + 1
+        entries = sorted(entry for name in counts for entry in _entries(name))
+        with self._lock:
+            self._counts = counts
+            self._entries = entries
+
+    def add(self, name):
+        """Register one more item carrying this name."""
+        if not name:
+            return
+        with self._lock:
+            if name not in self._counts:
+                self._counts[name] = 0
+                for entry in _entries(name):
+                    insort(self._entries, entry)
+            self._counts[name] += 1
+
+    def remove(self, name):
+        """Forget one item carrying this name."""
+        with self._lock:
+            count = self._counts.get(name)
+            if not count:
+                return
+            if count > 1:
+                self._counts[name] = count - 1
+                return
+            del self._counts[name]
+            for entry in _entries(name):
+                i = bisect_left(self._entries, entry)
+                if i < len(self._entries) and self._entries[i] == entry:
+                    del self._entries[i]
+
+    def rename(self, old_name, new_name):
+        """Move one item from old_name to new_name."""
+        if old_name == new_name:
+            return
+        with self._lock:
+            self.remove(old_name)
+            self.add(new_name)
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """
+        Up to `limit` names with a word starting with `prefix` (any case).
+
+        Ranked by: the whole name starts with the prefix, then by how many
+        items carry the name, then shorter names, then alphabetically.
+        """
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix or limit <= 0:
+            return []
+        with self._lock:
+            entries = self._entries
+            counts = self._counts
+            start = bisect_left(entries, (prefix,))
+            best = {}
+            for key, group, name in entries[start:start + MAX_SCAN]:
+                if not key.startswith(prefix):
+                    break
+                rank = best.get(name)
+                if rank is None or group < rank[0]:
+                    best[name] = (group, -counts[name], len(name), name)
+        return [rank[3] for rank in sorted(best.values())[:limit]]
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, name):
+        return name in self._counts
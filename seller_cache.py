@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+from hydration import to_object_id
+
+
+class SellerCache:
+    """
+    Read-through LRU cache of seller profiles with a time-to-live.
+
+    Lookups that miss are loaded from `seller_profiles` in one $in query.
+    Missing sellers are not cached, so a new seller is found at once; a
+    changed profile is served stale until its entry expires, in each worker
+    separately. Cached documents are shared, so callers get shallow copies.
+    """
+
+    def __init__(self, seller_profiles, max_size=1024, ttl=300.0, clock=time.monotonic):
+        self.seller_profiles = seller_profiles
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # seller _id -> (expires_at, seller document)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, seller_id):
+        """Return one seller profile, or None if it does not exist."""
+        return self.get_many([seller_id]).get(to_object_id(seller_id))
+
+    def get_many(self, seller_ids):
+        """Return a dict of _id -> seller profile for every id that exists."""
+        found, missing = self.lookup(seller_ids)
+        if missing:
+            found.update(self.store(list(self.seller_profiles.find({'_id': {'$in': missing}}))))
+        return found
+
+    def lookup(self, seller_ids):
+        """
+        Cache-only half of get_many: returns (found, missing ids). Callers
+        with their own driver (e.g. the async app) load the missing ids and
+        hand them to store().
+        """
+        wanted = {to_object_id(i) for i in seller_ids} - {None}
+        found = {}
+        missing = []
+        now = self._clock()
+
+        with self._lock:
+            for seller_id in wanted:
+                entry = self._entries.get(seller_id)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(seller_id)
+                    found[seller_id] = dict(entry[1])
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[seller_id]
+                    missing.append(seller_id)
+                    self.misses += 1
+
+        return found, missing
+
+    def store(self, sellers):
+        """Cache freshly loaded seller profiles; returns them keyed by _id."""
+        stored = {}
+        with self._lock:
+            expires_at = self._clock() + self.ttl
+            for seller in sellers:
+                self._entries[seller['_id']] = (expires_at, seller)
+                self._entries.move_to_end(seller['_id'])
+                stored[seller['_id']] = dict(seller)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return stored
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,155 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the app's on-disk state out of the checkout; set before app is imported
+WORKDIR = tempfile.mkdtemp(prefix='suffixkart-tests-')
+os.environ.setdefault('SUFFIXKART_BLOOM_PATH', os.path.join(WORKDIR, 'names.bloom'))
+os.environ.setdefault('SUFFIXKART_SNAPSHOT_PATH', os.path.join(WORKDIR, 'catalog.snapshot'))
+os.environ.setdefault('SUFFIXKART_FEED_POLL_INTERVAL', '0')
+
+
+def _patch_mongomock(mongomock):
+    # mongomock's bulk API predates the `sort` option pymongo 4.x passes along
+    import mongomock.collection
+    builder = mongomock.collection.BulkOperationBuilder
+    if not getattr(builder, '_accepts_sort', False):
+        add_update = builder.add_update
+        builder.add_update = lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs)
+        builder._accepts_sort = True
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """The Flask app module, running against mongomock."""
+    mongomock = pytest.importorskip('mongomock')
+    import pymongo
+    _patch_mongomock(mongomock)
+    pymongo.MongoClient = mongomock.MongoClient
+    import app
+    app.app.config['TESTING'] = True
+    return app
+
+
+class _ReplicaSet:
+    """
+    A mongod started as a single-node replica set (transactions need one)
+    from the binary pymongo_inmemory downloads for `context`.
+    """
+
+    def __init__(self, context):
+        import pymongo
+        import pymongo_inmemory
+        bin_folder = '' if context.use_local_mongod else pymongo_inmemory.download(context)
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        self.data_folder = tempfile.mkdtemp(prefix='suffixkart-mongod-')
+        self.process = subprocess.Popen([
+            os.path.join(bin_folder, 'mongod'), '--replSet', 'rs0', '--port', str(port),
+            '--bind_ip', '127.0.0.1', '--dbpath', self.data_folder,
+            # pymongo_inmemory defaults old versions to ephemeralForTest, which has no transactions
+            '--storageEngine', 'wiredTiger',
+            '--logpath', os.path.join(self.data_folder, 'mongod.log')
+        ])
+        self.connection_string = f"mongodb://127.0.0.1:{port}/?replicaSet=rs0"
+        try:
+            with pymongo.MongoClient('127.0.0.1', port, directConnection=True,
+                                     serverSelectionTimeoutMS=30000) as admin:
+                admin.admin.command('replSetInitiate', {'_id': 'rs0', 'members': [{'_id': 0, 'host': f"127.0.0.1:{port}"}]})
+                deadline = time.monotonic() + 30
+                while not admin.admin.command('hello').get('isWritablePrimary'):
+                    if time.monotonic() > deadline:
+                        raise RuntimeError('mongod did not become primary')
+                    time.sleep(0.1)
+        except Exception:
+            self.stop()
+            raise
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+        shutil.rmtree(self.data_folder, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def mongod():
+    """
+    A throwaway mongod (single-node replica set, so transactions work) for
+    what mongomock does not implement. Tests using it xfail, with the
+    reason, when none can be started (e.g. no network to download one;
+    PYMONGOIM__USE_LOCAL_MONGOD=True uses the mongod on PATH instead).
+    """
+    pytest.importorskip('pymongo_inmemory')
+    from pymongo_inmemory.context import Context
+    try:
+        server = _ReplicaSet(Context())
+    except Exception as e:
+        pytest.xfail(f"no mongod could be started: {e}")
+    yield server
+    server.stop()
+
+
+@pytest.fixture(params=['mongomock', 'mongod'])
+def client(request):
+    """A MongoClient for module-level tests, against mongomock and a real mongod."""
+    if request.param == 'mongomock':
+        mongomock = pytest.importorskip('mongomock')
+        _patch_mongomock(mongomock)
+        yield mongomock.MongoClient()
+        return
+    import pymongo
+    server = request.getfixturevalue('mongod')
+    real = pymongo.MongoClient(server.connection_string)
+    yield real
+    real.close()
+
+
+@pytest.fixture
+def db(client, request):
+    name = 'suffixkart_test_' + request.node.name.split('[')[0][:40]
+    client.drop_database(name)
+    yield client[name]
+    client.drop_database(name)
+
+
+def _login(app_module, profiles, user_type, **profile):
+    import uuid
+    from datetime import datetime
+    email = f"{uuid.uuid4().hex}@example.com"
+    profile_id = app_module.db[profiles].insert_one(
+        dict(profile, email=email, phone='555', address='1 Test St', date_registered=datetime.now())).inserted_id
+    password_hash, salt = app_module.hash_password('pw')
+    app_module.db.user_credentials.insert_one({'email': email, 'password_hash': password_hash, 'salt': salt,
+                                               f"{user_type}_id": profile_id, 'user_type': user_type})
+    client = app_module.app.test_client()
+    response = client.post('/login', data={'email': email, 'password': 'pw'})
+    assert response.status_code == 302
+    return client, profile_id
+
+
+@pytest.fixture
+def seller(app_module):
+    """A test client logged in as a new seller, and the seller's id."""
+    return _login(app_module, 'seller_profiles', 'seller', name='Sam', description='Test seller')
+
+
+@pytest.fixture
+def buyer(app_module):
+    """A test client logged in as a new buyer, and the buyer's id."""
+    return _login(app_module, 'buyer_profiles', 'buyer', name='Bea')
+
+
+def item_form(name, **fields):
+    form = {'name': name, 'price': '2.50', 'description': 'Fresh', 'quantity': '10', 'category': 'Dairy & Eggs'}
+    form.update(fields)
+    return form
@@ -0,0 +1,35 @@
+import uuid
+from datetime import datetime
+
+from conftest import item_form
+
+
+def test_duplicate_name_is_rejected(app_module, seller):
+    client, seller_id = seller
+    name = f"Milk {uuid.uuid4().hex[:8]}"
+    for _ in range(2):
+        assert client.post(f'/add_item/{seller_id}', data=item_form(name)).status_code == 302
+    assert app_module.items_collection.count_documents({'name': name}) == 1
+
+
+def test_name_unknown_to_bloom_filter_is_rejected(app_module, seller):
+    # Another worker's insert this worker's Bloom filter has not caught up with
+    client, seller_id = seller
+    name = f"Bread {uuid.uuid4().hex[:8]}"
+    app_module.items_collection.insert_one({'name': name, 'price': 1.0, 'quantity': 1, 'category': 'Bakery',
+                                            'seller_id': seller_id, 'date_added': datetime.now()})
+    assert name not in app_module.name_filter
+    response = client.post(f'/add_item/{seller_id}', data=item_form(name), follow_redirects=True)
+    assert b'already exists' in response.data
+    assert app_module.items_collection.count_documents({'name': name}) == 1
+
+
+def test_rename_onto_existing_name_is_rejected(app_module, seller):
+    client, seller_id = seller
+    first, second = (f"Eggs {uuid.uuid4().hex[:8]}" for _ in range(2))
+    for name in (first, second):
+        client.post(f'/add_item/{seller_id}', data=item_form(name))
+    item = app_module.items_collection.find_one({'name': second})
+    response = client.post(f"/edit_item/{item['_id']}", data=item_form(first), follow_redirects=True)
+    assert b'Another item already has this name' in response.data
+    assert app_module.items_collection.find_one({'_id': item['_id']})['name'] == second
@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def async_module(app_module):
+    pytest.importorskip('quart')
+    pytest.importorskip('motor')
+    import async_app
+    return async_app
+
+
+@pytest.mark.parametrize('path', ['/seller/not-an-id', '/view_seller/not-an-id'])
+def test_malformed_seller_id_redirects(async_module, path):
+    async def get():
+        client = async_module.async_app.test_client()
+        response = await client.get(path)
+        home = await client.get('/search_results')
+        return response, await home.get_data(as_text=True)
+
+    response, page = asyncio.run(get())
+    assert response.status_code == 302
+    assert 'Seller not found!' in page
@@ -0,0 +1,63 @@
+import os
+
+from bloom_filter import ScalableBloomFilter, open_name_filter
+
+
+def test_grows_past_capacity(tmp_path):
+    bloom = ScalableBloomFilter(str(tmp_path / 'names.bloom'), capacity=50)
+    names = [f"item {i}" for i in range(500)]
+    bloom.add_many(names)
+    assert all(name in bloom for name in names)
+    assert len(bloom._layers) > 1
+    bloom.close()
+
+
+def test_reopen_keeps_names(tmp_path):
+    path = str(tmp_path / 'names.bloom')
+    bloom = open_name_filter(path, ['Milk', 'Bread'], error_rate=0.001)
+    bloom.close()
+    bloom = ScalableBloomFilter(path)
+    assert 'Milk' in bloom and 'Bread' in bloom
+    assert bloom.add('Eggs') and not bloom.add('Eggs')
+    bloom.close()
+
+
+def test_handles_on_one_path_grow_together(tmp_path):
+    # Two handles (as two worker processes would have) adding in turns must
+    # never truncate each other's layers or lose each other's names
+    path = str(tmp_path / 'names.bloom')
+    first = ScalableBloomFilter(path, capacity=10)
+    second = ScalableBloomFilter(path, capacity=10)
+    names = [f"item {i}" for i in range(200)]
+    for i, name in enumerate(names):
+        (first if i % 2 else second).add(name)
+    for bloom in (first, second):
+        assert [name for name in names if name not in bloom] == []
+    # Names that were false positives are not counted
+    assert len(first) == len(second) <= len(names)
+    assert len(os.listdir(tmp_path)) == len(first._layers) + 1  # layers + lock file
+    first.close()
+    second.close()
+
+
+def test_handles_in_separate_processes(tmp_path):
+    import multiprocessing
+    path = str(tmp_path / 'names.bloom')
+    workers = [multiprocessing.Process(target=_add_range, args=(path, start)) for start in (0, 1000, 2000)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    bloom = ScalableBloomFilter(path)
+    missing = [i for start in (0, 1000, 2000) for i in range(start, start + 300) if f"item {i}" not in bloom]
+    assert missing == []
+    assert len(bloom) <= 900
+    bloom.close()
+
+
+def _add_range(path, start):
+    bloom = ScalableBloomFilter(path, capacity=20)
+    for i in range(start, start + 300):
+        bloom.add(f"item {i}")
+    bloom.close()
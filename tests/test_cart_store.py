@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+from cart_store import DocumentCartStore, LineCartStore, migrate_line_carts
+
+
+OLD = datetime(2024, 1, 1)
+NEW = datetime(2024, 6, 1)
+
+
+def _quantities(store, cart_id):
+    return {line['item_id']: line['quantity'] for line in store.get_lines(cart_id)}
+
+
+def _dates(store, cart_id):
+    return {line['item_id']: line['date_added'] for line in store.get_lines(cart_id)}
+
+
+def test_document_merge_adds_quantities_and_keeps_older_dates(client, db):
+    if type(client).__module__.startswith('mongomock'):
+        pytest.skip('mongomock has no $merge stage')
+    store = DocumentCartStore(db)
+    store.add('guest', 'milk', 2, OLD)
+    store.add('guest', 'bread', 1, NEW)
+    store.add('user', 'milk', 1, NEW)
+    store.add('user', 'eggs', 4, OLD)
+    store.merge('guest', 'user')
+    assert _quantities(store, 'user') == {'milk': 3, 'bread': 1, 'eggs': 4}
+    assert _dates(store, 'user') == {'milk': OLD, 'bread': NEW, 'eggs': OLD}
+    assert store.get_lines('guest') == []
+
+    # Into a cart that does not exist yet
+    store.add('guest', 'tea', 1, OLD)
+    store.merge('guest', 'new user')
+    assert _quantities(store, 'new user') == {'tea': 1}
+
+
+def test_line_merge_adds_quantities(db):
+    store = LineCartStore(db)
+    store.add('guest', 'milk', 2)
+    store.add('user', 'milk', 1)
+    store.add('guest', 'bread', 1)
+    store.merge('guest', 'user')
+    assert _quantities(store, 'user') == {'milk': 3, 'bread': 1}
+    assert store.get_lines('guest') == []
+
+
+def test_migrate_line_carts(db):
+    db.cart.insert_many([
+        {'cart_id': 'user', 'item_id': 'milk', 'quantity': 2, 'date_added': OLD},
+        {'cart_id': 'user', 'item_id': 'bread', 'quantity': 1, 'date_added': NEW},
+        {'cart_id': 'guest', 'item_id': 'eggs', 'quantity': 6, 'date_added': NEW},
+    ])
+    store = DocumentCartStore(db)
+    store.add('user', 'milk', 1, NEW)
+    assert migrate_line_carts(db) == 3
+    assert _quantities(store, 'user') == {'milk': 3, 'bread': 1}
+    assert _dates(store, 'user') == {'milk': OLD, 'bread': NEW}
+    assert _quantities(store, 'guest') == {'eggs': 6}
+    assert db.cart.count_documents({}) == 0
+    assert migrate_line_carts(db) == 0
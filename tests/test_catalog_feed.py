@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from catalog_feed import CatalogFeed, fold_changes
+
+
+@pytest.fixture
+def feed(db):
+    feed = CatalogFeed(db, size=1024 * 1024)
+    try:
+        feed.ensure()
+    except NotImplementedError:
+        # mongomock has no capped collections; an ordinary one behaves the same here
+        feed.changes.create_index([('version', ASCENDING)], unique=True)
+    return feed
+
+
+def _replayed(feed):
+    """Item id -> fields, as a consumer replaying the whole feed sees them."""
+    events = feed.changes_since(0)
+    assert [event['version'] for event in events] == list(range(1, feed.version() + 1))
+    upserts, deletes = fold_changes(events)
+    return {item['_id']: {'name': item['name'], 'category': item['category']} for item in upserts}
+
+
+def _stored(feed):
+    return {item['_id']: {'name': item['name'], 'category': item['category']} for item in feed.items.find()}
+
+
+def test_events_follow_writes(feed):
+    milk = feed.insert_item({'name': 'Milk', 'category': 'Dairy & Eggs', 'seller_id': None})
+    bread = feed.insert_item({'name': 'Bread', 'category': 'Bakery', 'seller_id': None})
+    updated = feed.update_item(milk, {'name': 'Whole Milk'})
+    assert updated['name'] == 'Whole Milk' and updated['category'] == 'Dairy & Eggs'
+    assert feed.delete_item(bread)['name'] == 'Bread'
+    assert feed.update_item(bread, {'name': 'Rye'}) is None
+    assert feed.delete_item(bread) is None
+    assert _replayed(feed) == _stored(feed) == {milk: {'name': 'Whole Milk', 'category': 'Dairy & Eggs'}}
+    assert feed.items.find_one({'_id': milk})['catalog_version'] == 3
+
+
+def test_write_that_took_its_version_first_can_not_land_last(feed, monkeypatch):
+    item_id = feed.insert_item({'name': 'Milk', 'category': 'Dairy & Eggs', 'seller_id': None})
+    # Writer A takes version 2, then stalls while writer B takes 3 and lands
+    stale = feed._next_version()
+    feed.update_item(item_id, {'category': 'Other'})
+    next_version = feed._next_version
+    versions = iter([stale])
+    monkeypatch.setattr(feed, '_next_version', lambda: next(versions, None) or next_version())
+    updated = feed.update_item(item_id, {'name': 'Oat Milk'})
+    # A is refused at version 2 and lands again at 4, after B, keeping B's change
+    assert updated['catalog_version'] == 4
+    assert _stored(feed) == _replayed(feed) == {item_id: {'name': 'Oat Milk', 'category': 'Other'}}
+
+
+def test_failed_write_does_not_hold_up_the_feed(feed):
+    feed.items.create_index([('name', ASCENDING)], unique=True)
+    feed.insert_item({'name': 'Milk', 'category': 'Dairy & Eggs', 'seller_id': None})
+    bread = feed.insert_item({'name': 'Bread', 'category': 'Bakery', 'seller_id': None})
+    with pytest.raises(DuplicateKeyError):
+        feed.insert_item({'name': 'Milk', 'category': 'Other', 'seller_id': None})
+    with pytest.raises(DuplicateKeyError):
+        feed.update_item(bread, {'name': 'Milk'})
+    assert feed.version() == 4
+    assert len(_replayed(feed)) == 2
+
+
+def test_concurrent_updates_replay_to_the_stored_state(feed, client):
+    if type(client).__module__.startswith('mongomock'):
+        pytest.skip('mongomock updates are not atomic across threads')
+    item_ids = [feed.insert_item({'name': f"Item {i}", 'category': 'Other', 'seller_id': None}) for i in range(3)]
+
+    def writer(worker):
+        for round in range(20):
+            for item_id in item_ids:
+                feed.update_item(item_id, {'category': f"{worker}-{round}"})
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _replayed(feed) == _stored(feed)
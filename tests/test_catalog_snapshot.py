@@ -0,0 +1,53 @@
+import os
+
+from bson import ObjectId
+
+from catalog_snapshot import COMPACT_SLACK, SnapshotStore
+
+
+def _items(count):
+    return [{'_id': ObjectId(), 'name': f"Item {i}", 'category': 'Bakery', 'seller_id': ObjectId()}
+            for i in range(count)]
+
+
+def _name_of(snapshot, item_id):
+    return next(item['name'] for item in snapshot.items() if item['_id'] == item_id)
+
+
+def test_incremental_changes(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'catalog.snapshot'))
+    items = _items(50)
+    with store.lock():
+        base = store.publish(items, version=1)
+        renamed = dict(items[0], name='Renamed')
+        added = {'_id': ObjectId(), 'name': 'Added', 'category': None, 'seller_id': None}
+        newer = store.publish_changes(base, [renamed, added], [items[1]['_id']], version=2)
+    assert newer.version == 2
+    assert len(newer) == 50
+    assert base.name_changes(newer) == {'Item 0': -1, 'Item 1': -1, 'Renamed': 1, 'Added': 1}
+    assert {item['_id']: item['name'] for item in newer.items()} == \
+        {**{item['_id']: item['name'] for item in items[2:]}, renamed['_id']: 'Renamed', added['_id']: 'Added'}
+    base.close()
+    newer.close()
+
+
+def test_renames_do_not_grow_the_file_without_bound(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'catalog.snapshot'))
+    items = _items(200)
+    with store.lock():
+        snapshot = store.publish(items, version=1)
+        size = os.path.getsize(snapshot.path)
+        largest = size
+        for version in range(2, 4 * COMPACT_SLACK):
+            renamed = dict(items[0], name=f"Renamed {version}")
+            newer = store.publish_changes(snapshot, [renamed], version=version)
+            assert snapshot.name_changes(newer) == {_name_of(snapshot, items[0]['_id']): -1,
+                                                    renamed['name']: 1}
+            snapshot.close()
+            snapshot = newer
+            largest = max(largest, os.path.getsize(snapshot.path))
+    # Dead names (16 bytes each here) are capped at a quarter of the items plus COMPACT_SLACK
+    assert largest <= size + 16 * (200 // 4 + COMPACT_SLACK + 1) + 64
+    assert snapshot.name_counts()[f"Renamed {4 * COMPACT_SLACK - 1}"] == 1
+    assert len(snapshot.name_counts()) == 200
+    snapshot.close()
@@ -0,0 +1,116 @@
+import pytest
+from bson import ObjectId
+
+from cart_store import LineCartStore
+from catalog_feed import STOCK_VERSION_ID
+from checkout import Checkout, OutOfStock
+
+
+class _NoSellers:
+    def get_many(self, ids):
+        return {}
+
+
+@pytest.fixture
+def shop(client, db):
+    """A standalone-style Checkout (compensation, no transactions) and two stocked items."""
+    checkout = Checkout(client, db, LineCartStore(db), _NoSellers())
+    checkout.use_transactions = False
+    milk, bread = ObjectId(), ObjectId()
+    db.items.insert_many([
+        {'_id': milk, 'name': 'Milk', 'price': 2.0, 'quantity': 5},
+        {'_id': bread, 'name': 'Bread', 'price': 3.0, 'quantity': 5},
+    ])
+    checkout.cart_store.add('cart', milk, 2)
+    checkout.cart_store.add('cart', bread, 1)
+    return checkout, db, milk, bread
+
+
+def _stock(db):
+    return {item['name']: item['quantity'] for item in db.items.find()}
+
+
+def _stock_version(db):
+    return (db.counters.find_one({'_id': STOCK_VERSION_ID}) or {}).get('version', 0)
+
+
+def test_places_numbered_orders(shop):
+    checkout, db, milk, bread = shop
+    orders = checkout.place('cart', 'buyer', 'Bea')
+    assert [order['seq'] for order in orders] == [1, 2]
+    assert db.orders.count_documents({}) == 2
+    assert _stock(db) == {'Milk': 3, 'Bread': 4}
+    assert checkout.cart_store.get_lines('cart') == []
+    assert db.items.count_documents({'checkout_tokens': {'$exists': True, '$ne': []}}) == 0
+    assert _stock_version(db) == 1
+
+
+def test_lost_stock_race_gives_stock_back(shop, monkeypatch):
+    checkout, db, milk, bread = shop
+    build_orders = checkout._build_orders
+
+    def sell_out_after_validation(*args):
+        orders = build_orders(*args)
+        # Another checkout buys the last of the milk in between
+        db.items.update_one({'_id': milk}, {'$set': {'quantity': 1}})
+        return orders
+    monkeypatch.setattr(checkout, '_build_orders', sell_out_after_validation)
+
+    with pytest.raises(OutOfStock) as e:
+        checkout.place('cart', 'buyer', 'Bea')
+    assert e.value.item_names == ['Milk']
+    # The bread decrement that did apply was undone exactly once
+    assert _stock(db) == {'Milk': 1, 'Bread': 5}
+    assert db.items.count_documents({'checkout_tokens': {'$exists': True, '$ne': []}}) == 0
+    assert db.orders.count_documents({}) == 0
+    assert len(checkout.cart_store.get_lines('cart')) == 2
+    # Pages may have shown the briefly lower stock
+    assert _stock_version(db) >= 1
+
+
+def test_failed_order_insert_gives_stock_back(shop, monkeypatch):
+    checkout, db, milk, bread = shop
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('insert failed')
+    monkeypatch.setattr(checkout.orders, 'insert_many', fail)
+
+    with pytest.raises(RuntimeError):
+        checkout.place('cart', 'buyer', 'Bea')
+    assert _stock(db) == {'Milk': 5, 'Bread': 5}
+    assert len(checkout.cart_store.get_lines('cart')) == 2
+
+
+def _lose_first_race(checkout, db, milk, monkeypatch):
+    build_orders = checkout._build_orders
+    races = []
+
+    def sell_out_once(*args):
+        orders = build_orders(*args)
+        if not races:
+            races.append(True)
+            # Another checkout buys most of the milk after validation
+            db.items.update_one({'_id': milk}, {'$set': {'quantity': 1}})
+        return orders
+    monkeypatch.setattr(checkout, '_build_orders', sell_out_once)
+
+    with pytest.raises(OutOfStock):
+        checkout.place('cart', 'buyer', 'Bea')
+    db.items.update_one({'_id': milk}, {'$set': {'quantity': 5}})
+
+
+def test_lost_race_burns_no_order_numbers(shop, monkeypatch):
+    checkout, db, milk, bread = shop
+    _lose_first_race(checkout, db, milk, monkeypatch)
+    assert [order['seq'] for order in checkout.place('cart', 'buyer', 'Bea')] == [1, 2]
+
+
+def test_aborted_transaction_burns_no_order_numbers(client, db, monkeypatch):
+    if type(client).__module__.startswith('mongomock'):
+        pytest.skip('mongomock has no transactions')
+    checkout = Checkout(client, db, LineCartStore(db), _NoSellers())
+    milk = db.items.insert_one({'name': 'Milk', 'price': 2.0, 'quantity': 5}).inserted_id
+    checkout.cart_store.add('cart', milk, 2)
+    _lose_first_race(checkout, db, milk, monkeypatch)
+    assert checkout.use_transactions
+    assert [order['seq'] for order in checkout.place('cart', 'buyer', 'Bea')] == [1]
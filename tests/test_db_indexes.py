@@ -0,0 +1,30 @@
+import pytest
+from pymongo import ASCENDING
+
+from db_indexes import check_query_plans, ensure_indexes
+
+
+def _name_index(db):
+    return next(index for index in db.items.list_indexes() if list(index['key'].items()) == [('name', ASCENDING)])
+
+
+def test_name_index_is_made_unique(db):
+    db.items.create_index([('name', ASCENDING)])
+    db.items.insert_many([{'name': 'Milk'}, {'name': 'Bread'}])
+    assert ensure_indexes(db) == []
+    assert _name_index(db).get('unique')
+
+
+def test_duplicates_keep_the_old_index(db):
+    db.items.create_index([('name', ASCENDING)])
+    db.items.insert_many([{'name': 'Milk'}, {'name': 'Milk'}])
+    failures = ensure_indexes(db)
+    assert [(collection, name) for collection, name, _ in failures] == [('items', 'name_1')]
+    assert not _name_index(db).get('unique')
+
+
+def test_hot_queries_use_indexes(db, client):
+    if type(client).__module__.startswith('mongomock'):
+        pytest.skip('mongomock has no query planner')
+    ensure_indexes(db)
+    assert check_query_plans(db) == []
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from fuzzy_index import FuzzyIndex, edit_distance
+from fuzzy_scan import ScanMatcher
+
+
+def _dp_distance(s1, s2):
+    row = list(range(len(s2) + 1))
+    for i, a in enumerate(s1, 1):
+        previous, row[0] = row[0], i
+        for j, b in enumerate(s2, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (a != b))
+    return row[-1]
+
+
+def _names(count, seed=0):
+    rng = random.Random(seed)
+    return [''.join(rng.choice('abcde ') for _ in range(rng.randint(1, 12))) for _ in range(count)]
+
+
+def test_edit_distance_matches_dynamic_programming():
+    rng = random.Random(1)
+    alphabet = 'abcxyzé '
+    for _ in range(2000):
+        s1 = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 70)))
+        s2 = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 70)))
+        assert edit_distance(s1, s2) == _dp_distance(s1, s2)
+
+
+def test_matches_scan():
+    names = _names(2000)
+    index, scan = FuzzyIndex(names), ScanMatcher(names)
+    for query in _names(50, seed=1):
+        assert sorted(index.search(query)) == sorted(scan.search(query))
+        assert index.nearest(query, 5) == scan.nearest(query, 5)
+
+
+def test_background_build_replays_changes():
+    names = _names(3000)
+    index = FuzzyIndex(names, background=True)
+    # Changes made while the tree grows, searched through the fallback
+    index.add('brand new')
+    index.remove(names[0])
+    index.rename(names[1], 'renamed')
+    assert 'brand new' in index.search('brand nex')
+    assert index.wait_built(30)
+
+    scan = ScanMatcher(names)
+    scan.add('brand new')
+    scan.remove(names[0])
+    scan.rename(names[1], 'renamed')
+    assert len(index) == len(scan)
+    for query in _names(50, seed=2) + ['brand new', 'renamed', names[0]]:
+        assert sorted(index.search(query)) == sorted(scan.search(query))
+
+
+def test_newer_build_wins():
+    index = FuzzyIndex(_names(3000), background=True)
+    index.build(['milk', 'silk', 'bread'])
+    assert index.wait_built(30)
+    assert sorted(index.search('milk')) == ['milk', 'silk']
+
+
+def test_unknown_matcher_is_rejected(app_module):
+    assert isinstance(app_module.create_fuzzy_matcher('scan'), ScanMatcher)
+    with pytest.raises(ValueError, match="'bk-tree'.*'bktree'"):
+        app_module.create_fuzzy_matcher('bk-tree')
@@ -0,0 +1,64 @@
+import uuid
+
+from catalog_feed import bump_stock_version
+from conftest import item_form
+
+
+def _etag(client, path='/'):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    return response.headers['ETag']
+
+
+def test_revalidation_answers_304(app_module):
+    client = app_module.app.test_client()
+    etag = _etag(client)
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+    assert client.get('/', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_if_modified_since(app_module):
+    client = app_module.app.test_client()
+    bump_stock_version(app_module.catalog_feed.counters)
+    last_modified = client.get('/').headers['Last-Modified']
+    assert client.get('/', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get('/', headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'}).status_code == 200
+
+
+def test_pending_flash_is_never_304(app_module):
+    client = app_module.app.test_client()
+    etag = _etag(client)
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Item added')]
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Item added' in response.data
+    assert 'ETag' not in response.headers
+
+
+def test_writes_change_the_etag(app_module, seller):
+    client, seller_id = seller
+    # Show the login flash first: pages with one pending are not validated
+    client.get('/')
+    before = _etag(client, '/categories')
+    catalog_before = _etag(client)
+    assert client.post(f'/add_item/{seller_id}', data=item_form(f"Milk {uuid.uuid4().hex[:8]}")).status_code == 302
+    # Consume the "added" flash
+    client.get('/')
+    after_item = _etag(client)
+    assert after_item != catalog_before
+    bump_stock_version(app_module.catalog_feed.counters)
+    assert _etag(client) != after_item
+    # Static pages only follow templates and the session
+    assert _etag(client, '/categories') == before
+
+
+def test_etag_differs_per_user(app_module, buyer):
+    client, _ = buyer
+    client.get('/')
+    anonymous = _etag(app_module.app.test_client())
+    assert _etag(client) != anonymous
@@ -0,0 +1,27 @@
+import metrics
+
+
+def test_timed_records_dependency_calls(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+
+    @metrics.timed('fuzzy_index', 'nearest')
+    def nearest(query):
+        return [query]
+
+    @metrics.timed('backend')
+    def request(algorithm, payload):
+        return payload
+
+    assert nearest('milk') == ['milk']
+    assert request('bloom', 1) == 1
+    text = metrics.render_metrics()
+    assert 'suffixkart_dependency_duration_seconds_count{dependency="fuzzy_index",operation="nearest"} 1' in text
+    assert 'suffixkart_dependency_duration_seconds_count{dependency="backend",operation="bloom"} 1' in text
+
+
+def test_timed_is_a_no_op_when_disabled(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+
+    def nearest(query):
+        return [query]
+    assert metrics.timed('fuzzy_index', 'nearest')(nearest) is nearest
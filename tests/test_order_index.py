@@ -0,0 +1,89 @@
+import time
+
+from bson import ObjectId
+
+from order_index import IN_FLIGHT, OrderIndex, number_orders, order_seq
+
+
+def _place(db, *items, buyer='Bea'):
+    orders = [{'_id': ObjectId(), 'buyer_name': buyer, 'item_name': item} for item in items]
+    number_orders(db.counters, orders)
+    db.orders.insert_many(orders)
+    return orders
+
+
+def test_substring_search():
+    orders = [(1, 'Bea', 'Whole Milk'), (2, 'Sam', 'Bread'), (3, 'Milko', 'Eggs'), (4, 'Bea', 'MILK')]
+    index = OrderIndex(orders)
+    assert index.search('milk') == [1, 4]
+    assert index.search('MIL', field='buyer') == [3]
+    assert index.search('mi', field=None) == [1, 3, 4]
+    assert index.search('e', field='buyer') == [1, 4]
+    assert index.search('yogurt') == []
+    assert index.search('') == []
+
+
+def test_add_ignores_known_numbers():
+    index = OrderIndex()
+    index.add(1, 'Bea', 'Milk', seq=1)
+    index.add(1, 'Bea', 'Milk', seq=1)
+    index.add(2, 'Bea', 'Milk')
+    assert index.search('milk') == [1, 2]
+
+
+def test_refresh_picks_up_orders_from_other_workers(db):
+    first, second = OrderIndex(), OrderIndex()
+    placed = _place(db, 'Milk', 'Bread')
+    # The placing worker adds its own orders right away
+    for order in placed:
+        first.add(order['_id'], order['buyer_name'], order['item_name'], order['seq'])
+    assert second.search('milk') == []
+    assert second.refresh(db.orders) == 2
+    assert first.refresh(db.orders) == 0
+    assert second.search('bread') == first.search('bread') == [placed[1]['_id']]
+    assert second.applied == 2
+
+
+def test_build_then_refresh_does_not_duplicate(db):
+    placed = _place(db, 'Milk', 'Milk')
+    index = OrderIndex()
+    orders = [(order['_id'], order['buyer_name'], order['item_name'], order['seq']) for order in db.orders.find()]
+    index.build(orders, order_seq(db.counters))
+    later = _place(db, 'Milk')
+    index.refresh(db.orders)
+    assert index.search('milk') == [order['_id'] for order in placed + later]
+    assert index.applied == 3
+
+
+def test_build_keeps_old_orders():
+    index = OrderIndex()
+    index.build([(n, 'Bea', 'Milk', n) for n in range(1, IN_FLIGHT + 5)], IN_FLIGHT + 4)
+    assert len(index.search('milk')) == IN_FLIGHT + 4
+    assert index.applied == 4
+
+
+def test_hole_holds_back_until_timeout(db):
+    index = OrderIndex()
+    _place(db, 'Milk')
+    # A checkout numbered its order but has not inserted it (yet)
+    number_orders(db.counters, [{}])
+    _place(db, 'Bread')
+    index.refresh(db.orders)
+    assert len(index.search('bread')) == 1
+    assert index.applied == 1
+    # The late order still arrives
+    db.orders.insert_one({'_id': ObjectId(), 'buyer_name': 'Bea', 'item_name': 'Eggs', 'seq': 2})
+    index.refresh(db.orders)
+    assert index.search('eggs') and index.applied == 3
+
+
+def test_abandoned_hole_is_skipped(db):
+    index = OrderIndex(gap_timeout=0)
+    number_orders(db.counters, [{}])
+    _place(db, 'Milk')
+    index.refresh(db.orders)
+    assert index.applied == 0
+    time.sleep(0.01)
+    index.refresh(db.orders)
+    assert index.applied == 2
+    assert len(index.search('milk')) == 1
@@ -0,0 +1,69 @@
+import re
+import uuid
+from datetime import datetime
+from functools import partial
+
+from bson import ObjectId
+
+from pagination import fetch_order_page, parse_order_cursor
+
+
+def _legacy_order(app_module, buyer_id, seller_id, name):
+    # Written before order snapshots: no item_name, unit_price or seller_name
+    item_id = app_module.items_collection.insert_one({'name': name, 'price': 3.0, 'quantity': 5,
+                                                      'category': 'Bakery', 'seller_id': seller_id}).inserted_id
+    app_module.orders_collection.insert_one({'buyer_id': str(buyer_id), 'buyer_name': 'Bea', 'item_id': item_id,
+                                             'seller_id': seller_id, 'quantity': 2, 'price': 3.0,
+                                             'date': datetime.now()})
+
+
+def test_legacy_orders_render(app_module, buyer, seller):
+    client, buyer_id = buyer
+    _, seller_id = seller
+    _legacy_order(app_module, buyer_id, seller_id, f"Rye {uuid.uuid4().hex[:8]}")
+    for url in ('/buyer/orders', '/buyer/dashboard'):
+        response = client.get(url)
+        assert response.status_code == 200, url
+        assert b'$6.00' in response.data, url
+
+
+def test_order_details_show_seller_contact(app_module, buyer, seller):
+    client, buyer_id = buyer
+    _, seller_id = seller
+    _legacy_order(app_module, buyer_id, seller_id, f"Rye {uuid.uuid4().hex[:8]}")
+    email = app_module.db.seller_profiles.find_one({'_id': seller_id})['email']
+    response = client.get('/buyer/orders')
+    assert email.encode() in response.data
+    assert b'<strong>Phone:</strong>' in response.data
+
+
+def test_order_pages_walk_newest_first(db):
+    numbered = [{'_id': ObjectId(), 'seq': seq, 'item_name': 'Rye'} for seq in range(1, 6)]
+    legacy = [{'_id': ObjectId(), 'item_name': 'Rye'} for _ in range(3)]
+    db.orders.insert_many(numbered + legacy + [{'_id': ObjectId(), 'seq': 6, 'item_name': 'Milk'}])
+    seen, cursor = [], None
+    while True:
+        orders, next_cursor = fetch_order_page(db.orders, {'item_name': 'Rye'}, after=cursor, page_size=2)
+        assert len(orders) <= 2
+        seen.extend(orders)
+        if not next_cursor:
+            break
+        cursor = parse_order_cursor(next_cursor)
+    assert [order['_id'] for order in seen] == \
+        [order['_id'] for order in reversed(numbered)] + sorted((order['_id'] for order in legacy), reverse=True)
+
+
+def test_order_history_is_paged(app_module, monkeypatch):
+    name = f"Rye {uuid.uuid4().hex[:8]}"
+    for _ in range(3):
+        order_id = app_module.orders_collection.insert_one({'buyer_name': 'Bea', 'item_name': name, 'quantity': 1,
+                                                            'price': 3.0, 'date': datetime.now()}).inserted_id
+        app_module.order_index.add(order_id, 'Bea', name)
+    monkeypatch.setattr(app_module, 'fetch_order_page', partial(fetch_order_page, page_size=2))
+    client = app_module.app.test_client()
+    first = client.get(f'/order_history/{name}').get_data(as_text=True)
+    assert 'purchased by 3 customer(s)' in first
+    assert first.count('card order-card') == 2
+    next_url = re.search(r'href="([^"]*after=[^"]*)"', first).group(1)
+    second = client.get(next_url.replace('&amp;', '&')).get_data(as_text=True)
+    assert second.count('card order-card') == 1
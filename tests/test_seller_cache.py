@@ -0,0 +1,31 @@
+from seller_cache import SellerCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_changes_show_up_after_the_ttl(db):
+    clock = _Clock()
+    cache = SellerCache(db.seller_profiles, ttl=60, clock=clock)
+    seller_id = db.seller_profiles.insert_one({'name': 'Old name'}).inserted_id
+    assert cache.get(seller_id)['name'] == 'Old name'
+
+    db.seller_profiles.update_one({'_id': seller_id}, {'$set': {'name': 'New name'}})
+    clock.now = 59
+    assert cache.get(seller_id)['name'] == 'Old name'
+    clock.now = 61
+    assert cache.get(seller_id)['name'] == 'New name'
+
+
+def test_new_sellers_are_found_at_once(db):
+    cache = SellerCache(db.seller_profiles, clock=_Clock())
+    seller_id = db.seller_profiles.insert_one({'name': 'Later'}).inserted_id
+    db.seller_profiles.delete_one({'_id': seller_id})
+    assert cache.get(seller_id) is None
+    db.seller_profiles.insert_one({'_id': seller_id, 'name': 'Later'})
+    assert cache.get(seller_id)['name'] == 'Later'
@@ -0,0 +1,22 @@
+import uuid
+
+from conftest import item_form
+
+
+def test_flash_on_streamed_page_is_shown_once(seller):
+    client, seller_id = seller
+    response = client.post(f'/add_item/{seller_id}', data=item_form(f"Milk {uuid.uuid4().hex[:8]}"),
+                           follow_redirects=True)
+    assert response.is_streamed
+    assert b'Item added successfully!' in response.data
+    again = client.get(f'/seller/{seller_id}')
+    assert b'Item added successfully!' not in again.data
+
+
+def test_pending_flash_is_consumed_by_streamed_page(seller):
+    client, seller_id = seller
+    with client.session_transaction() as session:
+        session['_flashes'] = [('error', 'Something went wrong')]
+    response = client.get(f'/seller/{seller_id}')
+    assert b'Something went wrong' in response.data
+    assert b'Something went wrong' not in client.get(f'/seller/{seller_id}').data